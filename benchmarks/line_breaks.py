@@ -0,0 +1,252 @@
+"""
+Benchmark: DP line-break optimizer vs. exhaustive [BR] enumeration.
+
+Usage:
+    python -m benchmarks.line_breaks [--cases 50] [--max-breaks 10] [--font path]
+
+For random texts with 1..max-breaks AI line breaks, runs both optimize_line_breaks_bruteforce
+and optimize_line_breaks_for_region and reports how often they choose the same text,
+the effective font size difference, and the time each one takes (layout caches cleared per run).
+"""
+import argparse
+import random
+import re
+import time
+from typing import List
+
+import numpy as np
+
+from manga_translator.rendering import text_render, font_fitting, optimize_line_breaks_for_region
+from manga_translator.config import Config
+from manga_translator.utils import TextBlock, get_logger
+
+logger = get_logger('render')
+
+
+def generate_line_break_combinations(text: str):
+    """
+    Generate all possible line break combinations from a text with [BR] markers.
+    Returns a list of tuples: (modified_text, combination_description, skip_reason or None)
+    """
+    import itertools
+    
+    # Standardize all break markers to [BR] (including full-width brackets)
+    text = re.sub(r'\s*(<br>|【BR】)\s*', '[BR]', text, flags=re.IGNORECASE)
+    
+    # Find all [BR] positions
+    breaks = []
+    pattern = r'\[BR\]'
+    for match in re.finditer(pattern, text, flags=re.IGNORECASE):
+        breaks.append((match.start(), match.end()))
+    
+    if not breaks:
+        # No breaks, return original text
+        return [(text, "no_breaks", None)]
+    
+    combinations = []
+    
+    # Add original (keep all breaks)
+    combinations.append((text, "all_breaks", None))
+    
+    # Generate all possible combinations (remove 1, 2, 3, ... n breaks)
+    n_breaks = len(breaks)
+    for r in range(1, n_breaks + 1):
+        for combo in itertools.combinations(range(n_breaks), r):
+            # Create a version with selected breaks removed
+            # Split first to check first segment length
+            segments = re.split(pattern, text, flags=re.IGNORECASE)
+            
+            # Check skip condition: if first segment has <= 2 chars and we're removing break 0
+            if 0 in combo and len(segments[0].strip()) <= 2:
+                skip_reason = "first_segment_too_short"
+                combinations.append((None, f"remove_{combo}", skip_reason))
+                continue
+            
+            # Build modified text
+            # 从右到左删除，这样删除右边的BR不会影响左边BR的位置
+            modified_text = text
+            for idx in sorted(combo, reverse=True):  # Remove from right to left
+                start, end = breaks[idx]
+                # 从右到左删除时不需要offset调整，因为右边的删除不影响左边的位置
+                modified_text = modified_text[:start] + modified_text[end:]
+            
+            combinations.append((modified_text, f"remove_{combo}", None))
+    
+    return combinations
+
+
+def calculate_uniformity(lines: List[str]) -> float:
+    """
+    Calculate uniformity score for line lengths.
+    Lower score = more uniform (better).
+    Uses coefficient of variation (std/mean).
+    """
+    if not lines or len(lines) <= 1:
+        return 0.0
+    
+    lengths = [len(line.strip()) for line in lines]
+    if not lengths or sum(lengths) == 0:
+        return float('inf')
+    
+    mean_length = np.mean(lengths)
+    std_length = np.std(lengths)
+    
+    # Coefficient of variation
+    cv = std_length / mean_length if mean_length > 0 else float('inf')
+    return cv
+
+
+def optimize_line_breaks_bruteforce(region: TextBlock, config: Config, target_font_size: int, bubble_width: float, bubble_height: float):
+    """
+    Reference implementation: test every [BR] combination (2^n layouts).
+    This is the search optimize_line_breaks_for_region used before the DP optimizer.
+    Returns the best text variant and the font size it achieves.
+    """
+    original_translation = region.translation
+    combinations = generate_line_break_combinations(original_translation)
+    
+    best_text = original_translation
+    best_font_size = 0
+    best_uniformity = float('inf')
+    
+    layout_mode = config.render.layout_mode if config and hasattr(config.render, 'layout_mode') else 'default'
+    logger.debug(f"[OPTIMIZE_LINE_BREAKS] Testing {len(combinations)} combinations, layout_mode={layout_mode}")
+    
+    for text_variant, combo_desc, skip_reason in combinations:
+        if skip_reason:
+            logger.debug(f"[OPTIMIZE_LINE_BREAKS] Skipping {combo_desc}: {skip_reason}")
+            continue
+        
+        # Convert [BR] to \n for calculation
+        text_for_calc = re.sub(r'\s*\[BR\]\s*', '\n', text_variant, flags=re.IGNORECASE)
+        
+        # 严格智能缩放模式：如果去掉所有断句（无\n），会导致文本框扩大，淘汰此方案
+        strict_smart_scaling = getattr(config.render, 'strict_smart_scaling', False) if config and hasattr(config, 'render') else False
+        if layout_mode == 'smart_scaling' and strict_smart_scaling:
+            if '\n' not in text_for_calc:
+                logger.debug(f"[OPTIMIZE_LINE_BREAKS] Skipping {combo_desc}: 严格智能缩放模式下无断句会扩大文本框")
+                continue
+        
+        try:
+            # Calculate required dimensions
+            if region.horizontal:
+                lines, widths = font_fitting.calc_horizontal(
+                    target_font_size, text_for_calc, 
+                    max_width=99999, max_height=99999, 
+                    language=region.target_lang
+                )
+                if widths:
+                    spacing_y = int(target_font_size * (config.render.line_spacing or 0.01))
+                    required_width = max(widths)
+                    required_height = target_font_size * len(lines) + spacing_y * max(0, len(lines) - 1)
+                else:
+                    continue
+            else:  # Vertical
+                if config.render.auto_rotate_symbols:
+                    text_for_calc = text_render.auto_add_horizontal_tags(text_for_calc)
+                
+                lines, heights = font_fitting.calc_vertical(target_font_size, text_for_calc, max_height=99999)
+                if heights:
+                    spacing_x = int(target_font_size * (config.render.line_spacing or 0.2))
+                    required_height = max(heights)
+                    required_width = target_font_size * len(lines) + spacing_x * max(0, len(lines) - 1)
+                else:
+                    continue
+            
+            # Calculate how much the text fits in the bubble
+            # Larger font size is better
+            width_ratio = bubble_width / required_width if required_width > 0 else 1.0
+            height_ratio = bubble_height / required_height if required_height > 0 else 1.0
+            fit_ratio = min(width_ratio, height_ratio)
+            
+            # Calculate effective font size for this combination
+            effective_font_size = target_font_size * fit_ratio
+            
+            # Calculate uniformity
+            uniformity = calculate_uniformity(lines)
+            
+            logger.debug(f"[OPTIMIZE_LINE_BREAKS] {combo_desc}: font_size={effective_font_size:.1f}, uniformity={uniformity:.3f}")
+            
+            # Choose the best: prioritize font size, then uniformity
+            is_better = False
+            if effective_font_size > best_font_size + 0.5:  # Significantly larger font
+                is_better = True
+            elif abs(effective_font_size - best_font_size) <= 0.5:  # Similar font size
+                if uniformity < best_uniformity:  # Better uniformity
+                    is_better = True
+            
+            if is_better:
+                best_text = text_variant
+                best_font_size = effective_font_size
+                best_uniformity = uniformity
+                logger.debug(f"[OPTIMIZE_LINE_BREAKS] New best: {combo_desc}")
+        
+        except Exception as e:
+            logger.warning(f"[OPTIMIZE_LINE_BREAKS] Error evaluating {combo_desc}: {e}")
+            continue
+
+    return best_text, best_font_size
+
+
+WORDS = (
+    'the quick brown fox jumps over a lazy dog what are you doing here '
+    'I never thought it would end like this wait for me please'
+).split()
+
+
+def make_text(rng: random.Random, n_breaks: int) -> str:
+    segments = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))) for _ in range(n_breaks + 1)]
+    return '[BR]'.join(segments)
+
+
+def clear_layout_caches():
+    font_fitting._calc_horizontal.cache_clear()
+    font_fitting._calc_vertical.cache_clear()
+
+
+def run_one(func, region, config, font_size, width, height):
+    clear_layout_caches()
+    start = time.perf_counter()
+    text, effective_font_size = func(region, config, font_size, width, height)
+    return text, effective_font_size, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', type=int, default=50, help='random cases per break count')
+    parser.add_argument('--max-breaks', type=int, default=10)
+    parser.add_argument('--font', default='', help='font file (default font if empty)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    text_render.set_font(args.font)
+    config = Config()
+    rng = random.Random(args.seed)
+
+    print(f"{'breaks':>6} {'same text':>10} {'max |Δfont|':>12} {'brute ms':>10} {'dp ms':>8} {'speedup':>8}")
+    for n_breaks in range(1, args.max_breaks + 1):
+        same = 0
+        max_diff = 0.0
+        brute_time = dp_time = 0.0
+        for _ in range(args.cases):
+            horizontal = rng.random() < 0.5
+            region = TextBlock([[[0, 0], [100, 0], [100, 100], [0, 100]]], [''],
+                               translation=make_text(rng, n_breaks), target_lang='en_US',
+                               direction='h' if horizontal else 'v')
+            font_size = rng.randint(16, 40)
+            width, height = rng.uniform(80, 500), rng.uniform(80, 500)
+
+            brute_text, brute_font, t = run_one(optimize_line_breaks_bruteforce, region, config, font_size, width, height)
+            brute_time += t
+            dp_text, dp_font, t = run_one(optimize_line_breaks_for_region, region, config, font_size, width, height)
+            dp_time += t
+
+            same += brute_text == dp_text
+            max_diff = max(max_diff, abs(brute_font - dp_font))
+        print(f"{n_breaks:>6} {same / args.cases:>10.0%} {max_diff:>12.2f} "
+              f"{brute_time / args.cases * 1000:>10.1f} {dp_time / args.cases * 1000:>8.1f} "
+              f"{brute_time / max(dp_time, 1e-9):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
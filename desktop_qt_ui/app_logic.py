@@ -14,6 +14,7 @@ from manga_translator.config import (
     Colorizer,
     Detector,
     Direction,
+    HQImageFormat,
     Inpainter,
     InpaintPrecision,
     Ocr,
@@ -427,6 +428,8 @@ class MainAppLogic(QObject):
                     "no_text_lang_skip": self._t("label_no_text_lang_skip"),
                     "gpt_config": self._t("label_gpt_config"),
                     "high_quality_prompt_path": self._t("label_high_quality_prompt_path"),
+                    "hq_image_format": self._t("label_hq_image_format"),
+                    "hq_image_quality": self._t("label_hq_image_quality"),
                     "use_mocr_merge": self._t("label_use_mocr_merge"),
                     "ocr": self._t("label_ocr"),
                     "use_hybrid_ocr": self._t("label_use_hybrid_ocr"),
@@ -437,6 +440,9 @@ class MainAppLogic(QObject):
                     "merge_gamma": self._t("label_merge_gamma"),
                     "merge_sigma": self._t("label_merge_sigma"),
                     "merge_edge_ratio_threshold": self._t("label_merge_edge_ratio_threshold"),
+                    "ocr_batch_size": self._t("label_ocr_batch_size"),
+                    "ocr_max_pad_ratio": self._t("label_ocr_max_pad_ratio"),
+                    "ocr_pixel_budget": self._t("label_ocr_pixel_budget"),
                     "detector": self._t("label_detector"),
                     "detection_size": self._t("label_detection_size"),
                     "text_threshold": self._t("label_text_threshold"),
@@ -451,10 +457,14 @@ class MainAppLogic(QObject):
                     "box_threshold": self._t("label_box_threshold"),
                     "unclip_ratio": self._t("label_unclip_ratio"),
                     "min_box_area_ratio": self._t("label_min_box_area_ratio"),
+                    "detection_batch_size": self._t("label_detection_batch_size"),
                     "inpainter": self._t("label_inpainter"),
                     "inpainting_size": self._t("label_inpainting_size"),
                     "inpainting_precision": self._t("label_inpainting_precision"),
                     "inpainting_split_ratio": self._t("label_inpainting_split_ratio"),
+                    "inpainting_roi_mode": self._t("label_inpainting_roi_mode"),
+                    "inpainting_roi_padding": self._t("label_inpainting_roi_padding"),
+                    "inpainting_batch_size": self._t("label_inpainting_batch_size"),
                     "renderer": self._t("label_renderer"),
                     "alignment": self._t("label_alignment"),
                     "disable_font_border": self._t("label_disable_font_border"),
@@ -488,6 +498,10 @@ class MainAppLogic(QObject):
                     "verbose": self._t("label_verbose"),
                     "attempts": self._t("label_attempts"),
                     "max_requests_per_minute": self._t("label_max_requests_per_minute"),
+                    "max_concurrent_requests": self._t("label_max_concurrent_requests"),
+                    "enable_translation_memory": self._t("label_enable_translation_memory"),
+                    "translation_memory_ttl_days": self._t("label_translation_memory_ttl_days"),
+                    "translation_memory_max_entries": self._t("label_translation_memory_max_entries"),
                     "ignore_errors": self._t("label_ignore_errors"),
                     "use_gpu": self._t("label_use_gpu"),
                     "use_gpu_limited": self._t("label_use_gpu_limited"),
@@ -501,6 +515,8 @@ class MainAppLogic(QObject):
                     "save_quality": self._t("label_save_quality"),
                     "batch_size": self._t("label_batch_size"),
                     "batch_concurrent": self._t("label_batch_concurrent"),
+                    "batch_pipeline": self._t("label_batch_pipeline"),
+                    "pipeline_queue_size": self._t("label_pipeline_queue_size"),
                     "generate_and_export": self._t("label_generate_and_export"),
                     "last_output_path": self._t("label_last_output_path"),
                     "line_spacing": self._t("label_line_spacing"),
@@ -566,6 +582,7 @@ class MainAppLogic(QObject):
             "colorizer": [member.value for member in Colorizer],
             "inpainter": [member.value for member in Inpainter],
             "inpainting_precision": [member.value for member in InpaintPrecision],
+            "hq_image_format": [member.value for member in HQImageFormat],
             "ocr": [member.value for member in Ocr],
             "secondary_ocr": [member.value for member in Ocr]
         }
@@ -11,7 +11,13 @@ class TranslatorSettings(BaseModel):
     # 相对路径，后端会用BASE_PATH拼接（打包后=_internal，开发时=项目根目录）
     gpt_config: Optional[str] = "examples/gpt_config-example.yaml"
     high_quality_prompt_path: Optional[str] = "dict/prompt_example.json"
+    hq_image_format: str = "png"  # 高质量翻译发送图片的编码格式：png / jpeg / webp
+    hq_image_quality: int = 90
     max_requests_per_minute: int = 0
+    max_concurrent_requests: int = 0  # 同一翻译器和API Key同时进行中的最大请求数，0表示不限制
+    enable_translation_memory: bool = False  # 复用相同原文（同翻译器/语言/提示词）的历史译文
+    translation_memory_ttl_days: int = 30
+    translation_memory_max_entries: int = 100000
     
     @property
     def chatgpt_config(self):
@@ -42,6 +48,9 @@ class OcrSettings(BaseModel):
     merge_gamma: float = 0.8
     merge_sigma: float = 2.5
     merge_edge_ratio_threshold: float = 0.0
+    ocr_batch_size: int = 16  # 48px OCR单次推理的最大文本行数
+    ocr_max_pad_ratio: float = 0.3  # 48px OCR按宽度分桶时允许的最大填充比例
+    ocr_pixel_budget: int = 786432  # 48px OCR单次推理的填充后像素上限，0表示不限制
 
 class DetectorSettings(BaseModel):
     detector: str = "default"
@@ -58,12 +67,16 @@ class DetectorSettings(BaseModel):
     yolo_obb_iou: float = 0.6
     yolo_obb_overlap_threshold: float = 0.1
     min_box_area_ratio: float = 0.0009  # 最小检测框面积占比（相对图片总像素），默认0.09%
+    detection_batch_size: int = 4  # 批量模式下单次检测推理的最大页数，1表示关闭跨页批量检测
 
 class InpainterSettings(BaseModel):
     inpainter: str = "lama_mpe"
     inpainting_size: int = 2048
     inpainting_precision: str = "fp32"
     inpainting_split_ratio: float = 3.0
+    inpainting_roi_mode: bool = False
+    inpainting_roi_padding: int = 64
+    inpainting_batch_size: int = 4  # 同尺寸图片/切块单次修复推理的最大张数，1表示关闭批量修复
 
 class RenderSettings(BaseModel):
     renderer: str = "default"
@@ -119,6 +132,8 @@ class CliSettings(BaseModel):
     save_quality: int = 100
     batch_size: int = 1
     batch_concurrent: bool = False
+    batch_pipeline: bool = False  # 流水线批处理：检测/翻译/渲染跨批次重叠
+    pipeline_queue_size: int = 1
     generate_and_export: bool = False
     colorize_only: bool = False
     upscale_only: bool = False  # 仅超分模式
@@ -81,6 +81,14 @@ class InpaintPrecision(str, Enum):
     def __str__(self):
         return self.name
 
+class HQImageFormat(str, Enum):
+    png = "png"
+    jpeg = "jpeg"
+    webp = "webp"
+
+    def __str__(self):
+        return self.name
+
 class Detector(str, Enum):
     default = "default"
     dbconvnext = "dbconvnext"
@@ -239,7 +247,7 @@ class UpscaleConfig(BaseModel):
     realcugan_model: Optional[str] = None
     """Real-CUGAN model to use when upscaler is set to realcugan"""
     tile_size: Optional[int] = None
-    """Tile size for Real-CUGAN upscaling (default: 400, 0 = process full image without tiling)"""
+    """Tile size for Real-CUGAN / 4x-UltraSharp upscaling (Real-CUGAN default: 400, 4x-UltraSharp default: 0; 0 = process full image without tiling)"""
 
 class TranslatorConfig(BaseModel):
     translator: Translator = Translator.sugoi
@@ -254,6 +262,10 @@ class TranslatorConfig(BaseModel):
     """Path to GPT config file, more info in README"""
     high_quality_prompt_path: Optional[str] = None
     """Path to a JSON file containing custom prompts for high-quality translation."""
+    hq_image_format: HQImageFormat = HQImageFormat.png
+    """Encoding of page images sent to high-quality (multimodal) translators. jpeg/webp produce much smaller requests than png."""
+    hq_image_quality: int = 90
+    """JPEG/WebP quality (1-100) for images sent to high-quality translators. Ignored for png."""
     translator_chain: Optional[str] = None
     """Output of one translator goes in another. Example: --translator-chain "google:JPN;sugoi:ENG"."""
     selective_translation: Optional[str] = None
@@ -266,6 +278,16 @@ class TranslatorConfig(BaseModel):
     # API请求频率限制配置
     max_requests_per_minute: int = 0
     """Maximum API requests per minute. 0 means no limit."""
+    max_concurrent_requests: int = 0
+    """Maximum number of in-flight API requests shared by all instances of a translator and API key. 0 means no limit."""
+    
+    # 翻译记忆配置
+    enable_translation_memory: bool = False
+    """Reuse previous translations of identical source text (same translator, language and prompt) from a persistent SQLite cache"""
+    translation_memory_ttl_days: int = 30
+    """Days before a translation memory entry expires. 0 means never."""
+    translation_memory_max_entries: int = 100000
+    """Maximum number of translation memory entries, least recently used entries are evicted first. 0 means no limit."""
     
     # 译后检查配置项
     enable_post_translation_check: bool = False
@@ -343,6 +365,8 @@ class DetectorConfig(BaseModel):
     """How much to extend text skeleton to form bounding box"""
     min_box_area_ratio: float = 0.0009
     """Minimum detection box area ratio relative to total image pixels (default 0.0009 = 0.09%)"""
+    detection_batch_size: int = 4
+    """Maximum number of pages of similar size detected in one forward pass in batch mode. 1 disables cross-page batching."""
 
 class InpainterConfig(BaseModel):
     inpainter: Inpainter = Inpainter.lama_large
@@ -353,6 +377,12 @@ class InpainterConfig(BaseModel):
     """Inpainting precision for lama, use bf16 while you can."""
     inpainting_split_ratio: float = 3.0
     """Aspect ratio threshold for splitting image into tiles (e.g., 3.0 means split if width/height > 3 or height/width > 3)"""
+    inpainting_roi_mode: bool = False
+    """Only inpaint padded crops around mask components at native resolution instead of the whole page (LaMa models)"""
+    inpainting_roi_padding: int = 64
+    """Context padding in pixels around each mask component in ROI inpainting mode"""
+    inpainting_batch_size: int = 4
+    """Maximum number of same-size images/tiles inpainted in one forward pass (pages of a batch, tiles of a long strip). 1 disables batching."""
 
 class ColorizerConfig(BaseModel):
     colorization_size: int = 576
@@ -383,6 +413,12 @@ class OcrConfig(BaseModel):
     """Textline merge deviation tolerance, higher is more tolerant."""
     merge_edge_ratio_threshold: float = 0.0
     """If a box has two neighbors with edge distance ratio > this value, disconnect the larger distance edge. 0 means disabled."""
+    ocr_batch_size: int = 16
+    """Maximum number of textline crops recognized in one forward pass by the 48px OCR."""
+    ocr_max_pad_ratio: float = 0.3
+    """Maximum fraction of padding pixels in a 48px OCR batch. Crops are grouped by width so one long line doesn't pad the others."""
+    ocr_pixel_budget: int = 786432
+    """Maximum padded pixels (crops x 48 x widest crop) in a 48px OCR batch. 0 disables the budget."""
 
 class Config(BaseModel):
     # General
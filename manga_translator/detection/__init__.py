@@ -1,5 +1,7 @@
+import asyncio
 import numpy as np
 import cv2
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
 from .default import DefaultDetector
@@ -10,8 +12,9 @@ from .craft import CRAFTDetector
 from .none import NoneDetector
 from .yolo_obb import YOLOOBBDetector
 from .common import CommonDetector, OfflineDetector
+from .nms import aabb_candidate_pairs
 from ..config import Detector
-from ..utils import Quadrilateral
+from ..utils import Quadrilateral, QuadrilateralBatch
 
 DETECTORS = {
     Detector.default: DefaultDetector,
@@ -22,6 +25,7 @@ DETECTORS = {
     Detector.none: NoneDetector,
 }
 detector_cache = {}
+_hybrid_executor = None
 
 def get_detector(key: Detector, *args, **kwargs) -> CommonDetector:
     if key not in DETECTORS:
@@ -31,6 +35,20 @@ def get_detector(key: Detector, *args, **kwargs) -> CommonDetector:
         detector_cache[key] = detector(*args, **kwargs)
     return detector_cache[key]
 
+def _get_hybrid_executor() -> ThreadPoolExecutor:
+    """混合检测中辅助检测器使用的工作线程（单线程，保证onnxruntime会话串行使用）"""
+    global _hybrid_executor
+    if _hybrid_executor is None:
+        _hybrid_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='hybrid_detection')
+    return _hybrid_executor
+
+def _run_detect_sync(detector: CommonDetector, detect_args: tuple):
+    """在工作线程中运行检测协程（检测器内部没有真正的IO等待，可在独立事件循环中执行）"""
+    return asyncio.run(detector.detect(*detect_args))
+
+def _run_detect_batch_sync(detector: CommonDetector, detect_args: tuple):
+    return asyncio.run(detector.detect_batch(*detect_args))
+
 async def prepare(detector_key: Detector):
     detector = get_detector(detector_key)
     if isinstance(detector, OfflineDetector):
@@ -52,44 +70,130 @@ async def dispatch(detector_key: Detector, image: np.ndarray, detect_size: int,
     detector = get_detector(detector_key)
     if isinstance(detector, OfflineDetector):
         await detector.load(device)
-    main_textlines, mask, raw_image = await detector.detect(image, detect_size, text_threshold, box_threshold, unclip_ratio, invert, gamma_correct, rotate, auto_rotate, verbose, min_box_area_ratio)
-    
+
     # 如果不启用YOLO OBB，直接返回主检测器结果
     if not use_yolo_obb:
-        return main_textlines, mask, raw_image
-    
-    # YOLO OBB辅助检测
+        return await detector.detect(image, detect_size, text_threshold, box_threshold, unclip_ratio, invert, gamma_correct, rotate, auto_rotate, verbose, min_box_area_ratio)
+
+    # YOLO OBB辅助检测：在独立线程中与主检测器并发运行
+    # YOLO 通过 onnxruntime 推理，推理期间释放GIL，不与torch主检测器争抢
+    yolo_future = None
     try:
         yolo_detector = get_detector_instance('yolo_obb', YOLOOBBDetector)
         await yolo_detector.load(device)
-        
         # YOLO OBB检测（使用yolo_obb_conf作为text_threshold）
-        yolo_textlines, _, _ = await yolo_detector.detect(
-            image, detect_size, yolo_obb_conf, box_threshold, unclip_ratio,
-            invert, gamma_correct, rotate, auto_rotate, verbose, min_box_area_ratio
+        yolo_future = asyncio.get_running_loop().run_in_executor(
+            _get_hybrid_executor(), _run_detect_sync, yolo_detector,
+            (image, detect_size, yolo_obb_conf, box_threshold, unclip_ratio,
+             invert, gamma_correct, rotate, auto_rotate, verbose, min_box_area_ratio)
         )
-        
-        # 智能合并：YOLO框可以替换过小的主检测器框，或添加新框
-        combined_textlines = merge_detection_boxes(yolo_textlines, main_textlines, overlap_threshold=yolo_obb_overlap_threshold)
-        
-        replaced_count = len(main_textlines) + len(yolo_textlines) - len(combined_textlines)
-        detector.logger.info(f"混合检测: 主检测器={len(main_textlines)}, YOLO OBB={len(yolo_textlines)}, "
-                           f"替换={replaced_count}, 总计={len(combined_textlines)}")
-        
-        # 生成调试图片（如果verbose=True）
-        debug_img = None
-        if verbose:
-            debug_img = draw_detection_debug_image(image, main_textlines, yolo_textlines, yolo_obb_overlap_threshold)
-            detector.logger.info("已生成混合检测调试图片")
-        
-        return combined_textlines, mask, debug_img if debug_img is not None else raw_image
-    
+    except Exception as e:
+        detector.logger.error(f"YOLO OBB辅助检测失败: {e}")
+
+    try:
+        main_textlines, mask, raw_image = await detector.detect(image, detect_size, text_threshold, box_threshold, unclip_ratio, invert, gamma_correct, rotate, auto_rotate, verbose, min_box_area_ratio)
+    except BaseException:
+        if yolo_future is not None:
+            # 主检测失败时仍需取回YOLO结果，避免线程中的异常无人处理
+            yolo_future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        raise
+
+    if yolo_future is None:
+        return main_textlines, mask, raw_image
+
+    # 等待两个检测器都完成后再合并
+    try:
+        yolo_textlines, _, _ = await yolo_future
+        return _combine_hybrid_results(detector, image, (main_textlines, mask, raw_image), yolo_textlines,
+                                       yolo_obb_overlap_threshold, verbose)
     except Exception as e:
         detector.logger.error(f"YOLO OBB辅助检测失败: {e}")
         # 失败时返回主检测器结果
         return main_textlines, mask, raw_image
 
 
+async def dispatch_batch(detector_key: Detector, images: List[np.ndarray], detect_size: int, text_threshold: float, box_threshold: float, unclip_ratio: float,
+                         invert: bool, gamma_correct: bool, rotate: bool, auto_rotate: bool = False, device: str = 'cpu', verbose: bool = False,
+                         use_yolo_obb: bool = False, yolo_obb_conf: float = 0.4, yolo_obb_iou: float = 0.6, yolo_obb_overlap_threshold: float = 0.1, min_box_area_ratio: float = 0.0009,
+                         max_batch_size: int = 4):
+    """
+    批量检测调度函数：多页尺寸相近的图片合并为一次前向推理
+
+    参数与 dispatch 相同，返回与输入顺序一致的 (textlines, mask, raw_image) 列表。
+    不支持批量推理的检测器会自动逐页检测。
+    
+    Args:
+        max_batch_size: 单次前向推理最多包含的页数
+    """
+    detector = get_detector(detector_key)
+    if isinstance(detector, OfflineDetector):
+        await detector.load(device)
+
+    detect_args = (detect_size, text_threshold, box_threshold, unclip_ratio, invert, gamma_correct, rotate, auto_rotate, verbose, min_box_area_ratio)
+
+    if not use_yolo_obb:
+        return await detector.detect_batch(images, *detect_args, max_batch_size=max_batch_size)
+
+    # YOLO OBB辅助检测在工作线程中逐页运行，与主检测器的批量推理并发
+    yolo_future = None
+    try:
+        yolo_detector = get_detector_instance('yolo_obb', YOLOOBBDetector)
+        await yolo_detector.load(device)
+        yolo_args = (images, detect_size, yolo_obb_conf, *detect_args[2:])
+        yolo_future = asyncio.get_running_loop().run_in_executor(
+            _get_hybrid_executor(), _run_detect_batch_sync, yolo_detector, yolo_args
+        )
+    except Exception as e:
+        detector.logger.error(f"YOLO OBB辅助检测失败: {e}")
+
+    try:
+        main_results = await detector.detect_batch(images, *detect_args, max_batch_size=max_batch_size)
+    except BaseException:
+        if yolo_future is not None:
+            yolo_future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        raise
+
+    if yolo_future is None:
+        return main_results
+
+    try:
+        yolo_results = await yolo_future
+    except Exception as e:
+        detector.logger.error(f"YOLO OBB辅助检测失败: {e}")
+        return main_results
+
+    combined = []
+    for image, main_result, (yolo_textlines, _, _) in zip(images, main_results, yolo_results):
+        try:
+            combined.append(_combine_hybrid_results(detector, image, main_result, yolo_textlines,
+                                                    yolo_obb_overlap_threshold, verbose))
+        except Exception as e:
+            detector.logger.error(f"YOLO OBB辅助检测失败: {e}")
+            combined.append(main_result)
+    return combined
+
+
+def _combine_hybrid_results(detector: CommonDetector, image: np.ndarray, main_result: tuple, yolo_textlines: List[Quadrilateral],
+                            overlap_threshold: float, verbose: bool):
+    """合并主检测器与YOLO OBB的结果，返回 (textlines, mask, raw_image)"""
+    main_textlines, mask, raw_image = main_result
+
+    # 智能合并：YOLO框可以替换过小的主检测器框，或添加新框
+    combined_textlines = merge_detection_boxes(yolo_textlines, main_textlines, overlap_threshold=overlap_threshold)
+    
+    replaced_count = len(main_textlines) + len(yolo_textlines) - len(combined_textlines)
+    detector.logger.info(f"混合检测: 主检测器={len(main_textlines)}, YOLO OBB={len(yolo_textlines)}, "
+                       f"替换={replaced_count}, 总计={len(combined_textlines)}")
+    
+    # 生成调试图片（如果verbose=True）
+    debug_img = None
+    if verbose:
+        debug_img = draw_detection_debug_image(image, main_textlines, yolo_textlines, overlap_threshold)
+        detector.logger.info("已生成混合检测调试图片")
+    
+    return combined_textlines, mask, debug_img if debug_img is not None else raw_image
+
+
 def get_detector_instance(key: str, detector_class):
     """获取或创建检测器实例（用于辅助检测器）"""
     if key not in detector_cache:
@@ -126,75 +230,46 @@ def merge_detection_boxes(yolo_boxes: List[Quadrilateral], main_boxes: List[Quad
     main_boxes_to_remove = set()
     # 标记要移除的YOLO框索引
     yolo_boxes_to_remove = set()
-    # 要添加的YOLO框（用于替换）
-    yolo_boxes_to_add_set = set()  # 使用set避免重复
-    
-    for yolo_idx, yolo_box in enumerate(yolo_boxes):
-        # 计算YOLO框的AABB和面积
-        yolo_min_x = np.min(yolo_box.pts[:, 0])
-        yolo_max_x = np.max(yolo_box.pts[:, 0])
-        yolo_min_y = np.min(yolo_box.pts[:, 1])
-        yolo_max_y = np.max(yolo_box.pts[:, 1])
-        yolo_area = (yolo_max_x - yolo_min_x) * (yolo_max_y - yolo_min_y)
-        
-        # 检查这个YOLO框是否满足任何替换条件
-        can_replace = False
-        max_overlap_ratio_with_others = 0.0  # 与其他未替换主框的最大重叠率
-        replaced_main_indices = set()  # 被这个YOLO框替换的主框索引
-        
-        for main_idx, main_box in enumerate(main_boxes):
-            # 计算主检测器框的AABB和面积
-            main_min_x = np.min(main_box.pts[:, 0])
-            main_max_x = np.max(main_box.pts[:, 0])
-            main_min_y = np.min(main_box.pts[:, 1])
-            main_max_y = np.max(main_box.pts[:, 1])
-            main_area = (main_max_x - main_min_x) * (main_max_y - main_min_y)
-            
-            # 检查是否有重叠
-            if not (yolo_max_x < main_min_x or yolo_min_x > main_max_x or
-                    yolo_max_y < main_min_y or yolo_min_y > main_max_y):
-                # 有重叠，计算重叠面积
-                inter_min_x = max(yolo_min_x, main_min_x)
-                inter_max_x = min(yolo_max_x, main_max_x)
-                inter_min_y = max(yolo_min_y, main_min_y)
-                inter_max_y = min(yolo_max_y, main_max_y)
-                inter_area = (inter_max_x - inter_min_x) * (inter_max_y - inter_min_y)
-                
-                # 计算重叠率（相对于较小框的比例）
-                overlap_ratio = inter_area / min(yolo_area, main_area) if min(yolo_area, main_area) > 0 else 0
-                
-                # 检查YOLO框是否完全包含主检测器框
-                contains = (yolo_min_x <= main_min_x and yolo_max_x >= main_max_x and
-                           yolo_min_y <= main_min_y and yolo_max_y >= main_max_y)
-                
-                # 检查面积条件
-                area_ratio = yolo_area / main_area if main_area > 0 else 0
-                
-                if contains and area_ratio >= 2.0:
-                    # 满足替换条件：标记主检测器框为待删除，记录索引
-                    replaced_main_indices.add(main_idx)
-                    can_replace = True
-                else:
-                    # 不满足替换条件，记录与其他主框的重叠率
-                    max_overlap_ratio_with_others = max(max_overlap_ratio_with_others, overlap_ratio)
-        
-        # 决定这个YOLO框的命运
-        if can_replace:
-            # 满足了替换条件，但还需要检查与其他未替换主框的重叠率
-            if max_overlap_ratio_with_others >= overlap_threshold:
-                # 与其他主框重叠率过高，删除这个YOLO框，不进行替换
-                yolo_boxes_to_remove.add(yolo_idx)
-            else:
-                # 可以安全替换：删除被替换的主框，添加YOLO框
-                for main_idx in replaced_main_indices:
-                    main_boxes_to_remove.add(main_idx)
-                yolo_boxes_to_add_set.add(yolo_idx)
-        else:
-            # 不满足替换条件，按原有逻辑处理
-            if max_overlap_ratio_with_others >= overlap_threshold:
-                # 有重叠且重叠率 >= 阈值，删除这个YOLO框
-                yolo_boxes_to_remove.add(yolo_idx)
-            # else: 没有重叠或重叠率 < 阈值，会在后面作为新框添加
+
+    # 计算所有框的AABB和面积
+    yolo_aabbs = QuadrilateralBatch.from_quadrilaterals(yolo_boxes).aabb
+    main_aabbs = QuadrilateralBatch.from_quadrilaterals(main_boxes).aabb
+    yolo_areas = (yolo_aabbs[:, 2] - yolo_aabbs[:, 0]) * (yolo_aabbs[:, 3] - yolo_aabbs[:, 1])
+    main_areas = (main_aabbs[:, 2] - main_aabbs[:, 0]) * (main_aabbs[:, 3] - main_aabbs[:, 1])
+
+    # 只对AABB有重叠的 (YOLO框, 主框) 候选对进行判断，不重叠的对不影响任何决策
+    yolo_idx, main_idx = aabb_candidate_pairs(yolo_aabbs, main_aabbs)
+    ya, ma = yolo_aabbs[yolo_idx], main_aabbs[main_idx]
+    y_area, m_area = yolo_areas[yolo_idx], main_areas[main_idx]
+
+    # 计算重叠面积和重叠率（相对于较小框的比例）
+    inter_area = ((np.minimum(ya[:, 2], ma[:, 2]) - np.maximum(ya[:, 0], ma[:, 0])) *
+                  (np.minimum(ya[:, 3], ma[:, 3]) - np.maximum(ya[:, 1], ma[:, 1])))
+    min_area = np.minimum(y_area, m_area)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overlap_ratio = np.where(min_area > 0, inter_area / min_area, 0.0)
+        # 检查面积条件
+        area_ratio = np.where(m_area > 0, y_area / m_area, 0.0)
+
+    # 检查YOLO框是否完全包含主检测器框
+    contains = ((ya[:, 0] <= ma[:, 0]) & (ya[:, 2] >= ma[:, 2]) &
+                (ya[:, 1] <= ma[:, 1]) & (ya[:, 3] >= ma[:, 3]))
+    replace_pair = contains & (area_ratio >= 2.0)
+
+    # 满足替换条件的YOLO框，以及每个YOLO框与其他（不可替换）主框的最大重叠率
+    can_replace = np.zeros(len(yolo_boxes), dtype=bool)
+    can_replace[yolo_idx[replace_pair]] = True
+    max_overlap_ratio_with_others = np.zeros(len(yolo_boxes), dtype=np.float64)
+    np.maximum.at(max_overlap_ratio_with_others, yolo_idx[~replace_pair], overlap_ratio[~replace_pair])
+
+    for y_idx in range(len(yolo_boxes)):
+        if max_overlap_ratio_with_others[y_idx] >= overlap_threshold:
+            # 与其他主框重叠率过高：无论是否满足替换条件，都删除这个YOLO框
+            yolo_boxes_to_remove.add(y_idx)
+        elif can_replace[y_idx]:
+            # 可以安全替换：删除被替换的主框，保留YOLO框
+            main_boxes_to_remove.update(main_idx[replace_pair & (yolo_idx == y_idx)].tolist())
+        # else: 没有重叠或重叠率 < 阈值，会在后面作为新框添加
     
     # 构建最终结果
     result = []
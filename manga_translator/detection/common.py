@@ -1,10 +1,11 @@
 from abc import abstractmethod
-from typing import List, Tuple
+from typing import Callable, List, Tuple
 from collections import Counter
 import numpy as np
 import cv2
 
-from ..utils import InfererModule, ModelWrapper, Quadrilateral
+from .default_utils import imgproc, dbnet_utils, craft_utils
+from ..utils import InfererModule, ModelWrapper, Quadrilateral, det_rearrange_forward
 
 
 class CommonDetector(InfererModule):
@@ -68,6 +69,38 @@ class CommonDetector(InfererModule):
                       unclip_ratio: float, verbose: bool = False) -> Tuple[List[Quadrilateral], np.ndarray, np.ndarray]:
         pass
 
+    async def detect_batch(self, images: List[np.ndarray], detect_size: int, text_threshold: float, box_threshold: float, unclip_ratio: float,
+                           invert: bool, gamma_correct: bool, rotate: bool, auto_rotate: bool = False, verbose: bool = False,
+                           min_box_area_ratio: float = 0.0009, max_batch_size: int = 4) -> List[Tuple[List[Quadrilateral], np.ndarray, np.ndarray]]:
+        '''
+        Batched version of `detect`. Returns one (textlines, raw_mask, mask) tuple per image, in input order.
+
+        Pages that need per-image filters (rotation, inversion, gamma, border) or debug output
+        fall back to `detect`; the rest go through `_detect_batch` which detectors can override
+        to run a single forward pass for up to `max_batch_size` pages.
+        '''
+        if len(images) < 2 or rotate or auto_rotate or invert or gamma_correct or verbose:
+            return [await self.detect(image, detect_size, text_threshold, box_threshold, unclip_ratio, invert, gamma_correct,
+                                      rotate, auto_rotate, verbose, min_box_area_ratio) for image in images]
+
+        minimum_image_size = 400
+        results = [None] * len(images)
+        batch_indices = [i for i, image in enumerate(images) if min(image.shape[:2]) >= minimum_image_size]
+        if batch_indices:
+            batch_results = await self._detect_batch([images[i] for i in batch_indices], detect_size, text_threshold,
+                                                     box_threshold, unclip_ratio, verbose, max(1, max_batch_size))
+            for i, result in zip(batch_indices, batch_results):
+                results[i] = result
+        for i, image in enumerate(images):
+            if results[i] is None:
+                results[i] = await self.detect(image, detect_size, text_threshold, box_threshold, unclip_ratio, invert, gamma_correct,
+                                               rotate, auto_rotate, verbose, min_box_area_ratio)
+        return results
+
+    async def _detect_batch(self, images: List[np.ndarray], detect_size: int, text_threshold: float, box_threshold: float,
+                            unclip_ratio: float, verbose: bool = False, max_batch_size: int = 4) -> List[Tuple[List[Quadrilateral], np.ndarray, np.ndarray]]:
+        return [await self._detect(image, detect_size, text_threshold, box_threshold, unclip_ratio, verbose) for image in images]
+
     def _add_border(self, image: np.ndarray, target_side_length: int):
         old_h, old_w = image.shape[:2]
         new_w = new_h = max(old_w, old_h, target_side_length)
@@ -157,3 +190,115 @@ class OfflineDetector(CommonDetector, ModelWrapper):
     async def _infer(self, image: np.ndarray, detect_size: int, text_threshold: float, box_threshold: float,
                        unclip_ratio: float, verbose: bool = False):
         pass
+
+    async def _detect_batch(self, images: List[np.ndarray], *args, **kwargs):
+        if not self.is_loaded():
+            raise Exception(f'{self._key}: Tried to forward pass without having loaded the model.')
+        return await self._infer_batch(images, *args, **kwargs)
+
+    async def _infer_batch(self, images: List[np.ndarray], detect_size: int, text_threshold: float, box_threshold: float,
+                           unclip_ratio: float, verbose: bool = False, max_batch_size: int = 4):
+        """May be overwritten by detectors that support multi-page forward passes"""
+        return [await self._infer(image, detect_size, text_threshold, box_threshold, unclip_ratio, verbose) for image in images]
+
+
+def group_by_canvas(shapes: List[Tuple[int, int]], max_batch_size: int, max_pad_ratio: float = 0.25) -> List[List[int]]:
+    """
+    Groups image shapes (h, w) for letterboxed batching.
+
+    Shapes are sorted by size and greedily packed while the shared canvas (max h x max w)
+    wastes at most `max_pad_ratio` of its area on padding. Returns lists of indices into `shapes`.
+    """
+    order = sorted(range(len(shapes)), key=lambda i: (shapes[i][0], shapes[i][1]))
+    groups = []
+    current = []
+    for idx in order:
+        candidate = current + [idx]
+        canvas_h = max(shapes[i][0] for i in candidate)
+        canvas_w = max(shapes[i][1] for i in candidate)
+        used = sum(shapes[i][0] * shapes[i][1] for i in candidate)
+        waste = 1 - used / (canvas_h * canvas_w * len(candidate))
+        if current and (len(candidate) > max_batch_size or waste > max_pad_ratio):
+            groups.append(current)
+            current = [idx]
+        else:
+            current = candidate
+    if current:
+        groups.append(current)
+    return groups
+
+
+def letterbox_batch(images: List[np.ndarray], pad_value: int = 0) -> np.ndarray:
+    """Pastes images top-left aligned into one (N, H, W, C) canvas sized to the largest image."""
+    canvas_h = max(img.shape[0] for img in images)
+    canvas_w = max(img.shape[1] for img in images)
+    batch = np.full((len(images), canvas_h, canvas_w, images[0].shape[2]), pad_value, dtype=images[0].dtype)
+    for i, img in enumerate(images):
+        batch[i, :img.shape[0], :img.shape[1]] = img
+    return batch
+
+
+def db_infer_batch(images: List[np.ndarray], forward: Callable, postprocess: Callable, detect_size: int,
+                   max_batch_size: int, device: str, logger, verbose: bool = False) -> list:
+    """
+    Shared multi-page forward pass for DBNet-style detectors.
+
+    Pages are resized exactly like the single-page path, letterboxed (top-left) into a shared canvas
+    and run `max_batch_size` at a time through `forward(batch, device) -> (db, mask)`. The DB/mask maps
+    are cropped back per page and handed to
+    `postprocess(image, db, mask, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h)`,
+    so the per-page post-processing is identical to the single-page path.
+    """
+    results = [None] * len(images)
+    pending = []
+    for i, image in enumerate(images):
+        db, mask = det_rearrange_forward(image, forward, detect_size, 4, device=device, verbose=verbose)
+        if db is not None:
+            # Extreme aspect ratio pages are already processed as patches
+            img_h, img_w = image.shape[:2]
+            results[i] = postprocess(image, db, mask, img_h, img_w, 1, 1, 0, 0)
+            continue
+        img_resized, target_ratio, _, pad_w, pad_h = imgproc.resize_aspect_ratio(cv2.bilateralFilter(image, 17, 80, 80), detect_size, cv2.INTER_LINEAR, mag_ratio = 1)
+        pending.append((i, img_resized, target_ratio, pad_w, pad_h))
+
+    for group in group_by_canvas([item[1].shape[:2] for item in pending], max_batch_size):
+        items = [pending[k] for k in group]
+        batch = letterbox_batch([item[1] for item in items])
+        canvas_h, canvas_w = batch.shape[1:3]
+        logger.info(f'Batched detection: {len(items)} pages, canvas {canvas_w}x{canvas_h}')
+        db, mask = forward(batch, device)
+        for k, (i, img_resized, target_ratio, pad_w, pad_h) in enumerate(items):
+            img_resized_h, img_resized_w = img_resized.shape[:2]
+            # Output maps are a fixed fraction of the input resolution
+            db_k = np.ascontiguousarray(db[k:k + 1, :, :img_resized_h * db.shape[2] // canvas_h, :img_resized_w * db.shape[3] // canvas_w])
+            mask_k = np.ascontiguousarray(mask[k:k + 1, :, :img_resized_h * mask.shape[2] // canvas_h, :img_resized_w * mask.shape[3] // canvas_w])
+            ratio_h = ratio_w = 1 / target_ratio
+            results[i] = postprocess(images[i], db_k, mask_k, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h)
+    return results
+
+
+def db_postprocess(db: np.ndarray, mask: np.ndarray, img_resized_h: int, img_resized_w: int, ratio_w: float, ratio_h: float,
+                   pad_w: int, pad_h: int, text_threshold: float, box_threshold: float, unclip_ratio: float) -> Tuple[List[Quadrilateral], np.ndarray]:
+    """Turns the DB map of one page into textlines and the mask map (2D) into a raw mask at the original resolution."""
+    det = dbnet_utils.SegDetectorRepresenter(text_threshold, box_threshold, unclip_ratio=unclip_ratio)
+    boxes, scores = det({'shape':[(img_resized_h, img_resized_w)]}, db)
+    boxes, scores = boxes[0], scores[0]
+    if boxes.size == 0:
+        polys = []
+        filtered_scores = []
+    else:
+        idx = boxes.reshape(boxes.shape[0], -1).sum(axis=1) > 0
+        polys, filtered_scores = boxes[idx], scores[idx]
+        polys = polys.astype(np.float64)
+        polys = craft_utils.adjustResultCoordinates(polys, ratio_w, ratio_h, ratio_net=1)
+        polys = polys.astype(np.int64)
+
+    textlines = [Quadrilateral(pts.astype(int), '', score) for pts, score in zip(polys, filtered_scores)]
+
+    mask_resized = cv2.resize(mask, (mask.shape[1] * 2, mask.shape[0] * 2), interpolation=cv2.INTER_LINEAR)
+    if pad_h > 0:
+        mask_resized = mask_resized[:-pad_h, :]
+    elif pad_w > 0:
+        mask_resized = mask_resized[:, :-pad_w]
+    raw_mask = np.clip(mask_resized * 255, 0, 255).astype(np.uint8)
+    return textlines, raw_mask
@@ -1,7 +1,7 @@
 
 from functools import partial
 import shutil
-from typing import Callable, Optional, Tuple, Union
+from typing import Callable, List, Optional, Tuple, Union
 import cv2
 import numpy as np
 import torch
@@ -491,9 +491,9 @@ class DBNetConvNext(nn.Module) :
 		return self.conv_db(up8), self.conv_mask(up4)
 
 import os
-from .default_utils import imgproc, dbnet_utils, craft_utils
-from .common import OfflineDetector
-from ..utils import TextBlock, Quadrilateral, det_rearrange_forward
+from .default_utils import imgproc
+from .common import OfflineDetector, db_infer_batch, db_postprocess
+from ..utils import TextBlock, det_rearrange_forward
 
 MODEL = None
 def det_batch_forward_default(batch: np.ndarray, device: str):
@@ -556,28 +556,23 @@ class DBConvNextDetector(OfflineDetector):
             pad_h = pad_w = 0
         self.logger.info(f'Detection resolution: {img_resized_w}x{img_resized_h}')
 
-        mask = mask[0, 0, :, :]
-        det = dbnet_utils.SegDetectorRepresenter(text_threshold, box_threshold, unclip_ratio=unclip_ratio)
-        # boxes, scores = det({'shape': [(img_resized.shape[0], img_resized.shape[1])]}, db)
-        boxes, scores = det({'shape':[(img_resized_h, img_resized_w)]}, db)
-        boxes, scores = boxes[0], scores[0]
-        if boxes.size == 0:
-            polys = []
-        else:
-            idx = boxes.reshape(boxes.shape[0], -1).sum(axis=1) > 0
-            polys, _ = boxes[idx], scores[idx]
-            polys = polys.astype(np.float64)
-            polys = craft_utils.adjustResultCoordinates(polys, ratio_w, ratio_h, ratio_net=1)
-            polys = polys.astype(np.int64)
-
-        textlines = [Quadrilateral(pts.astype(int), '', score) for pts, score in zip(polys, scores)]
+        return self._postprocess(image, db, mask, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h,
+                                 text_threshold, box_threshold, unclip_ratio, verbose)
+
+    async def _infer_batch(self, images: List[np.ndarray], detect_size: int, text_threshold: float, box_threshold: float,
+                           unclip_ratio: float, verbose: bool = False, max_batch_size: int = 4):
+        def postprocess(image, db, mask, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h):
+            return self._postprocess(image, db, mask, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h,
+                                     text_threshold, box_threshold, unclip_ratio, verbose)
+        return db_infer_batch(images, det_batch_forward_default, postprocess, detect_size, max_batch_size,
+                              self.device, self.logger, verbose)
+
+    def _postprocess(self, image: np.ndarray, db: np.ndarray, mask: np.ndarray, img_resized_h: int, img_resized_w: int,
+                     ratio_w: float, ratio_h: float, pad_w: int, pad_h: int,
+                     text_threshold: float, box_threshold: float, unclip_ratio: float, verbose: bool = False):
+        textlines, raw_mask = db_postprocess(db, mask[0, 0, :, :], img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h,
+                                             text_threshold, box_threshold, unclip_ratio)
         textlines = list(filter(lambda q: q.area > 16, textlines))  # 保留最小面积过滤
-        mask_resized = cv2.resize(mask, (mask.shape[1] * 2, mask.shape[0] * 2), interpolation=cv2.INTER_LINEAR)
-        if pad_h > 0:
-            mask_resized = mask_resized[:-pad_h, :]
-        elif pad_w > 0:
-            mask_resized = mask_resized[:, :-pad_w]
-        raw_mask = np.clip(mask_resized * 255, 0, 255).astype(np.uint8)
 
         # if verbose:
         #     img_bbox_raw = np.copy(image)
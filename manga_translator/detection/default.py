@@ -7,8 +7,8 @@ import einops
 from typing import List, Tuple
 
 from .default_utils.DBNet_resnet34 import TextDetection as TextDetectionDefault
-from .default_utils import imgproc, dbnet_utils, craft_utils
-from .common import OfflineDetector
+from .default_utils import imgproc, craft_utils
+from .common import OfflineDetector, db_infer_batch, db_postprocess
 from ..utils import TextBlock, Quadrilateral, det_rearrange_forward, imwrite_unicode
 from ..utils.generic import BASE_PATH
 
@@ -77,6 +77,20 @@ class DefaultDetector(OfflineDetector):
             pad_h = pad_w = 0
         self.logger.info(f'Detection resolution: {img_resized_w}x{img_resized_h}')
 
+        return self._postprocess(image, db, mask, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h,
+                                 text_threshold, box_threshold, unclip_ratio, verbose)
+
+    async def _infer_batch(self, images: List[np.ndarray], detect_size: int, text_threshold: float, box_threshold: float,
+                           unclip_ratio: float, verbose: bool = False, max_batch_size: int = 4):
+        def postprocess(image, db, mask, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h):
+            return self._postprocess(image, db, mask, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h,
+                                     text_threshold, box_threshold, unclip_ratio, verbose)
+        return db_infer_batch(images, det_batch_forward_default, postprocess, detect_size, max_batch_size,
+                              self.device, self.logger, verbose)
+
+    def _postprocess(self, image: np.ndarray, db: np.ndarray, mask: np.ndarray, img_resized_h: int, img_resized_w: int,
+                     ratio_w: float, ratio_h: float, pad_w: int, pad_h: int,
+                     text_threshold: float, box_threshold: float, unclip_ratio: float, verbose: bool = False):
         mask = mask[0, 0, :, :]
         
         # 在verbose模式下，从mask直接提取所有连通区域用于调试图
@@ -187,31 +201,9 @@ class DefaultDetector(OfflineDetector):
             except Exception as e:
                 self.logger.error(f'Failed to create bbox debug image from mask: {e}')
         
-        # 正常的检测流程（使用box_threshold）
-        det = dbnet_utils.SegDetectorRepresenter(text_threshold, box_threshold, unclip_ratio=unclip_ratio)
-        boxes, scores = det({'shape':[(img_resized_h, img_resized_w)]}, db)
-        boxes, scores = boxes[0], scores[0]
-        
-        # 过滤boxes
-        if boxes.size == 0:
-            polys = []
-            filtered_scores = []
-        else:
-            idx = boxes.reshape(boxes.shape[0], -1).sum(axis=1) > 0
-            polys, filtered_scores = boxes[idx], scores[idx]
-            polys = polys.astype(np.float64)
-            polys = craft_utils.adjustResultCoordinates(polys, ratio_w, ratio_h, ratio_net=1)
-            polys = polys.astype(np.int64)
-
-        textlines = [Quadrilateral(pts.astype(int), '', score) for pts, score in zip(polys, filtered_scores)]
-        
-        # 使用mask生成raw_mask（用于inpainting修复）
-        mask_resized = cv2.resize(mask, (mask.shape[1] * 2, mask.shape[0] * 2), interpolation=cv2.INTER_LINEAR)
-        if pad_h > 0:
-            mask_resized = mask_resized[:-pad_h, :]
-        elif pad_w > 0:
-            mask_resized = mask_resized[:, :-pad_w]
-        raw_mask = np.clip(mask_resized * 255, 0, 255).astype(np.uint8)
+        # 正常的检测流程（使用box_threshold），同时使用mask生成raw_mask（用于inpainting修复）
+        textlines, raw_mask = db_postprocess(db, mask, img_resized_h, img_resized_w, ratio_w, ratio_h, pad_w, pad_h,
+                                             text_threshold, box_threshold, unclip_ratio)
         
         # 在verbose模式下，同时生成db版本用于对比
         if verbose:
@@ -0,0 +1,114 @@
+"""
+检测框去重引擎
+
+先用轴对齐包围盒（AABB）+ STRtree 做空间预筛选，只对包围盒相交的候选对计算精确的多边形 IoU，
+避免对所有框两两构建 shapely 多边形（O(n²) 次 shapely 调用）。
+主检测器的 NMS 与混合检测的 merge_detection_boxes 共用这里的候选对生成。
+"""
+from typing import List, Optional, Tuple
+
+import numpy as np
+import shapely
+
+from ..utils import Quadrilateral, QuadrilateralBatch
+
+
+def _build_aabb_tree(aabbs: np.ndarray) -> shapely.STRtree:
+    return shapely.STRtree(shapely.box(aabbs[:, 0], aabbs[:, 1], aabbs[:, 2], aabbs[:, 3]))
+
+
+def aabb_candidate_pairs(aabbs_a: np.ndarray, aabbs_b: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    返回包围盒相交（闭区间，接触也算相交）的候选对索引。
+
+    Args:
+        aabbs_a: (N, 4) 包围盒
+        aabbs_b: (M, 4) 包围盒；为 None 时在 aabbs_a 内部求自身候选对，且只返回 i < j 的对
+
+    Returns:
+        (ia, ib) 两个等长的索引数组，按 (ia, ib) 升序排列
+    """
+    self_pairs = aabbs_b is None
+    if self_pairs:
+        aabbs_b = aabbs_a
+    if len(aabbs_a) == 0 or len(aabbs_b) == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+
+    tree = _build_aabb_tree(aabbs_b)
+    # 不带 predicate 的查询只比较包围盒（envelope），正好是我们要的 AABB 相交测试
+    ia, ib = tree.query(shapely.box(aabbs_a[:, 0], aabbs_a[:, 1], aabbs_a[:, 2], aabbs_a[:, 3]))
+
+    # 树查询结果再用闭区间测试精确过滤一次，保证与逐对比较的语义一致
+    a, b = aabbs_a[ia], aabbs_b[ib]
+    overlap = ~((a[:, 2] < b[:, 0]) | (a[:, 0] > b[:, 2]) | (a[:, 3] < b[:, 1]) | (a[:, 1] > b[:, 3]))
+    if self_pairs:
+        overlap &= ia < ib
+    ia, ib = ia[overlap], ib[overlap]
+
+    order = np.lexsort((ib, ia))
+    return ia[order], ib[order]
+
+
+def polygon_iou_pairs(pts_a: np.ndarray, pts_b: np.ndarray, ia: np.ndarray, ib: np.ndarray) -> np.ndarray:
+    """
+    对候选对计算精确的多边形 IoU（向量化 shapely 调用）。
+    任一多边形无效时 IoU 记为 0，与逐对实现保持一致。
+    """
+    if len(ia) == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    polys_a = shapely.polygons(pts_a)
+    polys_b = polys_a if pts_b is pts_a else shapely.polygons(pts_b)
+    valid_a = shapely.is_valid(polys_a)
+    valid_b = valid_a if polys_b is polys_a else shapely.is_valid(polys_b)
+
+    pa, pb = polys_a[ia], polys_b[ib]
+    valid = valid_a[ia] & valid_b[ib]
+
+    ious = np.zeros(len(ia), dtype=np.float64)
+    if not valid.any():
+        return ious
+    inter = shapely.area(shapely.intersection(pa[valid], pb[valid]))
+    union = shapely.area(shapely.union(pa[valid], pb[valid]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ious[valid] = np.where(union > 0, inter / union, 0.0)
+    return ious
+
+
+def nms_quadrilaterals(textlines: List[Quadrilateral], iou_threshold: float = 0.9) -> List[Quadrilateral]:
+    """
+    贪心 NMS：按置信度从高到低保留框，抑制与已保留框 IoU >= iou_threshold 的低分框。
+
+    结果与逐对 pop(0) 实现相同，但只对包围盒相交的候选对计算多边形 IoU。
+    """
+    n = len(textlines)
+    if n < 2:
+        return list(textlines)
+
+    # 稳定排序，同分时保持原始顺序
+    order = np.argsort(-np.array([t.prob for t in textlines], dtype=np.float64), kind='stable')
+    rank = np.empty(n, dtype=np.intp)
+    rank[order] = np.arange(n)
+
+    batch = QuadrilateralBatch.from_quadrilaterals(textlines)
+    ia, ib = aabb_candidate_pairs(batch.aabb)
+    ious = polygon_iou_pairs(batch.pts, batch.pts, ia, ib)
+    hit = ious >= iou_threshold
+
+    # 将重叠对整理为 “高排名 -> 低排名” 的邻接表
+    hi = np.where(rank[ia] < rank[ib], ia, ib)[hit]
+    lo = np.where(rank[ia] < rank[ib], ib, ia)[hit]
+    suppress_map = {}
+    for h, l in zip(hi.tolist(), lo.tolist()):
+        suppress_map.setdefault(h, []).append(l)
+
+    suppressed = np.zeros(n, dtype=bool)
+    kept = []
+    for idx in order.tolist():
+        if suppressed[idx]:
+            continue
+        kept.append(textlines[idx])
+        for j in suppress_map.get(idx, ()):
+            suppressed[j] = True
+    return kept
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 import numpy as np
 
@@ -34,24 +34,55 @@ async def prepare(inpainter_key: Inpainter, device: str = 'cpu'):
         await inpainter.download()
         await inpainter.load(device)
 
-async def dispatch(inpainter_key: Inpainter, image: np.ndarray, mask: np.ndarray, config: Optional[InpainterConfig], inpainting_size: int = 1024, device: str = 'cpu', verbose: bool = False) -> np.ndarray:
+async def _get_loaded_inpainter(inpainter_key: Inpainter, device: str) -> CommonInpainter:
     inpainter = get_inpainter(inpainter_key)
     if isinstance(inpainter, OfflineInpainter):
         await inpainter.load(device)
-    config = config or InpainterConfig()
-    
-    # 检查是否需要切割（极端长宽比）
+    return inpainter
+
+def _needs_split(image: np.ndarray, config: InpainterConfig) -> bool:
+    """检查是否需要切割（极端长宽比）"""
     h, w = image.shape[:2]
     aspect_ratio = max(w / h, h / w)
     split_ratio = config.inpainting_split_ratio
+    return split_ratio > 0 and aspect_ratio > split_ratio
+
+async def dispatch(inpainter_key: Inpainter, image: np.ndarray, mask: np.ndarray, config: Optional[InpainterConfig], inpainting_size: int = 1024, device: str = 'cpu', verbose: bool = False) -> np.ndarray:
+    config = config or InpainterConfig()
+    inpainter = await _get_loaded_inpainter(inpainter_key, device)
     
     # 如果长宽比超过阈值，进行切割处理
-    if split_ratio > 0 and aspect_ratio > split_ratio:
+    if _needs_split(image, config):
         return await _dispatch_with_split(inpainter, image, mask, config, inpainting_size, verbose)
     else:
         # 正常处理
         return await inpainter.inpaint(image, mask, config, inpainting_size, verbose)
 
+async def dispatch_batch(inpainter_key: Inpainter, images: List[np.ndarray], masks: List[np.ndarray], config: Optional[InpainterConfig], inpainting_size: int = 1024, device: str = 'cpu', verbose: bool = False) -> List[np.ndarray]:
+    """
+    批量修复调度函数：多组 (image, mask) 按模型输入尺寸分组，每组一次前向推理
+
+    参数与 dispatch 相同，返回与输入顺序一致的修复结果。
+    极端长宽比的图片仍按 inpainting_split_ratio 切块（切出的块同样批量修复），
+    单次前向的最大张数由 config.inpainting_batch_size 控制；不支持批量推理的修复器自动逐张修复。
+    """
+    config = config or InpainterConfig()
+    inpainter = await _get_loaded_inpainter(inpainter_key, device)
+
+    results = [None] * len(images)
+    batch_indices = []
+    for i, image in enumerate(images):
+        if _needs_split(image, config):
+            results[i] = await _dispatch_with_split(inpainter, image, masks[i], config, inpainting_size, verbose)
+        else:
+            batch_indices.append(i)
+    if batch_indices:
+        batch_results = await inpainter.inpaint_batch([images[i] for i in batch_indices], [masks[i] for i in batch_indices],
+                                                      config, inpainting_size, verbose, max_batch_size=config.inpainting_batch_size)
+        for i, result in zip(batch_indices, batch_results):
+            results[i] = result
+    return results
+
 async def unload(inpainter_key: Inpainter):
     inpainter_cache.pop(inpainter_key, None)
 
@@ -97,8 +128,10 @@ async def _dispatch_with_split(inpainter: CommonInpainter, image: np.ndarray, ma
         print(f"[Inpainting Split] Splitting into {num_splits} tiles along {'height' if is_vertical else 'width'}")
         print(f"[Inpainting Split] Tile size: {tile_size}, Overlap: {overlap}")
     
-    # 切割并修复每一块
+    # 切割所有块，然后一次批量修复（尺寸相同的块合并为一次前向推理）
     tiles = []
+    tile_imgs = []
+    tile_masks = []
     for i in range(num_splits):
         if is_vertical:
             # 计算切割位置
@@ -123,14 +156,18 @@ async def _dispatch_with_split(inpainter: CommonInpainter, image: np.ndarray, ma
             if verbose:
                 print(f"[Inpainting Split] Processing tile {i+1}/{num_splits}: cols {start}-{end}")
         
-        # 修复当前块
-        tile_inpainted = await inpainter.inpaint(tile_img, tile_mask, config, inpainting_size, verbose)
+        tile_imgs.append(tile_img)
+        tile_masks.append(tile_mask)
         tiles.append({
-            'image': tile_inpainted,
             'start': start,
             'end': end
         })
     
+    tile_results = await inpainter.inpaint_batch(tile_imgs, tile_masks, config, inpainting_size, verbose,
+                                                 max_batch_size=config.inpainting_batch_size)
+    for tile_data, tile_inpainted in zip(tiles, tile_results):
+        tile_data['image'] = tile_inpainted
+    
     # 拼接修复后的块（使用羽化混合避免接缝）
     result = image.copy()
     blend_size = overlap // 2 if overlap > 0 else 0
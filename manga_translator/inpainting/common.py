@@ -1,5 +1,7 @@
+import cv2
 import numpy as np
 from abc import abstractmethod
+from typing import List, Tuple
 
 from ..config import InpainterConfig
 from ..utils import InfererModule, ModelWrapper
@@ -9,6 +11,19 @@ class CommonInpainter(InfererModule):
     async def inpaint(self, image: np.ndarray, mask: np.ndarray, config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         return await self._inpaint(image, mask, config, inpainting_size, verbose)
 
+    async def inpaint_batch(self, images: List[np.ndarray], masks: List[np.ndarray], config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False,
+                            max_batch_size: int = 4) -> List[np.ndarray]:
+        '''
+        Batched version of `inpaint`. Returns one inpainted image per (image, mask) pair, in input order.
+
+        Inpainters can override `_inpaint_batch` to run a single forward pass for up to `max_batch_size` images.
+        '''
+        return await self._inpaint_batch(images, masks, config, inpainting_size, verbose, max(1, max_batch_size))
+
+    async def _inpaint_batch(self, images: List[np.ndarray], masks: List[np.ndarray], config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False,
+                             max_batch_size: int = 4) -> List[np.ndarray]:
+        return [await self._inpaint(image, mask, config, inpainting_size, verbose) for image, mask in zip(images, masks)]
+
     @abstractmethod
     async def _inpaint(self, image: np.ndarray, mask: np.ndarray, config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         pass
@@ -21,6 +36,14 @@ class OfflineInpainter(CommonInpainter, ModelWrapper):
         # ✅ 统一Inpainting内存清理：在修复完成后立即清理
         self._cleanup_memory()
         return result
+
+    async def _inpaint_batch(self, images: List[np.ndarray], masks: List[np.ndarray], config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False,
+                             max_batch_size: int = 4) -> List[np.ndarray]:
+        if not self.is_loaded():
+            raise Exception(f'{self._key}: Tried to forward pass without having loaded the model.')
+        results = await self._infer_batch(images, masks, config, inpainting_size, verbose, max_batch_size)
+        self._cleanup_memory()
+        return results
     
     def _cleanup_memory(self):
         """统一的Inpainting内存清理方法，在每次推理后自动调用"""
@@ -41,3 +64,66 @@ class OfflineInpainter(CommonInpainter, ModelWrapper):
     @abstractmethod
     async def _infer(self, image: np.ndarray, mask: np.ndarray, config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         pass
+
+    async def _infer_batch(self, images: List[np.ndarray], masks: List[np.ndarray], config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False,
+                           max_batch_size: int = 4) -> List[np.ndarray]:
+        """May be overwritten by inpainters that support multi-image forward passes"""
+        return [await self._infer(image, mask, config, inpainting_size, verbose) for image, mask in zip(images, masks)]
+
+
+def compute_mask_rois(mask: np.ndarray, padding: int, align: int = 64) -> List[Tuple[int, int, int, int]]:
+    """
+    把 mask 连通域聚类为带 padding 的裁剪框 (x1, y1, x2, y2)。
+
+    每个连通域的包围盒向外扩展 padding 作为上下文，相互重叠的框合并为一个；
+    最后把框的宽高向上取整到 align 的倍数（在图像范围内），让尺寸相同的裁剪块可以合并成一个 batch。
+    """
+    height, width = mask.shape[:2]
+    binary = (mask >= 127).astype(np.uint8)
+    num_labels, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if num_labels <= 1:
+        return []
+
+    boxes = []
+    for x, y, w, h, _ in stats[1:].tolist():
+        boxes.append([max(x - padding, 0), max(y - padding, 0), min(x + w + padding, width), min(y + h + padding, height)])
+
+    # 反复合并重叠的框，直到不再变化
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for box in boxes:
+            for other in result:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    other[0], other[1] = min(other[0], box[0]), min(other[1], box[1])
+                    other[2], other[3] = max(other[2], box[2]), max(other[3], box[3])
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+
+    rois = []
+    for x1, y1, x2, y2 in boxes:
+        x1, x2 = _align_span(x1, x2, width, align)
+        y1, y2 = _align_span(y1, y2, height, align)
+        rois.append((x1, y1, x2, y2))
+    return rois
+
+
+def _align_span(start: int, end: int, limit: int, align: int) -> Tuple[int, int]:
+    size = min(-(-(end - start) // align) * align, limit)
+    start = min(max(start - (size - (end - start)) // 2, 0), limit - size)
+    return start, start + size
+
+
+def paste_masked(dst: np.ndarray, src: np.ndarray, mask: np.ndarray, x1: int, y1: int):
+    """
+    把裁剪块修复结果中 mask 内（>= 127）的像素贴回 dst[y1:y1+h, x1:x1+w]。
+
+    修复结果在 mask 外本来就是原图像素，只贴 mask 内的像素可以避免相互重叠的裁剪块
+    用原图像素覆盖掉先贴回的修复结果。
+    """
+    h, w = src.shape[:2]
+    np.copyto(dst[y1:y1 + h, x1:x1 + w], src, where=(mask >= 127)[:, :, None])
@@ -9,6 +9,11 @@ import torch.nn.functional as F
 from .inpainting_lama_mpe import LamaMPEInpainter
 
 class AotInpainter(LamaMPEInpainter):
+    # ONNX 推理由 _infer_onnx_aot 单独处理，不走父类的批量路径
+    _onnx_batch_supported = False
+    # ROI 模式只用于 LaMa 系列模型
+    _roi_mode_supported = False
+
     _MODEL_MAPPING = {
         'model': {
             'url': 'https://github.com/zyddnys/manga-image-translator/releases/download/beta-0.3/inpainting.ckpt',
@@ -79,7 +84,7 @@ class AotInpainter(LamaMPEInpainter):
         elif hasattr(self, 'model'):
             del self.model
     
-    async def _infer(self, image: np.ndarray, mask: np.ndarray, config, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
+    async def _infer_full(self, image: np.ndarray, mask: np.ndarray, config, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         # ✅ ONNX推理（AOT模型，2个输入，不含MPE），失败时自动降级到PyTorch
         if hasattr(self, 'backend') and self.backend == 'onnx':
             try:
@@ -97,7 +102,7 @@ class AotInpainter(LamaMPEInpainter):
                         self.model.to(self.device)
         
         # ✅ PyTorch推理（调用父类）
-        return await super()._infer(image, mask, config, inpainting_size, verbose)
+        return await super()._infer_full(image, mask, config, inpainting_size, verbose)
     
     async def _infer_onnx_aot(self, image: np.ndarray, mask: np.ndarray, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         """ONNX推理方法（AOT模型，只需image和mask）"""
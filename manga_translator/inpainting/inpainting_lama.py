@@ -15,6 +15,9 @@ from .inpainting_lama_mpe import LamaMPEInpainter
 
 # Currently not used
 class LamaInpainter(LamaMPEInpainter):
+    # ONNX 推理由 _infer_onnx_default 单独处理，不走父类的批量路径
+    _onnx_batch_supported = False
+
     _MODEL_MAPPING = {
         'model': {
             'url': '',
@@ -80,7 +83,7 @@ class LamaInpainter(LamaMPEInpainter):
         elif hasattr(self, 'model'):
             del self.model
     
-    async def _infer(self, image: np.ndarray, mask: np.ndarray, config, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
+    async def _infer_full(self, image: np.ndarray, mask: np.ndarray, config, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         # ✅ ONNX推理（default模型，2个输入），失败时自动降级到PyTorch
         if hasattr(self, 'backend') and self.backend == 'onnx':
             try:
@@ -99,7 +102,7 @@ class LamaInpainter(LamaMPEInpainter):
                         self.model.to(self.device)
         
         # ✅ PyTorch推理（调用父类）
-        return await super()._infer(image, mask, config, inpainting_size, verbose)
+        return await super()._infer_full(image, mask, config, inpainting_size, verbose)
     
     async def _infer_onnx_default(self, image: np.ndarray, mask: np.ndarray, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         """ONNX推理方法（default模型，只需image和mask）"""
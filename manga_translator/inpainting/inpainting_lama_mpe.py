@@ -10,9 +10,10 @@ import cv2
 import os
 import shutil
 from torch import Tensor
-from typing import Tuple
+from typing import Callable, Dict, List, Tuple
 
-from .common import OfflineInpainter
+from .common import OfflineInpainter, compute_mask_rois, paste_masked
+from .masked_position_encoding import masked_position_encoding
 from ..config import InpainterConfig
 from ..utils import resize_keep_aspect
 
@@ -23,11 +24,20 @@ TORCH_DTYPE_MAP = {
     'bf16': torch.bfloat16,
 }
 
+# ROI 模式：裁剪块总面积超过整页的该比例时退回整页修复
+ROI_MAX_COVERAGE = 0.6
+
+
+def _stack_inputs(inputs: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """把多份不含 batch 维的模型输入堆叠为一个 batch"""
+    return {key: np.stack([item[key] for item in inputs]) for key in inputs[0]}
+
 
 def load_masked_position_encoding(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     """
     Compute masked position encoding (MPE) for Lama inpainting.
-    Ported from rust implementation: manga-image-translator-rust/crates/modules/inpainter/lama_mpe/src/mpe.rs
+    Originally ported from rust implementation: manga-image-translator-rust/crates/modules/inpainter/lama_mpe/src/mpe.rs,
+    now computed (and cached) by masked_position_encoding.
     
     Args:
         mask: Binary mask (H, W), 255 for masked area, 0 for known area
@@ -36,82 +46,8 @@ def load_masked_position_encoding(mask: np.ndarray) -> Tuple[np.ndarray, np.ndar
         rel_pos: Relative position encoding (H, W) with dtype int64
         direct: Directional encoding (H, W, 4) with dtype int64
     """
-    ori_h, ori_w = mask.shape[:2]
-    
-    # Define directional filters (3x3 kernels)
-    d_filter1 = np.array([[1., 1., 0.],
-                          [1., 1., 0.],
-                          [0., 0., 0.]], dtype=np.float32)
-    
-    d2_filter = np.array([[0., 0., 0.],
-                          [1., 1., 0.],
-                          [1., 1., 0.]], dtype=np.float32)
-    
-    d3_filter = np.array([[0., 1., 1.],
-                          [0., 1., 1.],
-                          [0., 0., 0.]], dtype=np.float32)
-    
-    d4_filter = np.array([[0., 0., 0.],
-                          [0., 1., 1.],
-                          [0., 1., 1.]], dtype=np.float32)
-    
-    ones_filter = np.ones((3, 3), dtype=np.float32)
-    
-    str_size = 256
-    pos_num = 128
-    
-    # Normalize original mask
-    ori_mask = (mask > 127).astype(np.float32)
-    
-    # Resize mask to fixed size for computation
-    mask_resized = cv2.resize(mask, (str_size, str_size), interpolation=cv2.INTER_AREA)
-    mask3 = (mask_resized == 0).astype(np.float32)  # Invert: 1 for known, 0 for masked
-    
-    h, w = str_size, str_size
-    pos = np.zeros((h, w), dtype=np.int32)
-    direct = [np.zeros((h, w), dtype=np.uint8) for _ in range(4)]
-    
-    i = 0
-    if np.any(mask3 > 0.0):
-        while np.sum(1.0 - mask3) > 0.0:
-            i += 1
-            
-            # Dilate mask
-            mask3_ = cv2.filter2D(mask3, -1, ones_filter, borderType=cv2.BORDER_DEFAULT)
-            mask3_c = (mask3_ > 0.0).astype(np.float32)
-            
-            # Compute boundary
-            mask3_[mask3_ > 0.0] = 1.0 - mask3[mask3_ > 0.0]
-            mask3_[mask3_ <= 0.0] -= mask3[mask3_ <= 0.0]
-            
-            # Update position
-            pos[mask3_ == 1.0] = i
-            
-            # Compute directional encoding
-            for idx, d_filter in enumerate([d_filter1, d2_filter, d3_filter, d4_filter]):
-                m = cv2.filter2D(mask3, -1, d_filter, borderType=cv2.BORDER_DEFAULT)
-                m[m > 0.0] = 1.0 - mask3[m > 0.0]
-                m[m <= 0.0] -= mask3[m <= 0.0]
-                direct[idx][m == 1.0] = 1
-            
-            mask3 = mask3_c
-    
-    # Normalize position to [0, pos_num-1]
-    rel_pos = np.clip((pos.astype(np.float32) / (str_size / 2.0) * pos_num).astype(np.int32), 0, pos_num - 1).astype(np.uint8)
-    
-    # Resize back to original size if needed
-    if ori_w != w or ori_h != h:
-        rel_pos = cv2.resize(rel_pos, (ori_w, ori_h), interpolation=cv2.INTER_NEAREST)
-        rel_pos[ori_mask == 0] = 0
-        
-        for idx in range(4):
-            direct[idx] = cv2.resize(direct[idx], (ori_w, ori_h), interpolation=cv2.INTER_NEAREST)
-            direct[idx][ori_mask == 0] = 0
-    
-    # Stack directional encodings (H, W, 4)
-    direct_stack = np.stack(direct, axis=2).astype(np.int64)
-    
-    return rel_pos.astype(np.int64), direct_stack
+    rel_pos, _, direct = masked_position_encoding(mask)
+    return rel_pos.astype(np.int64), direct.astype(np.int64)
 
 
 class LamaMPEInpainter(OfflineInpainter):
@@ -120,6 +56,11 @@ class LamaMPEInpainter(OfflineInpainter):
     Better mark as deprecated and replace with lama large
     '''
 
+    # ONNX 模型是否可以用 _prepare_onnx 的输入批量推理
+    _onnx_batch_supported = True
+    # 是否支持 inpainting_roi_mode（仅 LaMa 系列）
+    _roi_mode_supported = True
+
     _MODEL_MAPPING = {
         'model': {
             'url': 'https://github.com/zyddnys/manga-image-translator/releases/download/beta-0.3/inpainting_lama_mpe.ckpt',
@@ -190,7 +131,112 @@ class LamaMPEInpainter(OfflineInpainter):
         elif hasattr(self, 'model'):
             del self.model
 
+    def _use_roi_mode(self, config: InpainterConfig) -> bool:
+        return self._roi_mode_supported and getattr(config, 'inpainting_roi_mode', False)
+
     async def _infer(self, image: np.ndarray, mask: np.ndarray, config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
+        if self._use_roi_mode(config):
+            return await self._infer_roi(image, mask, config, inpainting_size, verbose)
+        return await self._infer_full(image, mask, config, inpainting_size, verbose)
+
+    async def _infer_roi(self, image: np.ndarray, mask: np.ndarray, config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
+        """
+        ROI 模式：只修复 mask 周围的裁剪块。
+
+        mask 连通域按 inpainting_roi_padding 扩展并合并为裁剪块，每块以原始分辨率单独修复
+        （尺寸相同的块合并成一个 batch），再把各块 mask 内的像素贴回整页。
+        裁剪块覆盖面积过大时直接走整页修复，省不下计算量。
+        """
+        height, width = image.shape[:2]
+        padding = max(int(config.inpainting_roi_padding), 0)
+        rois = compute_mask_rois(mask, padding)
+        if not rois:
+            return np.copy(image)
+        roi_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in rois)
+        if roi_area > ROI_MAX_COVERAGE * height * width:
+            self.logger.debug(f'ROI inpainting: crops cover {roi_area / (height * width):.0%} of the page, using full-page inpainting')
+            return await self._infer_full(image, mask, config, inpainting_size, verbose)
+        self.logger.info(f'ROI inpainting: {len(rois)} crops, {roi_area / (height * width):.0%} of the page')
+
+        crops = await self._infer_full_batch([image[y1:y2, x1:x2] for x1, y1, x2, y2 in rois],
+                                             [mask[y1:y2, x1:x2] for x1, y1, x2, y2 in rois],
+                                             config, inpainting_size, verbose, max(1, config.inpainting_batch_size))
+        result = np.copy(image)
+        for (x1, y1, x2, y2), crop in zip(rois, crops):
+            paste_masked(result, crop, mask[y1:y2, x1:x2], x1, y1)
+        return result
+
+    async def _infer_batch(self, images: List[np.ndarray], masks: List[np.ndarray], config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False,
+                           max_batch_size: int = 4) -> List[np.ndarray]:
+        # ROI 模式在单页内部已经按裁剪块批量推理；ONNX 由子类自行处理的模型只能逐张推理
+        use_onnx = getattr(self, 'backend', 'torch') == 'onnx'
+        if len(images) < 2 or self._use_roi_mode(config) or (use_onnx and not self._onnx_batch_supported):
+            return [await self._infer(image, mask, config, inpainting_size, verbose) for image, mask in zip(images, masks)]
+        return await self._infer_full_batch(images, masks, config, inpainting_size, verbose, max_batch_size)
+
+    async def _infer_full_batch(self, images: List[np.ndarray], masks: List[np.ndarray], config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False,
+                                max_batch_size: int = 4) -> List[np.ndarray]:
+        """
+        整图修复的批量版本：按模型输入尺寸分组，每组（最多 max_batch_size 张）执行一次前向。
+
+        只合并预处理后尺寸完全相同的输入，不做额外 padding，结果与逐张调用 _infer_full 相同。
+        ONNX 模型不支持 batch > 1 时自动改为逐张推理。
+        """
+        use_onnx = getattr(self, 'backend', 'torch') == 'onnx'
+        if len(images) < 2 or max_batch_size <= 1 or (use_onnx and not self._onnx_batch_supported):
+            return [await self._infer_full(image, mask, config, inpainting_size, verbose) for image, mask in zip(images, masks)]
+
+        prepare = self._prepare_onnx if use_onnx else self._prepare_torch
+        prepared = [prepare(image, mask, inpainting_size) for image, mask in zip(images, masks)]
+        groups = {}
+        for i, (inputs, _) in enumerate(prepared):
+            groups.setdefault(inputs['image'].shape, []).append(i)
+
+        results = [None] * len(images)
+        for shape, indices in groups.items():
+            for start in range(0, len(indices), max_batch_size):
+                chunk = indices[start:start + max_batch_size]
+                batch = _stack_inputs([prepared[i][0] for i in chunk])
+                self.logger.debug(f'Inpainting batch: {len(chunk)} x {shape[2]}x{shape[1]}')
+                try:
+                    outputs = self._forward_onnx(batch) if use_onnx else self._forward_torch(batch, config)
+                except Exception as e:
+                    if not use_onnx:
+                        raise
+                    self.logger.warning(f'ONNX批量推理失败（{str(e)[:100]}），改为逐张推理')
+                    self._onnx_batch_supported = False
+                    for i in chunk:
+                        results[i] = await self._infer_full(images[i], masks[i], config, inpainting_size, verbose)
+                    continue
+                for i, output in zip(chunk, outputs):
+                    results[i] = prepared[i][1](output)
+        return results
+
+    def _run_model(self, img_torch: Tensor, mask_torch: Tensor, config: InpainterConfig) -> Tensor:
+        """对 (B, 3, H, W) 的图像和 (B, 1, H, W) 的二值 mask 执行一次前向"""
+        with torch.no_grad():
+            img_torch *= (1 - mask_torch)
+            if not (self.device.startswith('cuda')):
+                # mps devices here
+                img_inpainted_torch = self.model(img_torch, mask_torch)
+            else:
+                # Note: lama's weight shouldn't be convert to fp16 or bf16 otherwise it produces darkened results.
+                # but it can inference under torch.autocast
+
+                precision = TORCH_DTYPE_MAP[str(config.inpainting_precision)]
+                
+                if precision == torch.float16:
+                    precision = torch.bfloat16
+                    self.logger.warning('Switch to bf16 due to Lama only compatible with bf16 and fp32.')
+
+                with torch.autocast(device_type="cuda", dtype=precision):
+                    img_inpainted_torch = self.model(img_torch, mask_torch)
+                
+                # ✅ autocast后立即清理缓存（防止bf16中间激活累积）
+                torch.cuda.empty_cache()
+        return img_inpainted_torch
+
+    async def _infer_full(self, image: np.ndarray, mask: np.ndarray, config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         # ✅ ONNX推理（lamampe.onnx实际是Lama Large，不含MPE），失败时自动降级到PyTorch
         if hasattr(self, 'backend') and self.backend == 'onnx':
             try:
@@ -206,11 +252,18 @@ class LamaMPEInpainter(OfflineInpainter):
                         self.model.to(self.device)
         
         # ✅ PyTorch推理（原有逻辑）
-        img_original = np.copy(image)
-        mask_original = np.copy(mask)
-        mask_original[mask_original < 127] = 0
-        mask_original[mask_original >= 127] = 1
-        mask_original = mask_original[:, :, None]
+        inputs, finish = self._prepare_torch(image, mask, inpainting_size)
+        self.logger.info(f'Inpainting resolution: {inputs["image"].shape[2]}x{inputs["image"].shape[1]}')
+        return finish(self._forward_torch(_stack_inputs([inputs]), config)[0])
+
+    def _prepare_torch(self, image: np.ndarray, mask: np.ndarray, inpainting_size: int) -> Tuple[Dict[str, np.ndarray], Callable[[np.ndarray], np.ndarray]]:
+        """
+        PyTorch 推理的预处理：缩放到 inpainting_size 以内并调整为 8 的倍数。
+
+        返回 (不含 batch 维的模型输入, finish)，finish 把 (3, H, W) 的模型输出还原为原尺寸并按 mask 合成。
+        """
+        img_original = image
+        mask_original = (mask >= 127).astype(np.uint8)[:, :, None]
 
         height, width, c = image.shape
         if max(image.shape[0: 2]) > inpainting_size:
@@ -218,78 +271,62 @@ class LamaMPEInpainter(OfflineInpainter):
             mask = resize_keep_aspect(mask, inpainting_size)
         pad_size = 8
         h, w, c = image.shape
-        if h % pad_size != 0:
-            new_h = (pad_size - (h % pad_size)) + h
-        else:
-            new_h = h
-        if w % pad_size != 0:
-            new_w = (pad_size - (w % pad_size)) + w
-        else:
-            new_w = w
+        new_h = h if h % pad_size == 0 else (pad_size - (h % pad_size)) + h
+        new_w = w if w % pad_size == 0 else (pad_size - (w % pad_size)) + w
         if new_h != h or new_w != w:
             image = cv2.resize(image, (new_w, new_h), interpolation = cv2.INTER_LINEAR)
             mask = cv2.resize(mask, (new_w, new_h), interpolation = cv2.INTER_LINEAR)
-        self.logger.info(f'Inpainting resolution: {new_w}x{new_h}')
-        if isinstance(self.model, LamaFourier):
-            img_torch = torch.from_numpy(image).permute(2, 0, 1).unsqueeze_(0).float() / 255.
-        else:
-            img_torch = torch.from_numpy(image).permute(2, 0, 1).unsqueeze_(0).float() / 127.5 - 1.0
-        mask_torch = torch.from_numpy(mask).unsqueeze_(0).unsqueeze_(0).float() / 255.0
-        mask_torch[mask_torch < 0.5] = 0
-        mask_torch[mask_torch >= 0.5] = 1
+
+        is_lama = isinstance(self.model, LamaFourier)
+        img = np.transpose(image, (2, 0, 1)).astype(np.float32)
+        img = img / 255. if is_lama else img / 127.5 - 1.0
+        mask_input = (mask[None].astype(np.float32) / 255.0 >= 0.5).astype(np.float32)
+
+        def finish(output: np.ndarray) -> np.ndarray:
+            output = np.transpose(output, (1, 2, 0))
+            if is_lama:
+                img_inpainted = (output * 255.).astype(np.uint8)
+            else:
+                img_inpainted = ((output + 1.0) * 127.5).astype(np.uint8)
+            if new_h != height or new_w != width:
+                img_inpainted = cv2.resize(img_inpainted, (width, height), interpolation = cv2.INTER_LINEAR)
+
+            # 确保所有数组尺寸匹配
+            self.logger.debug(f"Before blend - img_inpainted: {img_inpainted.shape}, img_original: {img_original.shape}, mask_original: {mask_original.shape}")
+
+            # 如果mask_original尺寸不匹配，resize它
+            blend_mask = mask_original
+            if blend_mask.shape[:2] != img_inpainted.shape[:2]:
+                self.logger.warning(f"Resizing mask_original from {blend_mask.shape} to match img_inpainted {img_inpainted.shape[:2]}")
+                blend_mask = cv2.resize(blend_mask, (img_inpainted.shape[1], img_inpainted.shape[0]), interpolation = cv2.INTER_LINEAR)
+                blend_mask = blend_mask[:, :, None] if len(blend_mask.shape) == 2 else blend_mask
+
+            return img_inpainted * blend_mask + img_original * (1 - blend_mask)
+
+        return {'image': img, 'mask': mask_input}, finish
+
+    def _forward_torch(self, inputs: Dict[str, np.ndarray], config: InpainterConfig) -> np.ndarray:
+        """对 _prepare_torch 的输入（已堆叠成 batch）执行一次前向，返回 (B, 3, H, W) float32"""
+        img_torch = torch.from_numpy(inputs['image'])
+        mask_torch = torch.from_numpy(inputs['mask'])
         if self.device.startswith('cuda') or self.device == 'mps':
             img_torch = img_torch.to(self.device)
             mask_torch = mask_torch.to(self.device)
-        with torch.no_grad():
-            img_torch *= (1 - mask_torch)
-            if not (self.device.startswith('cuda')):
-                # mps devices here
-                img_inpainted_torch = self.model(img_torch, mask_torch)
-            else:
-                # Note: lama's weight shouldn't be convert to fp16 or bf16 otherwise it produces darkened results.
-                # but it can inference under torch.autocast
-
-                precision = TORCH_DTYPE_MAP[str(config.inpainting_precision)]
-                
-                if precision == torch.float16:
-                    precision = torch.bfloat16
-                    self.logger.warning('Switch to bf16 due to Lama only compatible with bf16 and fp32.')
+        return self._run_model(img_torch, mask_torch, config).to(torch.float32).cpu().numpy()
 
-                with torch.autocast(device_type="cuda", dtype=precision):
-                    img_inpainted_torch = self.model(img_torch, mask_torch)
-                
-                # ✅ autocast后立即清理缓存（防止bf16中间激活累积）
-                torch.cuda.empty_cache()
+    def _forward_onnx(self, inputs: Dict[str, np.ndarray]) -> np.ndarray:
+        """对 _prepare_onnx 的输入（已堆叠成 batch）执行一次 ONNX 推理，返回 (B, 3, H, W)"""
+        return self.session.run(None, inputs)[0]
 
-        if isinstance(self.model, LamaFourier):
-            img_inpainted_torch = img_inpainted_torch.to(torch.float32)
-            img_inpainted = (img_inpainted_torch.cpu().squeeze_(0).permute(1, 2, 0).numpy() * 255.).astype(np.uint8)
-        else:
-            img_inpainted_torch = img_inpainted_torch.to(torch.float32)
-            img_inpainted = ((img_inpainted_torch.cpu().squeeze_(0).permute(1, 2, 0).numpy() + 1.0) * 127.5).astype(np.uint8)
-        if new_h != height or new_w != width:
-            img_inpainted = cv2.resize(img_inpainted, (width, height), interpolation = cv2.INTER_LINEAR)
-        
-        # 确保所有数组尺寸匹配
-        self.logger.debug(f"Before blend - img_inpainted: {img_inpainted.shape}, img_original: {img_original.shape}, mask_original: {mask_original.shape}")
-        
-        # 如果mask_original尺寸不匹配，resize它
-        if mask_original.shape[:2] != img_inpainted.shape[:2]:
-            self.logger.warning(f"Resizing mask_original from {mask_original.shape} to match img_inpainted {img_inpainted.shape[:2]}")
-            mask_original = cv2.resize(mask_original, (img_inpainted.shape[1], img_inpainted.shape[0]), interpolation = cv2.INTER_LINEAR)
-            mask_original = mask_original[:, :, None] if len(mask_original.shape) == 2 else mask_original
-        
-        ans = img_inpainted * mask_original + img_original * (1 - mask_original)
-        
-        return ans
-    
     async def _infer_onnx(self, image: np.ndarray, mask: np.ndarray, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         """ONNX推理方法（包含MPE计算）"""
-        img_original = np.copy(image)
-        mask_original = np.copy(mask)
-        mask_original[mask_original < 127] = 0
-        mask_original[mask_original >= 127] = 1
-        mask_original = mask_original[:, :, None]
+        inputs, finish = self._prepare_onnx(image, mask, inpainting_size)
+        return finish(self._forward_onnx(_stack_inputs([inputs]))[0])
+
+    def _prepare_onnx(self, image: np.ndarray, mask: np.ndarray, inpainting_size: int) -> Tuple[Dict[str, np.ndarray], Callable[[np.ndarray], np.ndarray]]:
+        """ONNX 推理的预处理（对称 padding 到 8 的倍数并计算 MPE 输入），返回值同 _prepare_torch"""
+        img_original = image
+        mask_original = (mask >= 127).astype(np.uint8)[:, :, None]
         
         height, width, c = image.shape
         if max(image.shape[0: 2]) > inpainting_size:
@@ -318,43 +355,33 @@ class LamaMPEInpainter(OfflineInpainter):
         # ✅ 计算MPE输入（使用padding后的mask）
         rel_pos, direct = load_masked_position_encoding(mask_pad_single)
         
-        # 准备输入（0-1归一化）
-        img = img_pad.astype(np.float32) / 255.0
-        img = np.transpose(img, (2, 0, 1))[None, ...]  # [1, 3, H, W]
-        
-        mask_input = mask_pad.astype(np.float32)[:, :, 0:1]
-        mask_input = np.transpose(mask_input, (2, 0, 1))[None, ...]  # [1, 1, H, W]
-        
-        # MPE输入格式：[1, H, W] for rel_pos, [1, H, W, 4] for direct
-        rel_pos_input = rel_pos[None, ...].astype(np.int64)  # [1, H, W]
-        direct_input = direct[None, ...].astype(np.int64)    # [1, H, W, 4]
-        
-        # ONNX推理（4个输入）
-        ort_inputs = {
-            'image': img.astype(np.float32),
-            'mask': mask_input.astype(np.float32),
-            'rel_pos': rel_pos_input,
-            'direct': direct_input
+        # 准备输入（0-1归一化）；MPE输入格式：[H, W] for rel_pos, [H, W, 4] for direct
+        inputs = {
+            'image': np.transpose(img_pad.astype(np.float32) / 255.0, (2, 0, 1)),  # [3, H, W]
+            'mask': np.transpose(mask_pad.astype(np.float32)[:, :, 0:1], (2, 0, 1)),  # [1, H, W]
+            'rel_pos': rel_pos.astype(np.int64),
+            'direct': direct.astype(np.int64),
         }
-        img_inpainted = self.session.run(None, ort_inputs)[0]
-        
-        # 后处理
-        img_inpainted = np.transpose(img_inpainted[0], (1, 2, 0))  # [H, W, 3]
-        img_inpainted = (img_inpainted * 255.).astype(np.uint8)
-        
-        # Remove padding
-        img_inpainted = img_inpainted[:h, :w, :]
-        
-        # Resize back
-        if max(height, width) > inpainting_size:
-            img_inpainted = cv2.resize(img_inpainted, (width, height), interpolation=cv2.INTER_LINEAR)
-            mask_original_resized = cv2.resize(mask_original_resized, (width, height), interpolation=cv2.INTER_LINEAR)
-            if len(mask_original_resized.shape) == 2:
-                mask_original_resized = mask_original_resized[:, :, None]
-        
-        ans = img_inpainted * mask_original_resized + img_original * (1 - mask_original_resized)
-        
-        return ans
+
+        def finish(output: np.ndarray) -> np.ndarray:
+            # 后处理
+            img_inpainted = np.transpose(output, (1, 2, 0))  # [H, W, 3]
+            img_inpainted = (img_inpainted * 255.).astype(np.uint8)
+            
+            # Remove padding
+            img_inpainted = img_inpainted[:h, :w, :]
+            
+            # Resize back
+            blend_mask = mask_original_resized
+            if max(height, width) > inpainting_size:
+                img_inpainted = cv2.resize(img_inpainted, (width, height), interpolation=cv2.INTER_LINEAR)
+                blend_mask = cv2.resize(blend_mask, (width, height), interpolation=cv2.INTER_LINEAR)
+                if len(blend_mask.shape) == 2:
+                    blend_mask = blend_mask[:, :, None]
+            
+            return img_inpainted * blend_mask + img_original * (1 - blend_mask)
+
+        return inputs, finish
     
     async def _infer_onnx_mpe(self, image: np.ndarray, mask: np.ndarray, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         """ONNX专用推理方法（MPE版本）"""
@@ -540,7 +567,7 @@ class LamaLargeInpainter(LamaMPEInpainter):
             elif self.backend == 'torch':
                 del self.model
     
-    async def _infer(self, image: np.ndarray, mask: np.ndarray, config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
+    async def _infer_full(self, image: np.ndarray, mask: np.ndarray, config: InpainterConfig, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
         # ✅ ONNX推理，失败时自动降级到PyTorch
         if hasattr(self, 'backend') and self.backend == 'onnx':
             try:
@@ -562,15 +589,12 @@ class LamaLargeInpainter(LamaMPEInpainter):
                         self.model.to(self.device)
         
         # ✅ PyTorch推理（调用父类）
-        return await super()._infer(image, mask, config, inpainting_size, verbose)
+        return await super()._infer_full(image, mask, config, inpainting_size, verbose)
     
-    async def _infer_onnx(self, image: np.ndarray, mask: np.ndarray, inpainting_size: int = 1024, verbose: bool = False) -> np.ndarray:
-        """ONNX专用推理方法"""
-        img_original = np.copy(image)
-        mask_original = np.copy(mask)
-        mask_original[mask_original < 127] = 0
-        mask_original[mask_original >= 127] = 1
-        mask_original = mask_original[:, :, None]
+    def _prepare_onnx(self, image: np.ndarray, mask: np.ndarray, inpainting_size: int) -> Tuple[Dict[str, np.ndarray], Callable[[np.ndarray], np.ndarray]]:
+        """ONNX 推理的预处理（缩放到 16 的倍数，无 MPE 输入），返回值同 _prepare_torch"""
+        img_original = image
+        mask_original = (mask >= 127).astype(np.uint8)[:, :, None]
         
         height, width, c = image.shape
         if max(image.shape[0: 2]) > inpainting_size:
@@ -597,30 +621,22 @@ class LamaLargeInpainter(LamaMPEInpainter):
                 mask_resized = mask_resized[:, :, None]
         
         # 准备输入（0-1归一化，匹配ONNX模型）
-        img = image.astype(np.float32) / 255.0
-        img = np.transpose(img, (2, 0, 1))[None, ...]  # [1, 3, H, W]
-        
-        # ✅ 修复：正确处理mask维度
-        mask_input = mask_resized.astype(np.float32)[:, :, 0:1]
-        mask_input = np.transpose(mask_input, (2, 0, 1))[None, ...]  # [1, 1, H, W]
-        
-        # ONNX推理
-        ort_inputs = {
-            'image': img.astype(np.float32),
-            'mask': mask_input.astype(np.float32)
+        inputs = {
+            'image': np.transpose(image.astype(np.float32) / 255.0, (2, 0, 1)),  # [3, H, W]
+            'mask': np.transpose(mask_resized.astype(np.float32)[:, :, 0:1], (2, 0, 1)),  # [1, H, W]
         }
-        img_inpainted = self.session.run(None, ort_inputs)[0]
-        
-        # 后处理（0-1反归一化）
-        img_inpainted = np.transpose(img_inpainted[0], (1, 2, 0))  # [H, W, 3]
-        img_inpainted = (img_inpainted * 255.).astype(np.uint8)
-        
-        if new_h != height or new_w != width:
-            img_inpainted = cv2.resize(img_inpainted, (width, height), interpolation=cv2.INTER_LINEAR)
-        
-        ans = img_inpainted * mask_original + img_original * (1 - mask_original)
-        
-        return ans
+
+        def finish(output: np.ndarray) -> np.ndarray:
+            # 后处理（0-1反归一化）
+            img_inpainted = np.transpose(output, (1, 2, 0))  # [H, W, 3]
+            img_inpainted = (img_inpainted * 255.).astype(np.uint8)
+            
+            if new_h != height or new_w != width:
+                img_inpainted = cv2.resize(img_inpainted, (width, height), interpolation=cv2.INTER_LINEAR)
+            
+            return img_inpainted * mask_original + img_original * (1 - mask_original)
+
+        return inputs, finish
 
 
 
@@ -1200,10 +1216,14 @@ class LamaFourier:
     def __call__(self, img: Tensor, mask: Tensor, rel_pos=None, direct=None):
 
         if self.mpe is not None:
-            # 1 batch only
-            rel_pos, _, direct = self.load_masked_position_encoding(mask[0][0].cpu().numpy())
-            rel_pos = torch.LongTensor(rel_pos).unsqueeze_(0).to(img.device)
-            direct = torch.LongTensor(direct).unsqueeze_(0).to(img.device)
+            # MPE 逐张计算后堆叠，支持 batch > 1
+            rel_pos, direct = [], []
+            for m in mask[:, 0].cpu().numpy():
+                rp, _, d = self.load_masked_position_encoding(m)
+                rel_pos.append(rp)
+                direct.append(d)
+            rel_pos = torch.LongTensor(np.stack(rel_pos)).to(img.device)
+            direct = torch.LongTensor(np.stack(direct)).to(img.device)
             rel_pos, direct = self.mpe(rel_pos, direct)
         else:
             rel_pos, direct = None, None
@@ -1236,70 +1256,8 @@ class LamaFourier:
             }
 
     def load_masked_position_encoding(self, mask):
-        mask = (mask * 255).astype(np.uint8)
-        ones_filter = np.ones((3, 3), dtype=np.float32)
-        d_filter1 = np.array([[1, 1, 0], [1, 1, 0], [0, 0, 0]], dtype=np.float32)
-        d_filter2 = np.array([[0, 0, 0], [1, 1, 0], [1, 1, 0]], dtype=np.float32)
-        d_filter3 = np.array([[0, 1, 1], [0, 1, 1], [0, 0, 0]], dtype=np.float32)
-        d_filter4 = np.array([[0, 0, 0], [0, 1, 1], [0, 1, 1]], dtype=np.float32)
-        str_size = 256
-        pos_num = 128
-
-        ori_mask = mask.copy()
-        ori_h, ori_w = ori_mask.shape[0:2]
-        ori_mask = ori_mask / 255
-        mask = cv2.resize(mask, (str_size, str_size), interpolation=cv2.INTER_AREA)
-        mask[mask > 0] = 255
-        h, w = mask.shape[0:2]
-        mask3 = mask.copy()
-        mask3 = 1. - (mask3 / 255.0)
-        pos = np.zeros((h, w), dtype=np.int32)
-        direct = np.zeros((h, w, 4), dtype=np.int32)
-        i = 0
-
-        if mask3.max() > 0:
-            # otherwise it will cause infinity loop
-            while np.sum(1 - mask3) > 0:
-                i += 1
-                mask3_ = cv2.filter2D(mask3, -1, ones_filter)
-                mask3_[mask3_ > 0] = 1
-                sub_mask = mask3_ - mask3
-                pos[sub_mask == 1] = i
-
-                m = cv2.filter2D(mask3, -1, d_filter1)
-                m[m > 0] = 1
-                m = m - mask3
-                direct[m == 1, 0] = 1
-
-                m = cv2.filter2D(mask3, -1, d_filter2)
-                m[m > 0] = 1
-                m = m - mask3
-                direct[m == 1, 1] = 1
-
-                m = cv2.filter2D(mask3, -1, d_filter3)
-                m[m > 0] = 1
-                m = m - mask3
-                direct[m == 1, 2] = 1
-
-                m = cv2.filter2D(mask3, -1, d_filter4)
-                m[m > 0] = 1
-                m = m - mask3
-                direct[m == 1, 3] = 1
-
-                mask3 = mask3_
-
-        abs_pos = pos.copy()
-        rel_pos = pos / (str_size / 2)  # to 0~1 maybe larger than 1
-        rel_pos = (rel_pos * pos_num).astype(np.int32)
-        rel_pos = np.clip(rel_pos, 0, pos_num - 1)
-
-        if ori_w != w or ori_h != h:
-            rel_pos = cv2.resize(rel_pos, (ori_w, ori_h), interpolation=cv2.INTER_NEAREST)
-            rel_pos[ori_mask == 0] = 0
-            direct = cv2.resize(direct, (ori_w, ori_h), interpolation=cv2.INTER_NEAREST)
-            direct[ori_mask == 0, :] = 0
-
-        return rel_pos, abs_pos, direct
+        rel_pos, abs_pos, direct = masked_position_encoding((mask * 255).astype(np.uint8))
+        return rel_pos.astype(np.int32), abs_pos.copy(), direct.astype(np.int32)
 
 
 def load_lama_mpe(model_path, device, use_mpe: bool = True, large_arch: bool = False) -> LamaFourier:
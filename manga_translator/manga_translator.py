@@ -30,6 +30,7 @@ from .utils import (
     get_color_name,
     rgb2hex,
     TextBlock,
+    Quadrilateral,
     imwrite_unicode
 )
 import matplotlib
@@ -42,16 +43,18 @@ from .utils.path_manager import (
     find_json_path
 )
 
-from .detection import dispatch as dispatch_detection, prepare as prepare_detection, unload as unload_detection
+from .detection import dispatch as dispatch_detection, dispatch_batch as dispatch_batch_detection, prepare as prepare_detection, unload as unload_detection
+from .detection.nms import nms_quadrilaterals
 from .upscaling import dispatch as dispatch_upscaling, prepare as prepare_upscaling, unload as unload_upscaling
-from .ocr import dispatch as dispatch_ocr, prepare as prepare_ocr, unload as unload_ocr
+from .ocr import dispatch as dispatch_ocr, dispatch_batch as dispatch_batch_ocr, prepare as prepare_ocr, unload as unload_ocr
 from .textline_merge import dispatch as dispatch_textline_merge
 from .mask_refinement import dispatch as dispatch_mask_refinement
-from .inpainting import dispatch as dispatch_inpainting, prepare as prepare_inpainting, unload as unload_inpainting
+from .inpainting import dispatch as dispatch_inpainting, dispatch_batch as dispatch_batch_inpainting, prepare as prepare_inpainting, unload as unload_inpainting
 from .translators import (
     dispatch as dispatch_translation,
     prepare as prepare_translation,
     unload as unload_translation,
+    get_translation_memory,
 )
 from .translators.common import ISO_639_1_TO_VALID_LANGUAGES
 from .colorization import dispatch as dispatch_colorization, prepare as prepare_colorization, unload as unload_colorization
@@ -231,6 +234,11 @@ class MangaTranslator:
         
         # batch_concurrent 参数保留供未来功能使用
         # TODO: 当前未实现，预留给未来的并发优化功能
+
+        # 流水线批处理：检测/OCR、翻译、渲染跨批次重叠执行
+        self.batch_pipeline = params.get('batch_pipeline', False)
+        # 阶段间队列容量（批次数），限制流水线中同时驻留的批次以控制内存
+        self.pipeline_queue_size = max(1, int(params.get('pipeline_queue_size', 1)))
             
         self.ignore_errors = params.get('ignore_errors', False)
         # check mps for apple silicon or cuda for nvidia
@@ -962,6 +970,7 @@ class MangaTranslator:
             realcugan_model = getattr(config.upscale, 'realcugan_model', None)
             if realcugan_model:
                 upscaler_kwargs['model_name'] = realcugan_model
+        if config.upscale.upscaler in ('realcugan', '4xultrasharp'):
             # tile_size: None=use upscaler default, 0=no tiling, >0=manual tile size
             tile_size = getattr(config.upscale, 'tile_size', None)
             if tile_size is not None:
@@ -992,7 +1001,23 @@ class MangaTranslator:
                                         self.device, self.verbose,
                                         config.detector.use_yolo_obb, config.detector.yolo_obb_conf, config.detector.yolo_obb_iou, config.detector.yolo_obb_overlap_threshold,
                                         config.detector.min_box_area_ratio)
-        
+        return self._finalize_detection_result(config, ctx, result)
+
+    async def _run_batch_detection(self, config: Config, images: List[np.ndarray]) -> List[tuple]:
+        """对多页图片执行一次批量检测，返回未经后处理（NMS等）的逐页检测结果"""
+        current_time = time.time()
+        self._model_usage_timestamps[("detection", config.detector.detector)] = current_time
+        return await dispatch_batch_detection(config.detector.detector, images, config.detector.detection_size, config.detector.text_threshold,
+                                              config.detector.box_threshold,
+                                              config.detector.unclip_ratio, config.detector.det_invert, config.detector.det_gamma_correct, config.detector.det_rotate,
+                                              config.detector.det_auto_rotate,
+                                              self.device, self.verbose,
+                                              config.detector.use_yolo_obb, config.detector.yolo_obb_conf, config.detector.yolo_obb_iou, config.detector.yolo_obb_overlap_threshold,
+                                              config.detector.min_box_area_ratio,
+                                              max_batch_size=config.detector.detection_batch_size)
+
+    def _finalize_detection_result(self, config: Config, ctx: Context, result):
+        """保存检测调试图并对检测结果做NMS去重"""
         # 处理bbox调试图（如果检测器返回了）
         if self.verbose and result and len(result) == 3 and result[2] is not None:
             third_elem = result[2]
@@ -1049,32 +1074,8 @@ class MangaTranslator:
         # --- BEGIN NON-MAXIMUM SUPPRESSION (NMS) FOR DE-DUPLICATION ---
         if result and result[0]:
             try:
-                from shapely.geometry import Polygon
-
-                def calculate_iou(box_1, box_2):
-                    poly_1 = Polygon(box_1.pts)
-                    poly_2 = Polygon(box_2.pts)
-                    if not poly_1.is_valid or not poly_2.is_valid:
-                        return 0.0
-                    intersection_area = poly_1.intersection(poly_2).area
-                    union_area = poly_1.union(poly_2).area
-                    if union_area == 0:
-                        return 0.0
-                    return intersection_area / union_area
-
-                textlines = result[0][:] # Work on a copy
-                textlines.sort(key=lambda x: x.prob, reverse=True)
-                
-                kept_textlines = []
-                while textlines:
-                    current_box = textlines.pop(0)
-                    kept_textlines.append(current_box)
-                    remaining_textlines = []
-                    for box in textlines:
-                        iou = calculate_iou(current_box, box)
-                        if iou < 0.9: # IoU threshold, 0.9 means very high overlap
-                            remaining_textlines.append(box)
-                    textlines = remaining_textlines
+                # AABB 空间索引预筛选 + 仅对候选对计算精确多边形 IoU
+                kept_textlines = nms_quadrilaterals(result[0], iou_threshold=0.9) # 0.9 means very high overlap
 
                 if len(result[0]) != len(kept_textlines):
                     logger.info(f"Removed {len(result[0]) - len(kept_textlines)} duplicate lines via NMS.")
@@ -1138,7 +1139,10 @@ class MangaTranslator:
                     del self._model_usage_timestamps[(tool, model)]
             await asyncio.sleep(1)
 
-    async def _run_ocr(self, config: Config, ctx: Context):
+    async def _run_ocr(self, config: Config, ctx: Context, primary_textlines: Optional[List[Quadrilateral]] = None):
+        """
+        primary_textlines: 跨页批量OCR预先得到的主OCR结果，提供时跳过主OCR，只做混合OCR补识别和后处理
+        """
         current_time = time.time()
         self._model_usage_timestamps[("ocr", config.ocr.ocr)] = current_time
         
@@ -1166,8 +1170,11 @@ class MangaTranslator:
         try:
             # --- Primary OCR run ---
             primary_ocr_engine = config.ocr.ocr
-            logger.info(f"Running primary OCR with: {primary_ocr_engine.value}")
-            textlines = await dispatch_ocr(primary_ocr_engine, ctx.img_rgb, ctx.textlines, config.ocr, self.device, self.verbose)
+            if primary_textlines is not None:
+                textlines = primary_textlines
+            else:
+                logger.info(f"Running primary OCR with: {primary_ocr_engine.value}")
+                textlines = await dispatch_ocr(primary_ocr_engine, ctx.img_rgb, ctx.textlines, config.ocr, self.device, self.verbose)
 
             # --- BEGIN: HYBRID OCR LOGIC ---
             if config.ocr.use_hybrid_ocr:
@@ -1225,15 +1232,17 @@ class MangaTranslator:
                 new_textlines.append(textline)
         return new_textlines
 
+    async def _run_batch_ocr(self, config: Config, images: List[np.ndarray], textlines_list: List[List[Quadrilateral]]) -> List[List[Quadrilateral]]:
+        """对多页图片执行一次跨页批量主OCR，返回逐页识别结果（未做混合OCR和过滤）"""
+        current_time = time.time()
+        self._model_usage_timestamps[("ocr", config.ocr.ocr)] = current_time
+        logger.info(f"Running batched primary OCR with: {config.ocr.ocr.value} ({len(images)} pages)")
+        return await dispatch_batch_ocr(config.ocr.ocr, images, textlines_list, config.ocr, self.device, self.verbose)
+
     async def _run_textline_merge(self, config: Config, ctx: Context):
         current_time = time.time()
         self._model_usage_timestamps[("textline_merge", "textline_merge")] = current_time
-        text_regions = await dispatch_textline_merge(ctx.textlines, ctx.img_rgb.shape[1], ctx.img_rgb.shape[0],
-                                                     config, verbose=self.verbose)
-        for region in text_regions:
-            if not hasattr(region, "text_raw"):
-                region.text_raw = region.text      # <- Save the initial OCR results to expand the render detection box. Also, prevent affecting the forbidden translation function.       
-        # Filter out languages to skip  
+        # Filter out languages to skip before merging, so the merge graph is only built once per page
         if config.translator.skip_lang is not None:  
             skip_langs = [lang.strip().upper() for lang in config.translator.skip_lang.split(',')]
             filtered_textlines = []  
@@ -1258,6 +1267,9 @@ class MangaTranslator:
     
         text_regions = await dispatch_textline_merge(ctx.textlines, ctx.img_rgb.shape[1], ctx.img_rgb.shape[0],  
                                                      config, verbose=self.verbose)  
+        for region in text_regions:
+            if not hasattr(region, "text_raw"):
+                region.text_raw = region.text      # <- Save the initial OCR results to expand the render detection box. Also, prevent affecting the forbidden translation function.       
 
         # 应用合并后的面积过滤（基于合并后的大框）
         # 只过滤单个检测框的小区域，保留包含多个检测框的合并区域
@@ -1524,6 +1536,7 @@ class MangaTranslator:
             translator = OpenAITranslator()
 
             translator.parse_args(config.translator)
+            translator.translation_memory = get_translation_memory(config.translator)
             translator.set_prev_context(prev_ctx)
 
             if pages_used > 0:
@@ -1535,7 +1548,7 @@ class MangaTranslator:
 
 
             # OpenAI 需要传递 ctx 参数（用于AI断句）
-            return await translator._translate(ctx.from_lang, config.translator.target_lang, texts, ctx)
+            return await translator._translate_with_memory(ctx.from_lang, config.translator.target_lang, texts, ctx)
         else:
             return await dispatch_translation(
                 config.translator.translator_gen,
@@ -1938,6 +1951,13 @@ class MangaTranslator:
         return await dispatch_mask_refinement(ctx.text_regions, ctx.img_rgb, ctx.mask_raw, 'fit_text',
                                               config.mask_dilation_offset, config.ocr.ignore_bubble, self.verbose,self.kernel_size)
 
+    async def _run_batch_inpainting(self, config: Config, contexts: List[Context]) -> List[np.ndarray]:
+        """对多页执行一次批量修复，返回与contexts顺序一致的修复结果"""
+        current_time = time.time()
+        self._model_usage_timestamps[("inpainting", config.inpainter.inpainter)] = current_time
+        return await dispatch_batch_inpainting(config.inpainter.inpainter, [ctx.img_rgb for ctx in contexts], [ctx.mask for ctx in contexts],
+                                               config.inpainter, config.inpainter.inpainting_size, self.device, self.verbose)
+
     async def _run_inpainting(self, config: Config, ctx: Context):
         current_time = time.time()
         self._model_usage_timestamps[("inpainting", config.inpainter.inpainter)] = current_time
@@ -2277,6 +2297,12 @@ class MangaTranslator:
                 logger.info("✅ All files already exist, nothing to process")
                 return results
 
+        # 流水线模式：检测/OCR、翻译、渲染三个阶段在相邻批次之间重叠执行
+        if self._can_use_batch_pipeline(is_template_save_mode):
+            results.extend(await self._translate_batch_pipelined(images_with_configs, batch_size, save_info, global_offset, display_total))
+            logger.info(f"Batch translation completed: processed {len(results)} images")
+            return results
+
         # 分批处理所有图片
         for batch_start in range(0, total_images, batch_size):
             await asyncio.sleep(0)  # 检查是否被取消
@@ -2418,27 +2444,7 @@ class MangaTranslator:
                 continue
 
             # 标准模式：执行检测、OCR等预处理
-            for i, (image, config) in enumerate(current_batch_images):
-                # 检查是否被取消
-                await asyncio.sleep(0)
-                try:
-                    self._set_image_context(config, image)
-                    # ✅ 保存context以便渲染阶段复用，避免生成两个文件夹
-                    from .utils.generic import get_image_md5
-                    image_md5 = get_image_md5(image)
-                    self._save_current_image_context(image_md5)
-                    ctx = await self._translate_until_translation(image, config)
-                    if hasattr(image, 'name'):
-                        ctx.image_name = image.name
-                    preprocessed_contexts.append((ctx, config))
-                except Exception as e:
-                    logger.error(f"Error pre-processing image {i+1} in batch: {e}")
-                    ctx = Context()
-                    ctx.input = image
-                    ctx.text_regions = []
-                    if hasattr(image, 'name'):
-                        ctx.image_name = image.name
-                    preprocessed_contexts.append((ctx, config))
+            preprocessed_contexts = await self._preprocess_batch_images(current_batch_images)
 
             # --- 阶段2: 翻译 ---
             if self.colorize_only:
@@ -2546,77 +2552,317 @@ class MangaTranslator:
                 continue  # 跳过渲染，继续下一批次
 
             # 标准流程：渲染并保存
-            for ctx, config in translated_contexts:
-                await asyncio.sleep(0)  # 检查是否被取消
-                try:
-                    if hasattr(ctx, 'input'):
-                        from .utils.generic import get_image_md5
-                        image_md5 = get_image_md5(ctx.input)
-                        if not self._restore_image_context(image_md5):
-                            self._set_image_context(config, ctx.input)
-                    
-                    # Colorize Only Mode: Skip rendering pipeline
-                    if not self.colorize_only:
-                        ctx = await self._complete_translation_pipeline(ctx, config)
-
-                    logger.info(f"[DEBUG] save_info={save_info is not None}, ctx.result={ctx.result is not None}")
-                    if save_info and ctx.result:
-                        try:
-                            overwrite = save_info.get('overwrite', True)
-                            final_output_path = self._calculate_output_path(ctx.image_name, save_info)
-                            self._save_translated_image(ctx.result, final_output_path, ctx.image_name, overwrite, "BATCH")
-                        except Exception as save_err:
-                            logger.error(f"Error saving standard batch result for {os.path.basename(ctx.image_name)}: {save_err}")
-
-                    # 只在save_text或text_output_file启用时保存JSON
-                    if (self.save_text or self.text_output_file) and ctx.text_regions and hasattr(ctx, 'image_name') and ctx.image_name:
-                        # 使用循环变量中的config，而不是从ctx中获取
-                        self._save_text_to_file(ctx.image_name, ctx, config)
-
-                    results.append(ctx)
-                except Exception as e:
-                    logger.error(f"Error rendering image in batch: {e}")
-                    results.append(ctx)
+            results.extend(await self._render_and_save_batch(translated_contexts, save_info))
 
             # ✅ 批次完成后立即清理内存（参考高质量翻译模式的清理逻辑）
-            import gc
-            
-            # 1. 清理current_batch_images中的图像引用
-            for image, _ in current_batch_images:
-                if hasattr(image, 'close'):
-                    try:
-                        image.close()
-                    except:
-                        pass
+            self._release_batch_memory(current_batch_images, preprocessed_contexts, translated_contexts)
             current_batch_images = None
             
-            # 2. 清理preprocessed_contexts中的输入图像
-            for ctx, _ in preprocessed_contexts:
-                if hasattr(ctx, 'input'):
-                    ctx.input = None
-            preprocessed_contexts.clear()
-            
-            # 3. 清理translated_contexts中的中间图像（保留result用于返回）
-            for ctx, _ in translated_contexts:
-                if hasattr(ctx, 'img_rgb'):
-                    ctx.img_rgb = None
-                if hasattr(ctx, 'img_inpainted'):
-                    ctx.img_inpainted = None
-                if hasattr(ctx, 'img_rendered'):
-                    ctx.img_rendered = None
-            translated_contexts.clear()
-            
-            # 4. 强制垃圾回收和GPU显存清理
-            self._cleanup_gpu_memory()
-            
             logger.debug(f'[MEMORY] Batch {batch_start//batch_size + 1} cleanup completed')
 
         logger.info(f"Batch translation completed: processed {len(results)} images")
         return results
 
-    async def _translate_until_translation(self, image: Image.Image, config: Config) -> Context:
+    def _can_use_batch_pipeline(self, is_template_save_mode: bool) -> bool:
+        """判断标准批量流程是否可以使用流水线执行器"""
+        if not self.batch_pipeline:
+            return False
+        if self.load_text or self.generate_and_export or is_template_save_mode:
+            # 导入/导出模式有各自的特殊流程，保持顺序执行
+            return False
+        if self.verbose:
+            # 调试图片路径（_result_path）仍依赖全局的 _current_image_context，阶段交错会导致子文件夹错乱
+            logger.debug('Verbose mode enabled, batch pipeline disabled to keep debug image folders consistent')
+            return False
+        return True
+
+    async def _preprocess_batch_images(self, batch_images: List[tuple]) -> List[tuple]:
+        """
+        对一个批次的图片执行翻译前的所有步骤（检测、OCR、文本行合并）
+
+        Returns:
+            List of (ctx, config) tuples，失败的图片返回空 text_regions 的上下文
+        """
+        preprocessed_contexts = []
+        detection_results = await self._prefetch_batch_detection(batch_images)
+        ocr_results = await self._prefetch_batch_ocr(batch_images, detection_results)
+        for i, (image, config) in enumerate(batch_images):
+            # 检查是否被取消
+            await asyncio.sleep(0)
+            try:
+                self._set_image_context(config, image)
+                # ✅ 保存context以便渲染阶段复用，避免生成两个文件夹
+                from .utils.generic import get_image_md5
+                image_md5 = get_image_md5(image)
+                self._save_current_image_context(image_md5)
+                # 流水线模式下渲染阶段会并发改写全局上下文，先取一份本页的副本挂到ctx上
+                image_context = self._current_image_context.copy()
+                ctx = await self._translate_until_translation(image, config, detection_result=detection_results[i],
+                                                              ocr_result=ocr_results[i])
+                ctx.image_context = image_context
+                if hasattr(image, 'name'):
+                    ctx.image_name = image.name
+                preprocessed_contexts.append((ctx, config))
+            except Exception as e:
+                logger.error(f"Error pre-processing image {i+1} in batch: {e}")
+                ctx = Context()
+                ctx.input = image
+                ctx.text_regions = []
+                if hasattr(image, 'name'):
+                    ctx.image_name = image.name
+                preprocessed_contexts.append((ctx, config))
+        return preprocessed_contexts
+
+    async def _prefetch_batch_detection(self, batch_images: List[tuple]) -> List[Optional[tuple]]:
+        """
+        批量模式下对整个批次做一次跨页批量检测（多页合并为一次前向推理）
+
+        仅在检测输入就是原图时启用（无上色/超分，非仅上色/超分/修复模式），且批次内检测配置一致。
+        返回与batch_images等长的列表，无法批量检测时元素为None（回退到逐页检测）。
+        """
+        no_prefetch = [None] * len(batch_images)
+        if len(batch_images) < 2:
+            return no_prefetch
+        first_config = batch_images[0][1]
+        if (first_config.detector.detection_batch_size <= 1
+                or self.colorize_only or self.upscale_only or self.inpaint_only
+                or any(config.colorizer.colorizer != Colorizer.none or config.upscale.upscale_ratio
+                       or config.detector != first_config.detector for _, config in batch_images)):
+            return no_prefetch
+
+        try:
+            images = [load_image(image)[0] for image, _ in batch_images]
+            await self._report_progress('detection')
+            results = await self._run_batch_detection(first_config, images)
+            logger.info(f'Batched detection finished for {len(images)} pages')
+            return results
+        except Exception as e:
+            logger.error(f"Batched detection failed, falling back to per-page detection: {e}")
+            return no_prefetch
+
+    async def _prefetch_batch_ocr(self, batch_images: List[tuple], detection_results: List[Optional[tuple]]) -> List[Optional[List[Quadrilateral]]]:
+        """
+        批量模式下对整个批次做一次跨页批量OCR（所有页面的文本行一起按宽度分块推理）
+
+        仅在整批检测已预取、非verbose（OCR调试图按页存放）且批次内OCR配置一致时启用。
+        批量OCR成功时才就地把detection_results替换为后处理（NMS）后的结果，返回与batch_images等长的逐页主OCR结果，
+        无法批量OCR时元素为None（回退到逐页OCR）。
+        """
+        no_prefetch = [None] * len(batch_images)
+        if len(batch_images) < 2 or self.verbose or any(result is None for result in detection_results):
+            return no_prefetch
+        first_config = batch_images[0][1]
+        if any(config.ocr != first_config.ocr for _, config in batch_images):
+            return no_prefetch
+
+        try:
+            # 先后处理到局部列表，OCR失败时detection_results保持原样，逐页路径不会重复后处理
+            finalized_results = [self._finalize_detection_result(config, Context(), detection_results[i])
+                                 for i, (_, config) in enumerate(batch_images)]
+            images = [load_image(image)[0] for image, _ in batch_images]
+            textlines_list = [result[0] or [] for result in finalized_results]
+            await self._report_progress('ocr')
+            results = await self._run_batch_ocr(first_config, images, textlines_list)
+            logger.info(f'Batched OCR finished for {sum(len(t) for t in textlines_list)} textlines on {len(images)} pages')
+            detection_results[:] = finalized_results
+            return results
+        except Exception as e:
+            logger.error(f"Batched OCR failed, falling back to per-page OCR: {e}")
+            return no_prefetch
+
+    async def _prefetch_batch_inpainting(self, translated_contexts: List[tuple]) -> List[Optional[np.ndarray]]:
+        """
+        批量模式下对整个批次做一次跨页批量修复（预处理后尺寸相同的页面合并为一次前向推理）
+
+        仅在非verbose（修复调试图按页存放）、非仅上色模式且批次内修复配置一致时启用，启用时先逐页完成掩码细化。
+        返回与translated_contexts等长的逐页修复结果，无法批量修复时元素为None（回退到逐页修复）。
+        """
+        no_prefetch = [None] * len(translated_contexts)
+        if len(translated_contexts) < 2 or self.verbose or self.colorize_only:
+            return no_prefetch
+        first_config = translated_contexts[0][1]
+        if (first_config.inpainter.inpainting_batch_size <= 1
+                or any(config.inpainter != first_config.inpainter for _, config in translated_contexts)):
+            return no_prefetch
+        # 与 _complete_translation_pipeline 一致：无文本、已取消或仅修复模式已完成的页面不需要修复
+        indices = [i for i, (ctx, _) in enumerate(translated_contexts)
+                   if ctx.text_regions and ctx.text_regions != 'cancel' and not ctx.inpaint_only_complete]
+        if len(indices) < 2:
+            return no_prefetch
+
+        try:
+            for i in indices:
+                ctx, config = translated_contexts[i]
+                if ctx.mask is None:
+                    await self._report_progress('mask-generation')
+                    ctx.mask = await self._run_mask_refinement(config, ctx)
+            contexts = [translated_contexts[i][0] for i in indices]
+            await self._report_progress('inpainting')
+            inpainted = await self._run_batch_inpainting(first_config, contexts)
+            logger.info(f'Batched inpainting finished for {len(contexts)} pages')
+        except Exception as e:
+            logger.error(f"Batched inpainting failed, falling back to per-page inpainting: {e}")
+            return no_prefetch
+        finally:
+            self._cleanup_gpu_memory()
+
+        results = list(no_prefetch)
+        for i, image in zip(indices, inpainted):
+            results[i] = image
+        return results
+
+    async def _render_and_save_batch(self, translated_contexts: List[tuple], save_info: dict = None) -> List[Context]:
+        """
+        对已翻译的批次执行修复、渲染并保存结果
+
+        Returns:
+            按输入顺序排列的 Context 列表
+        """
+        rendered = []
+        inpainted_results = await self._prefetch_batch_inpainting(translated_contexts)
+        for i, (ctx, config) in enumerate(translated_contexts):
+            await asyncio.sleep(0)  # 检查是否被取消
+            try:
+                if ctx.image_context:
+                    self._current_image_context = ctx.image_context.copy()
+                elif hasattr(ctx, 'input'):
+                    from .utils.generic import get_image_md5
+                    image_md5 = get_image_md5(ctx.input)
+                    if not self._restore_image_context(image_md5):
+                        self._set_image_context(config, ctx.input)
+                    ctx.image_context = self._current_image_context.copy()
+
+                # Colorize Only Mode: Skip rendering pipeline
+                if not self.colorize_only:
+                    ctx = await self._complete_translation_pipeline(ctx, config, inpainted=inpainted_results[i])
+
+                logger.info(f"[DEBUG] save_info={save_info is not None}, ctx.result={ctx.result is not None}")
+                if save_info and ctx.result:
+                    try:
+                        overwrite = save_info.get('overwrite', True)
+                        final_output_path = self._calculate_output_path(ctx.image_name, save_info)
+                        self._save_translated_image(ctx.result, final_output_path, ctx.image_name, overwrite, "BATCH")
+                    except Exception as save_err:
+                        logger.error(f"Error saving standard batch result for {os.path.basename(ctx.image_name)}: {save_err}")
+
+                # 只在save_text或text_output_file启用时保存JSON
+                if (self.save_text or self.text_output_file) and ctx.text_regions and hasattr(ctx, 'image_name') and ctx.image_name:
+                    # 使用循环变量中的config，而不是从ctx中获取
+                    self._save_text_to_file(ctx.image_name, ctx, config)
+
+                rendered.append(ctx)
+            except Exception as e:
+                logger.error(f"Error rendering image in batch: {e}")
+                rendered.append(ctx)
+        return rendered
+
+    def _release_batch_memory(self, batch_images: List[tuple], preprocessed_contexts: List[tuple], translated_contexts: List[tuple]):
+        """批次完成后释放图片和中间结果（保留result用于返回）"""
+        # 1. 清理batch_images中的图像引用
+        for image, _ in batch_images:
+            if hasattr(image, 'close'):
+                try:
+                    image.close()
+                except:
+                    pass
+
+        # 2. 清理preprocessed_contexts中的输入图像
+        for ctx, _ in preprocessed_contexts:
+            if hasattr(ctx, 'input'):
+                ctx.input = None
+        preprocessed_contexts.clear()
+
+        # 3. 清理translated_contexts中的中间图像
+        for ctx, _ in translated_contexts:
+            if hasattr(ctx, 'img_rgb'):
+                ctx.img_rgb = None
+            if hasattr(ctx, 'img_inpainted'):
+                ctx.img_inpainted = None
+            if hasattr(ctx, 'img_rendered'):
+                ctx.img_rendered = None
+        translated_contexts.clear()
+
+        # 4. 强制垃圾回收和GPU显存清理
+        self._cleanup_gpu_memory()
+
+    async def _translate_batch_pipelined(self, images_with_configs: List[tuple], batch_size: int, save_info: dict = None,
+                                         global_offset: int = 0, display_total: int = None) -> List[Context]:
+        """
+        流水线批量执行器：预处理（检测/OCR/合并）、翻译、渲染三个阶段并发运行。
+
+        批次 N+1 做检测和OCR的同时，批次 N 在等待翻译API，批次 N-1 在修复和渲染。
+        阶段之间使用有界队列连接，最多同时驻留 (2 * pipeline_queue_size + 3) 个批次，内存上限可控。
+        每个阶段内部仍按批次顺序执行，翻译分组、上下文顺序与顺序模式完全一致，输出不变。
+        """
+        total_images = len(images_with_configs)
+        display_total = display_total if display_total is not None else total_images
+        global_total_batches = (display_total + batch_size - 1) // batch_size
+
+        translate_queue: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        render_queue: asyncio.Queue = asyncio.Queue(maxsize=self.pipeline_queue_size)
+        results = []
+
+        logger.info(f'Batch pipeline enabled: {total_images} images, batch size: {batch_size}, queue size: {self.pipeline_queue_size}')
+
+        async def preprocess_stage():
+            for batch_start in range(0, total_images, batch_size):
+                batch_end = min(batch_start + batch_size, total_images)
+                current_batch_images = images_with_configs[batch_start:batch_end]
+                global_batch_num = (global_offset + batch_start) // batch_size + 1
+                logger.info(f"[Pipeline] Pre-processing rolling batch {global_batch_num}/{global_total_batches} "
+                            f"(images {global_offset + batch_start + 1}-{global_offset + batch_end})")
+                preprocessed_contexts = await self._preprocess_batch_images(current_batch_images)
+                await translate_queue.put((global_batch_num, current_batch_images, preprocessed_contexts))
+            await translate_queue.put(None)
+
+        async def translate_stage():
+            while True:
+                item = await translate_queue.get()
+                if item is None:
+                    await render_queue.put(None)
+                    return
+                global_batch_num, current_batch_images, preprocessed_contexts = item
+                if self.colorize_only:
+                    translated_contexts = list(preprocessed_contexts)
+                else:
+                    logger.info(f"[Pipeline] Translating rolling batch {global_batch_num}/{global_total_batches}")
+                    translated_contexts = await self._batch_translate_contexts(preprocessed_contexts, batch_size)
+                await render_queue.put((global_batch_num, current_batch_images, preprocessed_contexts, translated_contexts))
+
+        async def render_stage():
+            while True:
+                item = await render_queue.get()
+                if item is None:
+                    return
+                global_batch_num, current_batch_images, preprocessed_contexts, translated_contexts = item
+                logger.info(f"[Pipeline] Rendering rolling batch {global_batch_num}/{global_total_batches}")
+                results.extend(await self._render_and_save_batch(translated_contexts, save_info))
+                self._release_batch_memory(current_batch_images, preprocessed_contexts, translated_contexts)
+                logger.debug(f'[MEMORY] Pipeline batch {global_batch_num} cleanup completed')
+
+        stages = [
+            asyncio.create_task(preprocess_stage()),
+            asyncio.create_task(translate_stage()),
+            asyncio.create_task(render_stage()),
+        ]
+        try:
+            await asyncio.gather(*stages)
+        except BaseException:
+            # 任一阶段失败或被取消时停止其余阶段，避免在队列上永久阻塞
+            for task in stages:
+                task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+            raise
+
+        return results
+
+    async def _translate_until_translation(self, image: Image.Image, config: Config, detection_result: Optional[tuple] = None,
+                                           ocr_result: Optional[List[Quadrilateral]] = None) -> Context:
         """
         执行翻译之前的所有步骤（彩色化、上采样、检测、OCR、文本行合并）
+
+        detection_result: 批量检测预先得到的该页检测结果，提供时跳过逐页检测
+        ocr_result: 批量OCR预先得到的该页主OCR结果（此时detection_result已完成后处理），提供时跳过逐页主OCR
         """
         
         ctx = Context()
@@ -2647,6 +2893,7 @@ class MangaTranslator:
                 if config.upscale.upscaler == 'realcugan':
                     if config.upscale.realcugan_model:
                         upscaler_kwargs['model_name'] = config.upscale.realcugan_model
+                if config.upscale.upscaler in ('realcugan', '4xultrasharp'):
                     if config.upscale.tile_size is not None:
                         upscaler_kwargs['tile_size'] = config.upscale.tile_size
                 await prepare_upscaling(config.upscale.upscaler, **upscaler_kwargs)
@@ -2835,7 +3082,12 @@ class MangaTranslator:
         # -- Detection
         await self._report_progress('detection')
         try:
-            ctx.textlines, ctx.mask_raw, ctx.mask = await self._run_detection(config, ctx)
+            if detection_result is not None and ocr_result is not None:
+                ctx.textlines, ctx.mask_raw, ctx.mask = detection_result
+            elif detection_result is not None:
+                ctx.textlines, ctx.mask_raw, ctx.mask = self._finalize_detection_result(config, ctx, detection_result)
+            else:
+                ctx.textlines, ctx.mask_raw, ctx.mask = await self._run_detection(config, ctx)
         except Exception as e:  
             logger.error(f"Error during detection:\n{traceback.format_exc()}")  
             if not self.ignore_errors:  
@@ -2865,7 +3117,7 @@ class MangaTranslator:
         # -- OCR
         await self._report_progress('ocr')
         try:
-            ctx.textlines = await self._run_ocr(config, ctx)
+            ctx.textlines = await self._run_ocr(config, ctx, primary_textlines=ocr_result)
         except Exception as e:  
             logger.error(f"Error during ocr:\n{traceback.format_exc()}")  
             if not self.ignore_errors:  
@@ -3405,6 +3657,7 @@ class MangaTranslator:
                 translator = GeminiHighQualityTranslator()
 
             translator.parse_args(config.translator)
+            translator.translation_memory = get_translation_memory(config.translator)
             # 只有当 self.attempts 不是默认值时才覆盖（允许 API 传入的 config.translator.attempts 生效）
             if self.attempts != -1:
                 translator.attempts = self.attempts
@@ -3447,7 +3700,7 @@ class MangaTranslator:
             # openai_hq, gemini_hq 等需要传递ctx参数
             if config.translator.translator in [Translator.openai_hq, Translator.gemini_hq]:
                 # 所有需要上下文的翻译器都在这里传递ctx
-                return await translator._translate(
+                return await translator._translate_with_memory(
                     ctx.from_lang,
                     config.translator.target_lang,
                     texts,
@@ -3455,7 +3708,7 @@ class MangaTranslator:
                 )
             else:
                 # 普通OpenAI和Gemini需要ctx参数（用于AI断句）
-                return await translator._translate(
+                return await translator._translate_with_memory(
                     ctx.from_lang,
                     config.translator.target_lang,
                     texts,
@@ -3643,9 +3896,11 @@ class MangaTranslator:
         
         return ctx.text_regions
 
-    async def _complete_translation_pipeline(self, ctx: Context, config: Config) -> Context:
+    async def _complete_translation_pipeline(self, ctx: Context, config: Config, inpainted: Optional[np.ndarray] = None) -> Context:
         """
         完成翻译后的处理步骤（掩码细化、修复、渲染）
+
+        inpainted: 批量修复预先得到的该页修复结果（此时掩码细化已完成），提供时跳过逐页修复
         """
         await self._report_progress('after-translating')
 
@@ -3696,18 +3951,21 @@ class MangaTranslator:
 
         # -- Inpainting
         await self._report_progress('inpainting')
-        try:
-            ctx.img_inpainted = await self._run_inpainting(config, ctx)
-            
-            # ✅ Inpainting完成后强制GC和GPU清理
-            self._cleanup_gpu_memory()
+        if inpainted is not None:
+            ctx.img_inpainted = inpainted
+        else:
+            try:
+                ctx.img_inpainted = await self._run_inpainting(config, ctx)
 
-        except Exception as e:
-            logger.error(f"Error during inpainting:\n{traceback.format_exc()}")
-            if not self.ignore_errors:
-                raise
-            else:
-                ctx.img_inpainted = ctx.img_rgb
+                # ✅ Inpainting完成后强制GC和GPU清理
+                self._cleanup_gpu_memory()
+
+            except Exception as e:
+                logger.error(f"Error during inpainting:\n{traceback.format_exc()}")
+                if not self.ignore_errors:
+                    raise
+                else:
+                    ctx.img_inpainted = ctx.img_rgb
 
         if self.verbose:
             try:
@@ -3726,8 +3984,10 @@ class MangaTranslator:
         await self._report_progress('rendering')
 
         # 在rendering状态后立即发送文件夹信息，用于前端精确检查final.png
-        if hasattr(self, '_progress_hooks') and self._current_image_context:
-            folder_name = self._current_image_context['subfolder']
+        # 优先使用ctx上携带的本页上下文，流水线模式下全局上下文可能已属于其他页面
+        image_context = ctx.image_context or self._current_image_context
+        if hasattr(self, '_progress_hooks') and image_context:
+            folder_name = image_context['subfolder']
             # 发送特殊格式的消息，前端可以解析
             await self._report_progress(f'rendering_folder:{folder_name}')
 
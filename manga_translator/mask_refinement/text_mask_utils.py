@@ -5,7 +5,6 @@ import math
 import logging
 
 from tqdm import tqdm
-from shapely.geometry import Polygon
 # from sklearn.mixture import BayesianGaussianMixture
 # from functools import reduce
 # from collections import defaultdict
@@ -95,9 +94,72 @@ def refine_mask(rgbimg, rawmask):
     crf_mask = np.array(res * 255, dtype=np.uint8)
     return crf_mask
 
+def _bilateral_filter_roi(img: np.ndarray, x: int, y: int, w: int, h: int, d: int = 17, sigma_color: float = 80, sigma_space: float = 80) -> np.ndarray:
+    """
+    对 img[y:y+h, x:x+w] 做双边滤波，结果与整图滤波后再裁剪一致：
+    向外多取 d // 2 像素的邻域（在图像边界处截断，边界外仍由 OpenCV 按默认方式镜像填充）。
+    """
+    r = d // 2
+    ex1, ey1 = max(x - r, 0), max(y - r, 0)
+    ex2, ey2 = min(x + w + r, img.shape[1]), min(y + h + r, img.shape[0])
+    filtered = cv2.bilateralFilter(np.ascontiguousarray(img[ey1:ey2, ex1:ex2]), d, sigma_color, sigma_space)
+    return np.ascontiguousarray(filtered[y - ey1: y - ey1 + h, x - ex1: x - ex1 + w])
+
+def _assign_components_to_textlines(stats: np.ndarray, polys: np.ndarray, keep_threshold: float) -> dict:
+    """
+    把连通域分配给文本行，返回 {连通域 label: (文本行下标, 距离, 宽, 高)}。
+    重叠率足够时按重叠分配，距离、宽、高为 None；否则按距离分配最近的文本行，并给出距离和连通域包围盒宽高。
+
+    先用 STRtree 找出与连通域包围盒相交的文本行，只对这些候选对计算重叠面积；
+    不相交的文本行重叠率为 0，不会影响 argmax。距离矩阵只在重叠率过低、需要按距离分配时才计算。
+    """
+    import shapely
+
+    M = len(polys)
+    labels = np.nonzero(stats[1:, cv2.CC_STAT_AREA] > 9)[0] + 1
+    if len(labels) == 0 or M == 0:
+        return {}
+
+    x1 = stats[labels, cv2.CC_STAT_LEFT]
+    y1 = stats[labels, cv2.CC_STAT_TOP]
+    x2 = x1 + stats[labels, cv2.CC_STAT_WIDTH]
+    y2 = y1 + stats[labels, cv2.CC_STAT_HEIGHT]
+    area1 = stats[labels, cv2.CC_STAT_AREA]
+    cc_polys = shapely.box(x1, y1, x2, y2)
+    poly_areas = shapely.area(polys)
+
+    tree = shapely.STRtree(polys)
+    cc_idx, tl_idx = tree.query(cc_polys, predicate='intersects')
+    overlapping_area = shapely.area(shapely.intersection(polys[tl_idx], cc_polys[cc_idx]))
+    ratio_mat = np.zeros(shape = (len(labels), M), dtype = np.float32)
+    ratio_mat[cc_idx, tl_idx] = overlapping_area / np.minimum(area1[cc_idx], poly_areas[tl_idx])
+
+    assignment = {}
+    for k, label in enumerate(labels.tolist()):
+        avg = np.argmax(ratio_mat[k])
+        max_overlap = ratio_mat[k, avg]
+
+        # If the best overlap for this component is essentially zero, discard it.
+        # This handles components from a raw_mask for regions that have been deleted.
+        if max_overlap < 0.1:
+            continue
+
+        if area1[k] >= poly_areas[avg]:
+            continue
+        if ratio_mat[k, avg] <= keep_threshold:
+            dist_row = shapely.distance(polys, shapely.centroid(cc_polys[k])).astype(np.float32)
+            avg = np.argmin(dist_row)
+            w1, h1 = x2[k] - x1[k], y2[k] - y1[k]
+            assignment[label] = (int(avg), float(dist_row[avg]), w1, h1)
+            continue
+        assignment[label] = (int(avg), None, None, None)
+    return assignment
+
 def complete_mask(img: np.ndarray, mask: np.ndarray, textlines: List[Quadrilateral], keep_threshold = 1e-2, dilation_offset = 0,kernel_size=3):
+    import shapely
+
     bboxes = [txtln.aabb.xywh for txtln in textlines]
-    polys = [Polygon(txtln.pts) for txtln in textlines]
+    polys = shapely.polygons(np.array([txtln.pts for txtln in textlines], dtype = np.float64).reshape(-1, 4, 2))
     for (x, y, w, h) in bboxes:
         cv2.rectangle(mask, (x, y), (x + w, y + h), (0), 1)
     num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(mask)
@@ -112,71 +174,28 @@ def complete_mask(img: np.ndarray, mask: np.ndarray, textlines: List[Quadrilater
     logger.debug(f"--- MASK_REFINEMENT_DEBUG: Number of connected components (num_labels) = {num_labels} ---")
     # --- END DIAGNOSTIC ---
 
-    textline_ccs = [np.zeros_like(mask) for _ in range(M)]
+    # 每个文本行只记录分到的连通域 label 和包围盒，像素缓冲区在第二阶段按包围盒局部分配，
+    # 不再为每个文本行分配一张整页大小的 mask
+    textline_labels = [[] for _ in range(M)]
     iinfo = np.iinfo(labels.dtype)
-    textline_rects = np.full(shape = (M, 4), fill_value = [iinfo.max, iinfo.max, iinfo.min, iinfo.min], dtype = labels.dtype)
-    ratio_mat = np.zeros(shape = (num_labels, M), dtype = np.float32)
-    dist_mat = np.zeros(shape = (num_labels, M), dtype = np.float32)
-    valid = False
-    for label in range(1, num_labels):
-        # skip area too small
-        if stats[label, cv2.CC_STAT_AREA] <= 9:
-            continue
+    textline_rects = np.full(shape = (M, 4), fill_value = [iinfo.max, iinfo.max, iinfo.min, iinfo.min], dtype = np.int64)
+    for label, (avg, dist, w1, h1) in _assign_components_to_textlines(stats, polys, keep_threshold).items():
+        if dist is not None:
+            unit = max(min([textlines[avg].font_size, w1, h1]), 10)
+            if dist >= 0.5 * unit:
+                continue
 
         x1 = stats[label, cv2.CC_STAT_LEFT]
         y1 = stats[label, cv2.CC_STAT_TOP]
         w1 = stats[label, cv2.CC_STAT_WIDTH]
         h1 = stats[label, cv2.CC_STAT_HEIGHT]
-        area1 = stats[label, cv2.CC_STAT_AREA]
-        cc_pts = np.array([[x1, y1], [x1 + w1, y1], [x1 + w1, y1 + h1], [x1, y1 + h1]])
-        cc_poly = Polygon(cc_pts)
-
-        for tl_idx in range(M):
-            area2 = polys[tl_idx].area
-            overlapping_area = polys[tl_idx].intersection(cc_poly).area
-            ratio_mat[label, tl_idx] = overlapping_area / min(area1, area2)
-            dist_mat[label, tl_idx] = polys[tl_idx].distance(cc_poly.centroid)
-            # print(textlines[tl_idx].pts, cc_pts, '->', overlapping_area, min(area1, area2), '=', overlapping_area / min(area1, area2), '|', polys[tl_idx].distance(cc_poly))
-
-        avg = np.argmax(ratio_mat[label])
-        max_overlap = ratio_mat[label, avg]
-
-        # If the best overlap for this component is essentially zero, discard it.
-        # This handles components from a raw_mask for regions that have been deleted.
-        if max_overlap < 0.1:
-            continue
-            
-        # print(avg, 'overlap:', ratio_mat[label, avg], '<', keep_threshold)
-        area2 = polys[avg].area
-        if area1 >= area2:
-            continue
-        if ratio_mat[label, avg] <= keep_threshold:
-            avg = np.argmin(dist_mat[label])
-            area2 = polys[avg].area
-            unit = max(min([textlines[avg].font_size, w1, h1]), 10)
-            # print("unit", unit, textlines[avg].font_size, w1, h1)
-            # if area1 < 0.4 * w1 * h1:
-            #     # ccs is probably angled
-            #     unit /= 2
-            # if avg == 0:
-            # print('no intersect', area1, '>=', area2, dist_mat[label, avg], '>=', 0.5 * unit)
-            if dist_mat[label, avg] >= 0.5 * unit:
-                # print(dist_mat[label])
-                # print('CONTINUE')
-                continue
-
-        textline_ccs[avg][y1:y1+h1, x1:x1+w1][labels[y1:y1+h1, x1:x1+w1] == label] = 255
-        # if avg == 0:
-        # print(avg)
-        # cv2.imshow('ccs', image_resize(textline_ccs[avg], height = 800))
-        # cv2.waitKey(0)
+        textline_labels[avg].append(label)
         textline_rects[avg, 0] = min(textline_rects[avg, 0], x1)
         textline_rects[avg, 1] = min(textline_rects[avg, 1], y1)
         textline_rects[avg, 2] = max(textline_rects[avg, 2], x1 + w1)
         textline_rects[avg, 3] = max(textline_rects[avg, 3], y1 + h1)
-        valid = True
 
-    if not valid:
+    if not any(textline_labels):
         return None
     
     # tblr to xywh
@@ -184,29 +203,36 @@ def complete_mask(img: np.ndarray, mask: np.ndarray, textlines: List[Quadrilater
     textline_rects[:, 3] -= textline_rects[:, 1]
     
     final_mask = np.zeros_like(mask)
-    img = cv2.bilateralFilter(img, 17, 80, 80)
-    for i, cc in enumerate(tqdm(textline_ccs, '[mask]')):
-        x1, y1, w1, h1 = textline_rects[i]
-        text_size = min(w1, h1, textlines[i].font_size)
-        x1, y1, w1, h1 = extend_rect(x1, y1, w1, h1, img.shape[1], img.shape[0], int(text_size * 0.1))
+    img_h, img_w = img.shape[:2]
+    for i in tqdm(range(M), '[mask]'):
+        if not textline_labels[i]:
+            continue
+        x0, y0, w0, h0 = (int(v) for v in textline_rects[i])
+        text_size = min(w0, h0, textlines[i].font_size)
+        x1, y1, w1, h1 = extend_rect(x0, y0, w0, h0, img_w, img_h, int(text_size * 0.1))
         # TODO: Need to think of better way to determine dilate_size.
         dilate_size = max((int((text_size + dilation_offset) * 0.3) // 2) * 2 + 1, 3)
-        # print(textlines[i].font_size, min(w1, h1), dilate_size)
         kern = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (dilate_size, dilate_size))
-        cc_region = np.ascontiguousarray(cc[y1: y1 + h1, x1: x1 + w1])
+        x2, y2, w2, h2 = extend_rect(x1, y1, w1, h1, img_w, img_h, -(-dilate_size // 2))
+
+        # 局部缓冲区覆盖连通域包围盒和两次扩展后的矩形（在图像范围内）
+        ox, oy = min(x0, x1, x2), min(y0, y1, y2)
+        ox2 = min(max(x0 + w0, x1 + w1, x2 + w2), img_w)
+        oy2 = min(max(y0 + h0, y1 + h1, y2 + h2), img_h)
+        cc = np.zeros((oy2 - oy, ox2 - ox), dtype = mask.dtype)
+        cc_labels = labels[oy:oy2, ox:ox2]
+        cc[np.isin(cc_labels, textline_labels[i])] = 255
+
+        cc_region = np.ascontiguousarray(cc[y1 - oy: y1 - oy + h1, x1 - ox: x1 - ox + w1])
         if cc_region.size == 0:
             continue
-        # cv2.imshow('cc before', image_resize(cc_region, height = 800))
-        img_region = np.ascontiguousarray(img[y1: y1 + h1, x1: x1 + w1])
-        # cv2.imshow('img', image_resize(img_region, height = 800))
+        img_region = _bilateral_filter_roi(img, x1, y1, cc_region.shape[1], cc_region.shape[0])
         cc_region = refine_mask(img_region, cc_region)
-        # cv2.imshow('cc after', image_resize(cc_region, height = 800))
-        # cv2.waitKey(0)
-        cc[y1: y1 + h1, x1: x1 + w1] = cc_region
-        # cc = cv2.dilate(cc, kern)
-        x2, y2, w2, h2 = extend_rect(x1, y1, w1, h1, img.shape[1], img.shape[0], -(-dilate_size // 2))
-        cc[y2:y2+h2, x2:x2+w2] = cv2.dilate(cc[y2:y2+h2, x2:x2+w2], kern)
-        final_mask[y2:y2+h2, x2:x2+w2] = cv2.bitwise_or(final_mask[y2:y2+h2, x2:x2+w2], cc[y2:y2+h2, x2:x2+w2])
+        cc[y1 - oy: y1 - oy + h1, x1 - ox: x1 - ox + w1] = cc_region
+        cc_dilate = cc[y2 - oy: y2 - oy + h2, x2 - ox: x2 - ox + w2]
+        if cc_dilate.size == 0:
+            continue
+        final_mask[y2:y2+h2, x2:x2+w2] = cv2.bitwise_or(final_mask[y2:y2+h2, x2:x2+w2], cv2.dilate(cc_dilate, kern))
     kern = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
     # for (x, y, w, h) in text_lines:
     #     final_mask = cv2.rectangle(final_mask, (x, y), (x + w, y + h), (255), -1)
@@ -42,5 +42,17 @@ async def dispatch(ocr_key: Ocr, image: np.ndarray, regions: List[Quadrilateral]
     config = config or OcrConfig()
     return await ocr.recognize(image, regions, config, verbose)
 
+async def dispatch_batch(ocr_key: Ocr, images: List[np.ndarray], regions_list: List[List[Quadrilateral]], config: Optional[OcrConfig] = None,
+                         device: str = 'cpu', verbose: bool = False) -> List[List[Quadrilateral]]:
+    """
+    跨页批量OCR：所有页面的文本行一起按宽度分块推理，结果按页返回。
+    不支持跨页批处理的OCR会逐页回退到 recognize。
+    """
+    ocr = get_ocr(ocr_key)
+    if isinstance(ocr, OfflineOCR):
+        await ocr.load(device)
+    config = config or OcrConfig()
+    return await ocr.recognize_batch(images, regions_list, config, verbose)
+
 async def unload(ocr_key: Ocr):
     ocr_cache.pop(ocr_key, None)
\ No newline at end of file
@@ -49,6 +49,16 @@ class CommonOCR(InfererModule):
     async def _recognize(self, image: np.ndarray, textlines: List[Quadrilateral], config: OcrConfig, verbose: bool = False) -> List[Quadrilateral]:
         pass
 
+    async def recognize_batch(self, images: List[np.ndarray], textlines_list: List[List[Quadrilateral]], config: OcrConfig, verbose: bool = False) -> List[List[Quadrilateral]]:
+        '''
+        Batched version of `recognize` over several pages. Returns one textline list per image, in input order.
+        OCRs that support it share forward passes between the textlines of all pages.
+        '''
+        return await self._recognize_batch(images, textlines_list, config, verbose)
+
+    async def _recognize_batch(self, images: List[np.ndarray], textlines_list: List[List[Quadrilateral]], config: OcrConfig, verbose: bool = False) -> List[List[Quadrilateral]]:
+        return [await self._recognize(image, textlines, config, verbose) for image, textlines in zip(images, textlines_list)]
+
 
 class OfflineOCR(CommonOCR, ModelWrapper):
     _MODEL_SUB_DIR = 'ocr'
@@ -60,3 +70,43 @@ class OfflineOCR(CommonOCR, ModelWrapper):
     @abstractmethod
     async def _infer(self, image: np.ndarray, textlines: List[Quadrilateral], args: OcrConfig, verbose: bool = False) -> List[Quadrilateral]:
         pass
+
+    async def _recognize_batch(self, images: List[np.ndarray], textlines_list: List[List[Quadrilateral]], config: OcrConfig, verbose: bool = False):
+        if not self.is_loaded():
+            raise Exception(f'{self._key}: Tried to forward pass without having loaded the model.')
+        return await self._infer_batch(images, textlines_list, config, verbose)
+
+    async def _infer_batch(self, images: List[np.ndarray], textlines_list: List[List[Quadrilateral]], config: OcrConfig, verbose: bool = False) -> List[List[Quadrilateral]]:
+        """May be overwritten by OCRs that can share forward passes between pages"""
+        return [await self._infer(image, textlines, config, verbose) for image, textlines in zip(images, textlines_list)]
+
+
+def bucket_by_width(widths: List[int], max_chunk_size: int, max_pad_ratio: float = 0.3, text_height: int = 48,
+                    pixel_budget: int = 0) -> List[List[int]]:
+    """
+    Groups textline crops into width buckets for batched recognition.
+
+    Crops are sorted by width and packed greedily. A bucket is closed once it holds `max_chunk_size` crops,
+    once padding every crop to the widest one would waste more than `max_pad_ratio` of the bucket,
+    or once the padded bucket (N x text_height x max width) would exceed `pixel_budget` pixels (0 disables the budget).
+    Returns lists of indices into `widths`; concatenated they are the width-sorted order.
+    """
+    order = sorted(range(len(widths)), key=lambda i: widths[i])
+    buckets = []
+    current = []
+    used = 0
+    for idx in order:
+        # 升序遍历，新加入的切图总是当前桶里最宽的
+        w = widths[idx]
+        n = len(current) + 1
+        waste = 1 - (used + w) / (n * w) if w > 0 else 0
+        if current and (n > max_chunk_size or waste > max_pad_ratio
+                        or (pixel_budget > 0 and n * text_height * w > pixel_budget)):
+            buckets.append(current)
+            current = []
+            used = 0
+        current.append(idx)
+        used += w
+    if current:
+        buckets.append(current)
+    return buckets
@@ -56,14 +56,24 @@ class Model32pxOCR(OfflineOCR):
         del self.model
 
     async def _infer(self, image: np.ndarray, textlines: List[Quadrilateral], config: OcrConfig, verbose: bool = False) -> List[TextBlock]:
+        return (await self._infer_batch([image], [textlines], config, verbose))[0]
+
+    async def _infer_batch(self, images: List[np.ndarray], textlines_list: List[List[Quadrilateral]], config: OcrConfig, verbose: bool = False) -> List[List[TextBlock]]:
         text_height = 32
         max_chunk_size = 16
         ignore_bubble = config.ignore_bubble
         threshold = 0.7 if config.prob is None else config.prob
 
-        quadrilaterals = list(self._generate_text_direction(textlines))
-        region_imgs = [q.get_transformed_region(image, d, text_height) for q, d in quadrilaterals]
-        out_regions = []
+        # 收集所有页面的文本行切图，全局按宽度排序分块，推理结果再按页散回
+        quadrilaterals = []
+        region_imgs = []
+        page_ids = []
+        for page_idx, (image, textlines) in enumerate(zip(images, textlines_list)):
+            for q, d in self._generate_text_direction(textlines):
+                quadrilaterals.append((q, d))
+                region_imgs.append(q.get_transformed_region(image, d, text_height))
+                page_ids.append(page_idx)
+        out_regions = [[] for _ in images]
 
         perm = range(len(region_imgs))
         is_quadrilaterals = False
@@ -129,7 +139,7 @@ class Model32pxOCR(OfflineOCR):
                     else:
                         cur_region.text.append('')
                         cur_region.update_font_colors(np.array([0, 0, 0]), np.array([255, 255, 255]))
-                    out_regions.append(cur_region)
+                    out_regions[page_ids[indices[i]]].append(cur_region)
                     continue
                 fr = (torch.clip(fr.view(-1), 0, 1).mean() * 255).long().item()
                 fg = (torch.clip(fg.view(-1), 0, 1).mean() * 255).long().item()
@@ -163,11 +173,11 @@ class Model32pxOCR(OfflineOCR):
                     cur_region.text.append(txt)
                     cur_region.update_font_colors(np.array([fr, fg, fb]), np.array([br, bg, bb]))
 
-                out_regions.append(cur_region)
+                out_regions[page_ids[indices[i]]].append(cur_region)
 
         if is_quadrilaterals:
             return out_regions
-        return textlines
+        return textlines_list
 
 
 class ResNet(nn.Module):
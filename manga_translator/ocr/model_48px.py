@@ -16,7 +16,7 @@ from .xpos_relative_position import XPOS
 
 # Roformer with Xpos and Local Attention ViT
 
-from .common import OfflineOCR
+from .common import OfflineOCR, bucket_by_width
 from ..utils import TextBlock, Quadrilateral, chunks, imwrite_unicode
 from ..utils.generic import AvgMeter
 from ..utils.bubble import is_ignore
@@ -76,22 +76,34 @@ class Model48pxOCR(OfflineOCR):
         del self.model
     
     async def _infer(self, image: np.ndarray, textlines: List[Quadrilateral], config: OcrConfig, verbose: bool = False, ignore_bubble: int = 0) -> List[TextBlock]:
+        return (await self._infer_batch([image], [textlines], config, verbose))[0]
+
+    async def _infer_batch(self, images: List[np.ndarray], textlines_list: List[List[Quadrilateral]], config: OcrConfig, verbose: bool = False) -> List[List[TextBlock]]:
         text_height = 48
-        max_chunk_size = 16
+        max_chunk_size = max(1, config.ocr_batch_size)
         threshold = 0.2 if config.prob is None else config.prob
 
-        quadrilaterals = list(self._generate_text_direction(textlines))
-        region_imgs = [q.get_transformed_region(image, d, text_height) for q, d in quadrilaterals]
-        out_regions = []
+        # 收集所有页面的文本行切图，全局按宽度排序分块，推理结果再按页散回
+        quadrilaterals = []
+        region_imgs = []
+        page_ids = []
+        for page_idx, (image, textlines) in enumerate(zip(images, textlines_list)):
+            for q, d in self._generate_text_direction(textlines):
+                quadrilaterals.append((q, d))
+                region_imgs.append(q.get_transformed_region(image, d, text_height))
+                page_ids.append(page_idx)
+        out_regions = [[] for _ in images]
 
-        perm = range(len(region_imgs))
-        is_quadrilaterals = False
         if len(quadrilaterals) > 0 and isinstance(quadrilaterals[0][0], Quadrilateral):
-            perm = sorted(range(len(region_imgs)), key = lambda x: region_imgs[x].shape[1])
-            is_quadrilaterals = True
+            # 按宽度分桶：限制填充浪费比例和单块像素预算，避免一条长文本行拖慢整块的束搜索
+            batches = bucket_by_width([img.shape[1] for img in region_imgs], max_chunk_size,
+                                      config.ocr_max_pad_ratio, text_height, config.ocr_pixel_budget)
+        else:
+            # TextBlock 的多行文本按顺序追加，必须保持原始顺序
+            batches = chunks(range(len(region_imgs)), max_chunk_size)
 
         ix = 0
-        for indices in chunks(perm, max_chunk_size):
+        for indices in batches:
             N = len(indices)
             widths = [region_imgs[i].shape[1] for i in indices]
             max_width = 4 * (max(widths) + 7) // 4
@@ -158,7 +170,7 @@ class Model48pxOCR(OfflineOCR):
                     else:
                         cur_region.text.append('')
                         cur_region.update_font_colors(np.array([0, 0, 0]), np.array([255, 255, 255]))
-                    out_regions.append(cur_region)
+                    out_regions[page_ids[indices[i]]].append(cur_region)
                     continue
                 has_fg = (fg_ind_pred[:, 1] > fg_ind_pred[:, 0])
                 has_bg = (bg_ind_pred[:, 1] > bg_ind_pred[:, 0])
@@ -212,10 +224,8 @@ class Model48pxOCR(OfflineOCR):
                     cur_region.text.append(txt)
                     cur_region.update_font_colors(np.array([fr, fg, fb]), np.array([br, bg, bb]))
 
-                out_regions.append(cur_region)
+                out_regions[page_ids[indices[i]]].append(cur_region)
 
-        if is_quadrilaterals:
-            return out_regions
         return out_regions
 
 class ConvNeXtBlock(nn.Module):
@@ -8,10 +8,11 @@ from shapely import affinity
 from shapely.geometry import Polygon
 from tqdm import tqdm
 
-from . import text_render
+from . import text_render, font_fitting
 from .text_render_eng import render_textblock_list_eng
 from .text_render_pillow_eng import render_textblock_list_eng as render_textblock_list_eng_pillow
 from .ballon_extractor import extract_ballon_region
+from .line_break_optimizer import optimize_line_breaks_for_text
 from ..utils import (
     BASE_PATH,
     TextBlock,
@@ -119,165 +120,35 @@ def count_text_length(text: str) -> float:
             length += 1.0
     return length
 
-def generate_line_break_combinations(text: str):
-    """
-    Generate all possible line break combinations from a text with [BR] markers.
-    Returns a list of tuples: (modified_text, combination_description, skip_reason or None)
-    """
-    import itertools
-    
-    # Standardize all break markers to [BR] (including full-width brackets)
-    text = re.sub(r'\s*(<br>|【BR】)\s*', '[BR]', text, flags=re.IGNORECASE)
-    
-    # Find all [BR] positions
-    breaks = []
-    pattern = r'\[BR\]'
-    for match in re.finditer(pattern, text, flags=re.IGNORECASE):
-        breaks.append((match.start(), match.end()))
-    
-    if not breaks:
-        # No breaks, return original text
-        return [(text, "no_breaks", None)]
-    
-    combinations = []
-    
-    # Add original (keep all breaks)
-    combinations.append((text, "all_breaks", None))
-    
-    # Generate all possible combinations (remove 1, 2, 3, ... n breaks)
-    n_breaks = len(breaks)
-    for r in range(1, n_breaks + 1):
-        for combo in itertools.combinations(range(n_breaks), r):
-            # Create a version with selected breaks removed
-            # Split first to check first segment length
-            segments = re.split(pattern, text, flags=re.IGNORECASE)
-            
-            # Check skip condition: if first segment has <= 2 chars and we're removing break 0
-            if 0 in combo and len(segments[0].strip()) <= 2:
-                skip_reason = "first_segment_too_short"
-                combinations.append((None, f"remove_{combo}", skip_reason))
-                continue
-            
-            # Build modified text
-            # 从右到左删除，这样删除右边的BR不会影响左边BR的位置
-            modified_text = text
-            for idx in sorted(combo, reverse=True):  # Remove from right to left
-                start, end = breaks[idx]
-                # 从右到左删除时不需要offset调整，因为右边的删除不影响左边的位置
-                modified_text = modified_text[:start] + modified_text[end:]
-            
-            combinations.append((modified_text, f"remove_{combo}", None))
-    
-    return combinations
-
-def calculate_uniformity(lines: List[str]) -> float:
-    """
-    Calculate uniformity score for line lengths.
-    Lower score = more uniform (better).
-    Uses coefficient of variation (std/mean).
-    """
-    if not lines or len(lines) <= 1:
-        return 0.0
-    
-    lengths = [len(line.strip()) for line in lines]
-    if not lengths or sum(lengths) == 0:
-        return float('inf')
-    
-    mean_length = np.mean(lengths)
-    std_length = np.std(lengths)
-    
-    # Coefficient of variation
-    cv = std_length / mean_length if mean_length > 0 else float('inf')
-    return cv
-
 def optimize_line_breaks_for_region(region: TextBlock, config: Config, target_font_size: int, bubble_width: float, bubble_height: float):
     """
-    Optimize line breaks for a single region by testing all combinations.
+    Optimize line breaks for a single region.
+    Chooses which [BR] markers to keep with a polynomial-time DP (line_break_optimizer),
+    using the same objective as the exhaustive search: largest font size, then line-length uniformity.
     Returns the best text variant and the font size it achieves.
     """
     original_translation = region.translation
-    combinations = generate_line_break_combinations(original_translation)
-    
-    best_text = original_translation
-    best_font_size = 0
-    best_uniformity = float('inf')
-    
     layout_mode = config.render.layout_mode if config and hasattr(config.render, 'layout_mode') else 'default'
-    logger.debug(f"[OPTIMIZE_LINE_BREAKS] Testing {len(combinations)} combinations, layout_mode={layout_mode}")
-    
-    for text_variant, combo_desc, skip_reason in combinations:
-        if skip_reason:
-            logger.debug(f"[OPTIMIZE_LINE_BREAKS] Skipping {combo_desc}: {skip_reason}")
-            continue
-        
-        # Convert [BR] to \n for calculation
-        text_for_calc = re.sub(r'\s*\[BR\]\s*', '\n', text_variant, flags=re.IGNORECASE)
-        
-        # 严格智能缩放模式：如果去掉所有断句（无\n），会导致文本框扩大，淘汰此方案
-        strict_smart_scaling = getattr(config.render, 'strict_smart_scaling', False) if config and hasattr(config, 'render') else False
-        if layout_mode == 'smart_scaling' and strict_smart_scaling:
-            if '\n' not in text_for_calc:
-                logger.debug(f"[OPTIMIZE_LINE_BREAKS] Skipping {combo_desc}: 严格智能缩放模式下无断句会扩大文本框")
-                continue
-        
-        try:
-            # Calculate required dimensions
-            if region.horizontal:
-                lines, widths = text_render.calc_horizontal(
-                    target_font_size, text_for_calc, 
-                    max_width=99999, max_height=99999, 
-                    language=region.target_lang
-                )
-                if widths:
-                    spacing_y = int(target_font_size * (config.render.line_spacing or 0.01))
-                    required_width = max(widths)
-                    required_height = target_font_size * len(lines) + spacing_y * max(0, len(lines) - 1)
-                else:
-                    continue
-            else:  # Vertical
-                if config.render.auto_rotate_symbols:
-                    text_for_calc = text_render.auto_add_horizontal_tags(text_for_calc)
-                
-                lines, heights = text_render.calc_vertical(target_font_size, text_for_calc, max_height=99999)
-                if heights:
-                    spacing_x = int(target_font_size * (config.render.line_spacing or 0.2))
-                    required_height = max(heights)
-                    required_width = target_font_size * len(lines) + spacing_x * max(0, len(lines) - 1)
-                else:
-                    continue
-            
-            # Calculate how much the text fits in the bubble
-            # Larger font size is better
-            width_ratio = bubble_width / required_width if required_width > 0 else 1.0
-            height_ratio = bubble_height / required_height if required_height > 0 else 1.0
-            fit_ratio = min(width_ratio, height_ratio)
-            
-            # Calculate effective font size for this combination
-            effective_font_size = target_font_size * fit_ratio
-            
-            # Calculate uniformity
-            uniformity = calculate_uniformity(lines)
-            
-            logger.debug(f"[OPTIMIZE_LINE_BREAKS] {combo_desc}: font_size={effective_font_size:.1f}, uniformity={uniformity:.3f}")
-            
-            # Choose the best: prioritize font size, then uniformity
-            is_better = False
-            if effective_font_size > best_font_size + 0.5:  # Significantly larger font
-                is_better = True
-            elif abs(effective_font_size - best_font_size) <= 0.5:  # Similar font size
-                if uniformity < best_uniformity:  # Better uniformity
-                    is_better = True
-            
-            if is_better:
-                best_text = text_variant
-                best_font_size = effective_font_size
-                best_uniformity = uniformity
-                logger.debug(f"[OPTIMIZE_LINE_BREAKS] New best: {combo_desc}")
-        
-        except Exception as e:
-            logger.warning(f"[OPTIMIZE_LINE_BREAKS] Error evaluating {combo_desc}: {e}")
-            continue
-    
+    strict_smart_scaling = getattr(config.render, 'strict_smart_scaling', False) if config and hasattr(config, 'render') else False
+
+    try:
+        best_text, best_font_size = optimize_line_breaks_for_text(
+            original_translation,
+            horizontal=region.horizontal,
+            font_size=target_font_size,
+            bubble_width=bubble_width,
+            bubble_height=bubble_height,
+            line_spacing=config.render.line_spacing,
+            language=region.target_lang,
+            auto_rotate_symbols=config.render.auto_rotate_symbols,
+            require_break=layout_mode == 'smart_scaling' and strict_smart_scaling,
+        )
+    except Exception as e:
+        logger.warning(f"[OPTIMIZE_LINE_BREAKS] Error optimizing line breaks: {e}")
+        best_text, best_font_size = None, 0
+    if best_text is None:
+        best_text = original_translation
+
     # Compare and log optimization results
     # 使用统一的正则匹配所有BR变体进行统计
     br_pattern = r'(\[BR\]|【BR】|<br>)'
@@ -418,7 +289,7 @@ def resize_regions_to_font_size(img: np.ndarray, text_regions: List['TextBlock']
                     max_width_for_calc = 99999 if use_unlimited_dimension else balloon_width
                     max_height_for_calc = 99999  # Height is always unlimited for horizontal
                     
-                    lines, widths = text_render.calc_horizontal(
+                    lines, widths = font_fitting.calc_horizontal(
                         target_font_size, 
                         text_for_calc, 
                         max_width=max_width_for_calc, 
@@ -437,7 +308,7 @@ def resize_regions_to_font_size(img: np.ndarray, text_regions: List['TextBlock']
                     
                     max_height_for_calc = 99999 if use_unlimited_dimension else balloon_height
                     
-                    lines, heights = text_render.calc_vertical(
+                    lines, heights = font_fitting.calc_vertical(
                         target_font_size, 
                         text_for_calc, 
                         max_height=max_height_for_calc
@@ -553,43 +424,19 @@ def resize_regions_to_font_size(img: np.ndarray, text_regions: List['TextBlock']
                 region.translation = optimized_text
                 logger.debug(f"[OPTIMIZE] Optimized text: {region.translation}")
             
-            font_size = target_font_size
             min_shrink_font_size = max(min_font_size, 8)
 
-            # Step 1: 先缩小字体直到文本能放进文本框
-            iteration_count = 0
-            while font_size >= min_shrink_font_size:
-                iteration_count += 1
+            # 在 [min_shrink_font_size, target_font_size] 内二分查找文本行数不超过原文行数的最大字号
+            def fits(test_font_size: int) -> bool:
                 if region.horizontal:
-                    lines, _ = text_render.calc_horizontal(font_size, region.translation, max_width=region.unrotated_size[0], max_height=region.unrotated_size[1], language=region.target_lang)
-                    if len(lines) <= len(region.texts):
-                        break
+                    test_lines, _ = font_fitting.calc_horizontal(test_font_size, region.translation, max_width=region.unrotated_size[0], max_height=region.unrotated_size[1], language=region.target_lang)
                 else:
-                    lines, _ = text_render.calc_vertical(font_size, region.translation, max_height=region.unrotated_size[1])
-                    if len(lines) <= len(region.texts):
-                        break
-                font_size -= 1
+                    test_lines, _ = font_fitting.calc_vertical(test_font_size, region.translation, max_height=region.unrotated_size[1])
+                return len(test_lines) <= len(region.texts)
 
-            # Step 2: 尝试扩大字体以更好地填充空间（但不超过初始大小）
-            # 从当前能放下的字体大小开始，逐步增加
-            max_fitting_font_size = font_size
-            test_font_size = font_size + 1
-
-            while test_font_size <= target_font_size:
-                if region.horizontal:
-                    test_lines, _ = text_render.calc_horizontal(test_font_size, region.translation, max_width=region.unrotated_size[0], max_height=region.unrotated_size[1], language=region.target_lang)
-                    if len(test_lines) <= len(region.texts):
-                        max_fitting_font_size = test_font_size
-                        test_font_size += 1
-                    else:
-                        break
-                else:
-                    test_lines, _ = text_render.calc_vertical(test_font_size, region.translation, max_height=region.unrotated_size[1])
-                    if len(test_lines) <= len(region.texts):
-                        max_fitting_font_size = test_font_size
-                        test_font_size += 1
-                    else:
-                        break
+            max_fitting_font_size = font_fitting.find_max_fitting_font_size(fits, min_shrink_font_size, target_font_size)
+            if max_fitting_font_size is None:
+                max_fitting_font_size = min_shrink_font_size
 
             # Calculate total font scale (font_scale_ratio + max_font_size limit)
             final_font_size = int(max(max_fitting_font_size, min_shrink_font_size) * config.render.font_scale_ratio)
@@ -741,7 +588,7 @@ def resize_regions_to_font_size(img: np.ndarray, text_regions: List['TextBlock']
                     required_height = 0
 
                     if region.horizontal:
-                        lines, widths = text_render.calc_horizontal(target_font_size, region.translation, max_width=99999, max_height=99999, language=region.target_lang)
+                        lines, widths = font_fitting.calc_horizontal(target_font_size, region.translation, max_width=99999, max_height=99999, language=region.target_lang)
                         if widths:
                             spacing_y = int(target_font_size * (config.render.line_spacing or 0.01))
                             required_width = max(widths)
@@ -754,7 +601,7 @@ def resize_regions_to_font_size(img: np.ndarray, text_regions: List['TextBlock']
                         if config.render.auto_rotate_symbols:
                             text_for_calc = text_render.auto_add_horizontal_tags(text_for_calc)
                         
-                        lines, heights = text_render.calc_vertical(target_font_size, text_for_calc, max_height=99999)
+                        lines, heights = font_fitting.calc_vertical(target_font_size, text_for_calc, max_height=99999)
                         if heights:
                             spacing_x = int(target_font_size * (config.render.line_spacing or 0.2))
                             required_height = max(heights)
@@ -867,14 +714,14 @@ def resize_regions_to_font_size(img: np.ndarray, text_regions: List['TextBlock']
                 required_width = 0
                 required_height = 0
                 if region.horizontal:
-                    lines, widths = text_render.calc_horizontal(target_font_size, region.translation, max_width=99999, max_height=99999, language=region.target_lang)
+                    lines, widths = font_fitting.calc_horizontal(target_font_size, region.translation, max_width=99999, max_height=99999, language=region.target_lang)
                     if widths:
                         required_width = max(widths)
                         required_height = len(lines) * (target_font_size * (1 + (config.render.line_spacing or 0.01)))
                         required_area = required_width * required_height
                         logger.debug(f"[SMART_SCALING DEBUG] Horizontal: {len(lines)} lines, required_width={required_width:.1f}, required_height={required_height:.1f}, required_area={required_area:.1f}")
                 else: # Vertical
-                    lines, heights = text_render.calc_vertical(target_font_size, region.translation, max_height=99999)
+                    lines, heights = font_fitting.calc_vertical(target_font_size, region.translation, max_height=99999)
                     if heights:
                         required_height = max(heights)
                         required_width = len(lines) * (target_font_size * (1 + (config.render.line_spacing or 0.2)))
@@ -1067,6 +914,7 @@ async def dispatch(
 
     for region, dst_points in tqdm(zip(text_regions, dst_points_list), '[render]', total=len(text_regions)):
         img = render(img, region, dst_points, not config.render.no_hyphenation, config.render.line_spacing, config.render.disable_font_border, config)
+    logger.debug(f'Glyph cache: {text_render.get_char_glyph.cache_info()}')
     
     if return_debug_img and debug_img is not None:
         return img, debug_img
@@ -1283,8 +1131,6 @@ def render(
         logger.info(f"Adjusted text position to fit within image: offset=({offset_x}, {offset_y}), original_bbox=({x}, {y}, {w}, {h})")
 
     M, _ = cv2.findHomography(src_points, adjusted_dst_points[0], cv2.RANSAC, 5.0)
-    # 使用INTER_LANCZOS4获得最高质量的插值,避免字体模糊
-    rgba_region = cv2.warpPerspective(box, M, (img.shape[1], img.shape[0]), flags=cv2.INTER_LANCZOS4, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
     x_adj, y_adj, w_adj, h_adj = cv2.boundingRect(np.round(adjusted_dst_points[0]).astype(np.int32))
     
     # 边界检查：确保调整后仍在图片内
@@ -1293,26 +1139,24 @@ def render(
     valid_x1 = max(0, x_adj)
     valid_x2 = min(img_w, x_adj + w_adj)
     
-    # 计算rgba_region中对应的区域
-    region_y1 = valid_y1
-    region_y2 = region_y1 + (valid_y2 - valid_y1)
-    region_x1 = valid_x1
-    region_x2 = region_x1 + (valid_x2 - valid_x1)
-    
     # 检查是否有有效区域
     if valid_y2 > valid_y1 and valid_x2 > valid_x1:
-        canvas_region = rgba_region[region_y1:region_y2, region_x1:region_x2, :3]
-        mask_region = rgba_region[region_y1:region_y2, region_x1:region_x2, 3:4].astype(np.float32) / 255.0
+        # 只在目标包围盒大小的画布上做透视变换：把单应矩阵平移到 ROI 坐标系，
+        # 避免为每个文本框分配并变换整页大小的 RGBA 缓冲区
+        roi_w = valid_x2 - valid_x1
+        roi_h = valid_y2 - valid_y1
+        T = np.array([[1, 0, -valid_x1], [0, 1, -valid_y1], [0, 0, 1]], dtype=np.float64)
+        # 使用INTER_LANCZOS4获得最高质量的插值,避免字体模糊
+        rgba_region = cv2.warpPerspective(box, T @ M, (roi_w, roi_h), flags=cv2.INTER_LANCZOS4, borderMode=cv2.BORDER_CONSTANT, borderValue=0)
         
-        # 确保尺寸匹配
+        # 整数 alpha 混合，直接写回原图 ROI：out = (bg * (255 - a) + fg * a + 127) // 255
         target_region = img[valid_y1:valid_y2, valid_x1:valid_x2]
-        if canvas_region.shape[:2] == target_region.shape[:2]:
-            img[valid_y1:valid_y2, valid_x1:valid_x2] = np.clip(
-                (target_region.astype(np.float32) * (1 - mask_region) + canvas_region.astype(np.float32) * mask_region), 
-                0, 255
-            ).astype(np.uint8)
-        else:
-            logger.warning(f"Text region size mismatch: canvas={canvas_region.shape[:2]}, target={target_region.shape[:2]}, skipping region")
+        alpha = rgba_region[:, :, 3:4].astype(np.uint16)
+        blended = target_region * (255 - alpha)
+        blended += rgba_region[:, :, :3] * alpha
+        blended += 127
+        blended //= 255
+        target_region[...] = blended
     else:
         logger.warning(f"Text region completely outside image bounds after adjustment: x={x_adj}, y={y_adj}, w={w_adj}, h={h_adj}, image_size=({img_w}, {img_h}). Text: '{region.translation[:50] if hasattr(region, 'translation') else 'N/A'}...'")
     return img
@@ -0,0 +1,69 @@
+"""
+字号拟合引擎
+
+- 排版结果（分行）按 (字体选择, 文本, 字号, 宽高限制, 语言) 缓存，
+  同一区域在断句优化、拟合和渲染阶段重复计算同一布局时直接命中。
+- 在“放得下/放不下”判定上用倍增 + 二分查找最大字号，取代逐像素递减/递增的线性搜索。
+"""
+from typing import Callable, List, Optional, Tuple
+
+from . import text_render
+
+LAYOUT_CACHE_SIZE = 1024
+
+
+@text_render.font_lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _calc_horizontal(font_size: int, text: str, max_width: int, max_height: int, language: str, hyphenate: bool):
+    lines, widths = text_render.calc_horizontal(font_size, text, max_width=max_width, max_height=max_height, language=language, hyphenate=hyphenate)
+    return tuple(lines), tuple(widths)
+
+
+@text_render.font_lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+def _calc_vertical(font_size: int, text: str, max_height: int):
+    lines, heights = text_render.calc_vertical(font_size, text, max_height=max_height)
+    return tuple(lines), tuple(heights)
+
+
+def calc_horizontal(font_size: int, text: str, max_width: int, max_height: int, language: str = 'en_US', hyphenate: bool = True) -> Tuple[List[str], List[int]]:
+    """带缓存的 text_render.calc_horizontal，返回新列表，调用方可以随意修改"""
+    lines, widths = _calc_horizontal(font_size, text, max_width, max_height, language, hyphenate)
+    return list(lines), list(widths)
+
+
+def calc_vertical(font_size: int, text: str, max_height: int) -> Tuple[List[str], List[int]]:
+    """带缓存的 text_render.calc_vertical（不带 config 的调用形式）"""
+    lines, heights = _calc_vertical(font_size, text, max_height)
+    return list(lines), list(heights)
+
+
+def find_max_fitting_font_size(fits: Callable[[int], bool], min_size: int, max_size: int) -> Optional[int]:
+    """
+    在 [min_size, max_size] 内查找满足 fits(size) 的最大字号，没有任何字号满足时返回 None。
+
+    从上界开始按 1, 2, 4, ... 的步长向下试探，找到第一个放得下的字号后在最后一个放不下的字号之间二分。
+    fits 关于字号单调时结果与逐一递减的线性搜索相同；断词等原因导致局部不单调时，
+    也会像线性搜索一样优先停在靠近上界的可行字号上。
+    """
+    if min_size > max_size:
+        return None
+    # 大多数区域在目标字号下就能放下
+    if fits(max_size):
+        return max_size
+    failed = max_size
+    step = 1
+    while True:
+        candidate = max(failed - step, min_size)
+        if fits(candidate):
+            break
+        if candidate == min_size:
+            return None
+        failed = candidate
+        step *= 2
+    lo, hi = candidate, failed  # 不变式：fits(lo) 为真，fits(hi) 为假
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if fits(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo
@@ -0,0 +1,206 @@
+"""
+AI 断句（[BR]）优化器
+
+原实现枚举所有 [BR] 子集（2^n 种方案），并对每种方案完整排版一次。
+这里把问题看成对 n+1 个片段的连续分组：每组排成一行（竖排为一列），组与组之间保留 [BR]。
+
+- 每个候选组（片段 i..j）只排版一次，共 O(n²) 次单行排版；
+- 第一遍 DP：对每个总行数 L 求最小的最长行宽，得到每个 L 下能达到的最大有效字号；
+- 第二遍 DP：在有效字号不低于最优值 0.5px 的方案里，按行长度变异系数（均匀度）选最优。
+
+目标函数与原暴力搜索一致：先比有效字号（0.5px 以内视为相同），再比均匀度。
+"""
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import text_render, font_fitting
+
+BR_PATTERN = r'\[BR\]'
+
+
+def split_line_break_segments(text: str) -> Tuple[str, List[str]]:
+    """把 <br>/【BR】 统一为 [BR]，返回标准化文本和按 [BR] 切分的片段"""
+    text = re.sub(r'\s*(<br>|【BR】)\s*', '[BR]', text, flags=re.IGNORECASE)
+    return text, re.split(BR_PATTERN, text, flags=re.IGNORECASE)
+
+
+def join_line_break_segments(segments: List[str], kept_breaks: List[bool]) -> str:
+    """按保留的断点重新拼接文本，去掉的 [BR] 直接删除（与原暴力搜索生成的文本一致）"""
+    parts = [segments[0]]
+    for keep, segment in zip(kept_breaks, segments[1:]):
+        if keep:
+            parts.append('[BR]')
+        parts.append(segment)
+    return ''.join(parts)
+
+
+def _uniformity(count: int, total: int, total_sq: int) -> float:
+    """与原穷举搜索（benchmarks/line_breaks.py 中的 calculate_uniformity）相同的变异系数（std / mean），按长度和与平方和计算"""
+    if count <= 1:
+        return 0.0
+    if total == 0:
+        return float('inf')
+    mean = total / count
+    variance = max(total_sq / count - mean * mean, 0.0)
+    return math.sqrt(variance) / mean
+
+
+def optimize_line_breaks(
+    segments: List[str],
+    measure: Callable[[str], Tuple[List[float], List[int]]],
+    effective_font_size: Callable[[float, int], float],
+    can_remove_first_break: bool = True,
+    require_break: bool = False,
+) -> Optional[Tuple[List[bool], float]]:
+    """
+    选择要保留的断点。
+
+    Args:
+        segments: 按 [BR] 切分的片段
+        measure: 对一行文本排版，返回 (每个子行的长度方向尺寸, 每个子行去空白后的字符数)
+        effective_font_size: (最长行尺寸, 总行数) -> 有效字号
+        can_remove_first_break: 为 False 时第一个断点必须保留（首段过短）
+        require_break: 为 True 时不允许去掉全部断点（严格智能缩放模式）
+
+    Returns:
+        (每个断点是否保留, 有效字号)，没有可行方案时返回 None
+    """
+    n = len(segments)
+
+    # 每个候选组 (i, j) 排版一次：(最长子行, 子行数, 字符数之和, 字符数平方和)
+    groups: Dict[Tuple[int, int], Tuple[float, int, int, int]] = {}
+    for i in range(n):
+        for j in range(i, n):
+            if i == 0 and j >= 1 and not can_remove_first_break:
+                break
+            line = ''.join(segments[i:j + 1])
+            # 保留的 [BR] 两侧空白会在排版前被去掉
+            if i > 0:
+                line = line.lstrip()
+            if j < n - 1:
+                line = line.rstrip()
+            if require_break and i == 0 and j == n - 1 and '\n' not in line:
+                continue
+            extents, lengths = measure(line)
+            groups[(i, j)] = (
+                max(extents) if extents else 0,
+                len(extents),
+                sum(lengths),
+                sum(length * length for length in lengths),
+            )
+
+    # 第一遍：minmax[j][L] = 前 j 个片段分成总计 L 个子行时，最长子行尺寸的最小值
+    minmax: List[Dict[int, float]] = [dict() for _ in range(n + 1)]
+    minmax[0][0] = 0
+    for j in range(1, n + 1):
+        for i in range(j):
+            group = groups.get((i, j - 1))
+            if group is None:
+                continue
+            extent, count = group[0], group[1]
+            for lines, prev in minmax[i].items():
+                value = max(prev, extent)
+                total = lines + count
+                if value < minmax[j].get(total, float('inf')):
+                    minmax[j][total] = value
+
+    best_by_lines = {lines: effective_font_size(extent, lines) for lines, extent in minmax[n].items() if lines > 0}
+    if not best_by_lines:
+        return None
+    threshold = max(best_by_lines.values()) - 0.5
+
+    # 第二遍：在有效字号 >= threshold 的方案中，按 (均匀度, -有效字号) 选最优
+    best = None
+    for target_lines, achievable in best_by_lines.items():
+        if achievable < threshold:
+            continue
+        # states[j][(L, sum)] = (平方和, 最长子行, 回溯信息)
+        states: List[Dict[Tuple[int, int], Tuple[int, float, Optional[tuple]]]] = [dict() for _ in range(n + 1)]
+        states[0][(0, 0)] = (0, 0, None)
+        for j in range(1, n + 1):
+            for i in range(j):
+                group = groups.get((i, j - 1))
+                if group is None:
+                    continue
+                extent, count, total, total_sq = group
+                if effective_font_size(extent, target_lines) < threshold:
+                    continue
+                for (lines, prev_total), (prev_sq, prev_extent, _) in states[i].items():
+                    if lines + count > target_lines:
+                        continue
+                    key = (lines + count, prev_total + total)
+                    candidate = (prev_sq + total_sq, max(prev_extent, extent), (i, lines, prev_total))
+                    current = states[j].get(key)
+                    if current is None or candidate[:2] < current[:2]:
+                        states[j][key] = candidate
+        for (lines, total), (total_sq, extent, back) in states[n].items():
+            if lines != target_lines:
+                continue
+            score = (_uniformity(lines, total, total_sq), -effective_font_size(extent, lines))
+            if best is None or score < best[0]:
+                best = (score, target_lines, total)
+                best_states = states
+
+    if best is None:
+        return None
+
+    # 回溯出分组边界
+    (_, neg_font_size), lines, total = best
+    kept = [False] * (n - 1)
+    j = n
+    while j > 0:
+        i, lines, total = best_states[j][(lines, total)][2]
+        if i > 0:
+            kept[i - 1] = True
+        j = i
+    return kept, -neg_font_size
+
+
+def optimize_line_breaks_for_text(
+    text: str,
+    horizontal: bool,
+    font_size: int,
+    bubble_width: float,
+    bubble_height: float,
+    line_spacing: Optional[float] = None,
+    language: str = 'en_US',
+    auto_rotate_symbols: bool = False,
+    require_break: bool = False,
+) -> Tuple[Optional[str], float]:
+    """
+    对一段带 [BR] 的文本选择最优断句方案。
+
+    Returns:
+        (最优文本（保留的断点为 [BR]），有效字号)；没有可行方案时返回 (None, 0)
+    """
+    _, segments = split_line_break_segments(text)
+
+    def measure(line: str):
+        if horizontal:
+            lines, extents = font_fitting.calc_horizontal(font_size, line, max_width=99999, max_height=99999, language=language)
+        else:
+            if auto_rotate_symbols:
+                line = text_render.auto_add_horizontal_tags(line)
+            lines, extents = font_fitting.calc_vertical(font_size, line, max_height=99999)
+        return extents, [len(l.strip()) for l in lines]
+
+    if horizontal:
+        spacing = int(font_size * (line_spacing or 0.01))
+    else:
+        spacing = int(font_size * (line_spacing or 0.2))
+
+    def effective_font_size(max_extent: float, lines: int) -> float:
+        stacked = font_size * lines + spacing * max(0, lines - 1)
+        required_width, required_height = (max_extent, stacked) if horizontal else (stacked, max_extent)
+        width_ratio = bubble_width / required_width if required_width > 0 else 1.0
+        height_ratio = bubble_height / required_height if required_height > 0 else 1.0
+        return font_size * min(width_ratio, height_ratio)
+
+    # 与原规则一致：首段不超过 2 个字符时不去掉第一个断点
+    can_remove_first_break = len(segments) < 2 or len(segments[0].strip()) > 2
+    result = optimize_line_breaks(segments, measure, effective_font_size, can_remove_first_break, require_break)
+    if result is None:
+        return None, 0
+    kept, best_font_size = result
+    return join_line_break_segments(segments, kept), best_font_size
@@ -5,6 +5,8 @@ import numpy as np
 import freetype
 import functools
 import logging
+import threading
+from collections import OrderedDict, namedtuple
 from pathlib import Path
 from typing import Tuple, Optional, List
 from hyphen import Hyphenator
@@ -116,11 +118,8 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())  
 
 DEFAULT_FONT = os.path.join(BASE_PATH, 'fonts', 'Arial-Unicode-Regular.ttf')
-try:
-    FONT = freetype.Face(Path(DEFAULT_FONT).open('rb'))
-except Exception as e:
-    logger.error(f"Failed to initialize default font: {e}")
-    FONT = None  
+FONT: Optional[freetype.Face] = None
+FONT_PATH: Optional[str] = None
 
 def CJK_Compatibility_Forms_translate(cdpt: str, direction: int):
     """direction: 0 - horizontal, 1 - vertical"""
@@ -251,52 +250,130 @@ FALLBACK_FONTS = [
     os.path.join(BASE_PATH, 'fonts/msgothic.ttc'),
 ]
 FONT_SELECTION: List[freetype.Face] = []
+# 当前字体选择（主字体 + 回退字体）对应的路径元组，作为字形缓存键的一部分
+FONT_SELECTION_KEY: Tuple[str, ...] = ()
+
+# 字体注册表：按规范化路径缓存 freetype.Face，同一字体文件在进程内只打开一次
 font_cache = {}
+_font_lock = threading.RLock()
+
+def normalize_font_path(path: str) -> str:
+    return os.path.normpath(os.path.abspath(path)).replace('\\', '/')
+
 def get_cached_font(path: str) -> freetype.Face:
-    path = path.replace('\\', '/')
-    if not font_cache.get(path):
-        font_cache[path] = freetype.Face(Path(path).open('rb'))
-    return font_cache[path]
+    path = normalize_font_path(path)
+    with _font_lock:
+        face = font_cache.get(path)
+        if face is None:
+            # 打开失败时抛出异常，不写入注册表
+            face = freetype.Face(Path(path).open('rb'))
+            font_cache[path] = face
+        return face
 
 def update_font_selection():
-    global FONT_SELECTION
-    FONT_SELECTION = []
+    global FONT_SELECTION, FONT_SELECTION_KEY
+    selection = []
+    keys = []
     if FONT:
-        FONT_SELECTION.append(FONT)
+        selection.append(FONT)
+        keys.append(FONT_PATH)
     for font_path in FALLBACK_FONTS:
         try:
             face = get_cached_font(font_path)
-            if face and face not in FONT_SELECTION:
-                FONT_SELECTION.append(face)
+            if face and face not in selection:
+                selection.append(face)
+                keys.append(normalize_font_path(font_path))
         except Exception as e:
             logger.error(f"Failed to load fallback font: {font_path} - {e}")
+    FONT_SELECTION = selection
+    FONT_SELECTION_KEY = tuple(keys)
 
 
-def set_font(path: str):
-    global FONT
-    if not path or not os.path.exists(path):
-        if path:
-            logger.error(f'Could not load font: {path}')
-        try:
-            FONT = freetype.Face(Path(DEFAULT_FONT).open('rb'))
-        except (freetype.ft_errors.FT_Exception, FileNotFoundError):
-            logger.critical("Default font could not be loaded. Please check your installation.")
-            FONT = None
-        update_font_selection()
-        get_char_glyph.cache_clear()
-        return
-
+def _load_primary_font(path: str) -> bool:
+    global FONT, FONT_PATH
     try:
-        FONT = freetype.Face(Path(path).open('rb'))
-    except (freetype.ft_errors.FT_Exception, FileNotFoundError):
+        face = get_cached_font(path)
+    except (freetype.ft_errors.FT_Exception, FileNotFoundError, OSError):
+        return False
+    FONT = face
+    FONT_PATH = normalize_font_path(path)
+    return True
+
+
+def set_font(path: str):
+    """
+    切换主字体。字体文件通过注册表只加载一次；
+    字形缓存按字体选择区分，切换字体不再清空缓存，重复设置同一字体为空操作。
+    """
+    global FONT, FONT_PATH
+    if path and os.path.exists(path):
+        if FONT is not None and FONT_PATH == normalize_font_path(path):
+            return
+        if _load_primary_font(path):
+            update_font_selection()
+            return
+
+    if path:
         logger.error(f'Could not load font: {path}')
-        try:
-            FONT = freetype.Face(Path(DEFAULT_FONT).open('rb'))
-        except (freetype.ft_errors.FT_Exception, FileNotFoundError):
-            logger.critical("Default font could not be loaded. Please check your installation.")
-            FONT = None
+    if FONT is not None and FONT_PATH == normalize_font_path(DEFAULT_FONT):
+        return
+    if not _load_primary_font(DEFAULT_FONT):
+        logger.critical("Default font could not be loaded. Please check your installation.")
+        FONT = None
+        FONT_PATH = None
     update_font_selection()
-    get_char_glyph.cache_clear()
+
+
+GlyphCacheInfo = namedtuple('GlyphCacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class FontLRUCache:
+    """
+    按当前字体选择（FONT_SELECTION_KEY）区分的有界 LRU 缓存，跨区域、跨页面复用。
+    接口与 functools.lru_cache 保持一致（cache_info / cache_clear）。
+    """
+
+    def __init__(self, func, maxsize: int):
+        functools.update_wrapper(self, func)
+        self._func = func
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __call__(self, *args):
+        key = (FONT_SELECTION_KEY, *args)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        value = self._func(*args)
+        with self._lock:
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return value
+
+    def cache_info(self):
+        with self._lock:
+            return GlyphCacheInfo(self.hits, self.misses, self.maxsize, len(self._cache))
+
+    def cache_clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+
+def font_lru_cache(maxsize: int = 1024):
+    def decorator(func):
+        return FontLRUCache(func, maxsize)
+    return decorator
+
+GLYPH_CACHE_SIZE = 4096
 
 class namespace:
     pass
@@ -320,7 +397,7 @@ class Glyph:
         self.metrics.horiAdvance = glyph.metrics.horiAdvance
         self.metrics.vertAdvance = glyph.metrics.vertAdvance
 
-@functools.lru_cache(maxsize = 1024, typed = True)
+@font_lru_cache(maxsize = GLYPH_CACHE_SIZE)
 def get_char_glyph(cdpt: str, font_size: int, direction: int) -> Glyph:
     global FONT_SELECTION
     for i, face in enumerate(FONT_SELECTION):
@@ -354,7 +431,6 @@ def get_char_glyph(cdpt: str, font_size: int, direction: int) -> Glyph:
         
     return get_char_glyph(' ', font_size, direction)
 
-#@functools.lru_cache(maxsize = 1024, typed = True)
 def get_char_border(cdpt: str, font_size: int, direction: int):
     global FONT_SELECTION
     for i, face in enumerate(FONT_SELECTION):
@@ -368,6 +444,28 @@ def get_char_border(cdpt: str, font_size: int, direction: int):
         slot_border = face.glyph
         return slot_border.get_glyph()
 
+BORDER_CACHE_SIZE = 2048
+
+@font_lru_cache(maxsize = BORDER_CACHE_SIZE)
+def get_char_border_bitmap(cdpt: str, font_size: int, direction: int, stroke_radius: int) -> Optional[np.ndarray]:
+    """
+    返回描边后字形的位图（只读 uint8 数组），位图为空时返回 None。
+    缓存的是渲染结果而不是 FreeType 字形句柄（句柄在 stroke 时会被销毁，不能复用），
+    按字体选择、字号、方向和描边半径（26.6 定点）区分。
+    """
+    glyph_border = get_char_border(cdpt, font_size, direction)
+    stroker = freetype.Stroker()
+    stroker.set(stroke_radius, freetype.FT_STROKER_LINEJOIN_ROUND, freetype.FT_STROKER_LINECAP_ROUND, 0)
+    glyph_border.stroke(stroker, destroy=True)
+    blyph = glyph_border.to_bitmap(freetype.FT_RENDER_MODE_NORMAL, freetype.Vector(0, 0), True)
+    bitmap_b = blyph.bitmap
+    rows, width = bitmap_b.rows, bitmap_b.width
+    if rows * width == 0 or len(bitmap_b.buffer) != rows * width:
+        return None
+    bitmap_border = np.array(bitmap_b.buffer, dtype=np.uint8).reshape((rows, width))
+    bitmap_border.flags.writeable = False
+    return bitmap_border
+
 def calc_horizontal_block_height(font_size: int, content: str) -> int:
     """
     预先计算横排块在竖排文本中的实际渲染高度
@@ -578,19 +676,12 @@ def put_char_vertical(font_size: int, cdpt: str, pen_l: Tuple[int, int], canvas_
         if bitmap_char_slice.size > 0:
             canvas_text[paste_y_start:paste_y_end, paste_x_start:paste_x_end] = bitmap_char_slice
     if border_size > 0:
-        glyph_border = get_char_border(cdpt, font_size, 1)
-        stroker = freetype.Stroker()
         # Get stroke width from config, default to 0.07 if not specified
         stroke_ratio = config.render.stroke_width if (config and hasattr(config.render, 'stroke_width')) else 0.07
         stroke_radius = 64 * max(int(stroke_ratio * font_size), 1)
-        stroker.set(stroke_radius, freetype.FT_STROKER_LINEJOIN_ROUND, freetype.FT_STROKER_LINECAP_ROUND, 0)
-        glyph_border.stroke(stroker, destroy=True)
-        blyph = glyph_border.to_bitmap(freetype.FT_RENDER_MODE_NORMAL, freetype.Vector(0, 0), True)
-        bitmap_b = blyph.bitmap
-        border_bitmap_rows = bitmap_b.rows
-        border_bitmap_width = bitmap_b.width
-        if border_bitmap_rows * border_bitmap_width > 0 and len(bitmap_b.buffer) == border_bitmap_rows * border_bitmap_width:
-            bitmap_border = np.array(bitmap_b.buffer, dtype=np.uint8).reshape((border_bitmap_rows, border_bitmap_width))
+        bitmap_border = get_char_border_bitmap(cdpt, font_size, 1, stroke_radius)
+        if bitmap_border is not None:
+            border_bitmap_rows, border_bitmap_width = bitmap_border.shape
 
             # 如果需要旋转90度，边框也要旋转
             if force_rotate_90:
@@ -1251,25 +1342,12 @@ def put_char_horizontal(font_size: int, cdpt: str, pen_l: Tuple[int, int], canva
         canvas_text[paste_y_start:paste_y_end, 
                     paste_x_start:paste_x_end] = bitmap_char_slice
     if border_size > 0:
-        glyph_border = get_char_border(cdpt, font_size, 0)
-        stroker = freetype.Stroker()
         # Get stroke width from config, default to 0.07 if not specified
         stroke_ratio = config.render.stroke_width if (config and hasattr(config.render, 'stroke_width')) else 0.07
         stroke_radius = 64 * max(int(stroke_ratio * font_size), 1)
-        stroker.set(stroke_radius, 
-                   freetype.FT_STROKER_LINEJOIN_ROUND,
-                   freetype.FT_STROKER_LINECAP_ROUND,
-                   0)
-        glyph_border.stroke(stroker, destroy=True)
-        blyph = glyph_border.to_bitmap(freetype.FT_RENDER_MODE_NORMAL, 
-                                      freetype.Vector(0, 0), True)
-        bitmap_b = blyph.bitmap
-        border_bitmap_rows = bitmap_b.rows
-        border_bitmap_width = bitmap_b.width
-        if (border_bitmap_rows * border_bitmap_width > 0 and 
-            len(bitmap_b.buffer) == border_bitmap_rows * border_bitmap_width):
-            bitmap_border = np.array(bitmap_b.buffer, dtype=np.uint8
-                                   ).reshape((border_bitmap_rows, border_bitmap_width))
+        bitmap_border = get_char_border_bitmap(cdpt, font_size, 0, stroke_radius)
+        if bitmap_border is not None:
+            border_bitmap_rows, border_bitmap_width = bitmap_border.shape
             char_bitmap_rows = bitmap.rows
             char_bitmap_width = bitmap.width
             char_center_offset_x = char_bitmap_width / 2.0
@@ -1430,6 +1508,8 @@ def test():
     imwrite_unicode('text_render_combined.png', canvas, logger)
 
 # Initialize font selection on module load
+if not _load_primary_font(DEFAULT_FONT):
+    logger.error(f"Failed to initialize default font: {DEFAULT_FONT}")
 update_font_selection()
 
 if __name__ == '__main__':
@@ -1,11 +1,12 @@
 import itertools
 import numpy as np
-from typing import List, Set
+from typing import List, Set, Tuple
 from collections import Counter
 import networkx as nx
+import shapely
 from shapely.geometry import Polygon
 
-from ..utils import TextBlock, Quadrilateral, quadrilateral_can_merge_region
+from ..utils import TextBlock, Quadrilateral, QuadrilateralBatch, quadrilateral_can_merge_region
 
 def split_text_region(
         bboxes: List[Quadrilateral],
@@ -41,9 +42,10 @@ def split_text_region(
     G = nx.Graph()
     for idx in connected_region_indices:
         G.add_node(idx)
-    for (u, v) in itertools.combinations(connected_region_indices, 2):
-        dist = bboxes[u].distance(bboxes[v])
-        G.add_edge(u, v, weight=dist)
+    # 一次性向量化计算连通块内所有框对的距离
+    distances = QuadrilateralBatch.from_quadrilaterals([bboxes[idx] for idx in connected_region_indices]).distance_matrix()
+    for (i, u), (j, v) in itertools.combinations(enumerate(connected_region_indices), 2):
+        G.add_edge(u, v, weight=distances[i, j])
 
     # Get distances from neighbouring bboxes
     edges = nx.algorithms.tree.minimum_spanning_edges(G, algorithm='kruskal', data=True)
@@ -102,6 +104,28 @@ def split_text_region(
 #     box = np.array(box)
 #     return box
 
+def merge_candidate_pairs(bboxes: List[Quadrilateral], discard_connection_gap = 2, batch: QuadrilateralBatch = None) -> List[Tuple[int, int]]:
+    """
+    用 STRtree 空间索引找出可能合并的框对 (u, v)，u < v，按字典序返回（与 itertools.combinations 顺序一致）。
+
+    quadrilateral_can_merge_region 在多边形距离 > discard_connection_gap * min(font_size) 时直接拒绝，
+    而包围盒间距不大于多边形距离，所以包围盒按自身字号外扩后仍不相交的框对一定不能合并，无需逐对计算。
+    """
+    if len(bboxes) < 2:
+        return []
+    batch = batch or QuadrilateralBatch.from_quadrilaterals(bboxes)
+    mins = batch.aabb[:, :2]
+    maxs = batch.aabb[:, 2:]
+    # 多留 1 像素余量，避免浮点误差漏掉刚好在阈值上的框对
+    radius = discard_connection_gap * batch.font_size.astype(np.float64) + 1
+    tree = shapely.STRtree(shapely.box(mins[:, 0], mins[:, 1], maxs[:, 0], maxs[:, 1]))
+    # 不带 predicate 的查询只比较包围盒
+    ia, ib = tree.query(shapely.box(mins[:, 0] - radius, mins[:, 1] - radius, maxs[:, 0] + radius, maxs[:, 1] + radius))
+    keep = ia < ib
+    ia, ib = ia[keep], ib[keep]
+    order = np.lexsort((ib, ia))
+    return list(zip(ia[order].tolist(), ib[order].tolist()))
+
 def merge_bboxes_text_region(bboxes: List[Quadrilateral], width, height, debug=False, edge_ratio_threshold=0.0):
     # step 0: merge quadrilaterals that belong to the same textline
     # u = 0
@@ -127,13 +151,20 @@ def merge_bboxes_text_region(bboxes: List[Quadrilateral], width, height, debug=F
     # 记录边缘距离
     edge_distances = {}
     edge_count = 0
-    for ((u, ubox), (v, vbox)) in itertools.combinations(enumerate(bboxes), 2):
+    batch = QuadrilateralBatch.from_quadrilaterals(bboxes)
+    # 只对空间上足够接近的候选对做精确判断，避免 O(n²) 的逐对几何计算
+    merge_pairs = []
+    for u, v in merge_candidate_pairs(bboxes, batch=batch):
+        ubox, vbox = bboxes[u], bboxes[v]
         # if quadrilateral_can_merge_region_coarse(ubox, vbox):
         can_merge = quadrilateral_can_merge_region(ubox, vbox, aspect_ratio_tol=1.3, font_size_ratio_tol=2,
                                           char_gap_tolerance=1, char_gap_tolerance2=3, debug=debug)
         if can_merge:
-            # 计算边缘距离
-            poly_dist = ubox.poly_distance(vbox)
+            merge_pairs.append((u, v))
+    # 计算边缘距离
+    if merge_pairs:
+        ia, ib = np.array(merge_pairs).T
+        for u, v, poly_dist in zip(ia.tolist(), ib.tolist(), batch.poly_distance_pairs(ia, ib).tolist()):
             G.add_edge(u, v, distance=poly_dist)
             edge_distances[(u, v)] = poly_dist
             edge_count += 1
@@ -23,6 +23,7 @@ from .groq import GroqTranslator
 from .gemini import GeminiTranslator
 from .openai_hq import OpenAIHighQualityTranslator
 from .gemini_hq import GeminiHighQualityTranslator
+from .translation_memory import get_translation_memory
 from ..config import Config, Translator, TranslatorConfig, TranslatorChain
 from ..utils import Context
 
@@ -100,6 +101,7 @@ async def dispatch(chain: TranslatorChain, queries: List[str], config: Config, u
                 await translator.load('auto', chain.langs[flag], device)
                 pass
             translator.parse_args(config.translator)
+            translator.translation_memory = get_translation_memory(config.translator)
             queries = await translator.translate('auto', chain.langs[flag], queries, use_mtpe)
             await translator.unload(device)
             flag+=1
@@ -111,6 +113,7 @@ async def dispatch(chain: TranslatorChain, queries: List[str], config: Config, u
         if isinstance(translator, OfflineTranslator):
             await translator.load('auto', tgt_lang, device)
         translator.parse_args(config.translator)
+        translator.translation_memory = get_translation_memory(config.translator)
         if key.value in ["gemini_hq", "openai_hq"]:
             queries = await translator.translate('auto', tgt_lang, queries, ctx=args)
         else:
@@ -1,9 +1,9 @@
 import re
-import time
 import asyncio
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from abc import abstractmethod
 
+from .split_scheduler import SplitStats, gather_or_cancel, get_batch_size_advisor
 from ..utils import InfererModule, ModelWrapper, repeating_sequence, is_valuable_text
 
 try:
@@ -69,6 +69,19 @@ ISO_639_1_TO_VALID_LANGUAGES = {
     'tl': 'FIL'
 }
 
+def group_queries_by_language(queries: List[str], from_lang: str, detect_lang) -> Dict[Optional[str], List[int]]:
+    """
+    按源语言对查询分组，返回 {源语言: 查询下标列表}（保持原顺序）。
+
+    from_lang 为 'auto' 时逐句调用 detect_lang(query) 检测语言，检测失败的句子归入 None 组；
+    否则所有查询都归入 from_lang 组。离线模型按组批量翻译，同一语言的句子可以合并推理。
+    """
+    groups: Dict[Optional[str], List[int]] = {}
+    for i, query in enumerate(queries):
+        lang = detect_lang(query) if from_lang == 'auto' else from_lang
+        groups.setdefault(lang, []).append(i)
+    return groups
+
 class InvalidServerResponse(Exception):
     pass
 
@@ -134,10 +147,28 @@ class CommonTranslator(InfererModule):
     # Will sleep for the rest of the minute if the request count is over this number.
     _MAX_REQUESTS_PER_MINUTE = -1
 
+    # 同时进行中的请求数上限（0 表示不限制），与每分钟请求数一起由共享的限流器控制
+    _MAX_CONCURRENT_REQUESTS = 0
+
+    # 为 True 时翻译器在 _translate 内部对每次 API 请求调用 _rate_limited()，
+    # translate() 不再对整个 _translate 调用限流
+    _RATE_LIMIT_PER_REQUEST = False
+
+    # 翻译记忆部分命中时是否只把未命中的文本交给 _translate。
+    # 提示词按序号与 ctx 中的区域/图片对应的翻译器需设为 False，此时只有整批命中才跳过请求。
+    _TRANSLATION_MEMORY_PARTIAL_HITS = True
+
+    # 为 True 时 _translate_with_split 记住该翻译器能成功的批次大小，之后的批次预先按该大小切块，
+    # 并把每块文本在整批中的序号作为 batch_indices 传给 translator_func（用于按序号取 ctx.text_regions）。
+    # 提示词由 ctx 中的整批图片构建、无法按 texts 切块的翻译器需设为 False。
+    _ADAPTIVE_BATCH_SIZE = True
+
+    # 由 translators.dispatch 根据配置设置（None 表示不使用翻译记忆）
+    translation_memory = None
+
     def __init__(self):
         super().__init__()
         self.mtpe_adapter = MTPEAdapter()
-        self._last_request_ts = 0
         self.enable_post_translation_check = False
         self.post_check_repetition_threshold = 5
         self.post_check_max_retry_attempts = 2
@@ -147,7 +178,7 @@ class CommonTranslator(InfererModule):
         self._global_attempt_count = 0  # 全局尝试计数器
         self._max_total_attempts = -1  # 全局最大尝试次数
 
-    def _build_user_prompt_for_texts(self, texts: List[str], ctx=None, prev_context: str = "") -> str:
+    def _build_user_prompt_for_texts(self, texts: List[str], ctx=None, prev_context: str = "", batch_indices: List[int] = None) -> str:
         """
         统一的用户提示词构建方法（纯文本翻译）
         适用于 openai.py 和 gemini.py
@@ -156,6 +187,7 @@ class CommonTranslator(InfererModule):
             texts: 要翻译的文本列表
             ctx: 上下文对象（可选）
             prev_context: 历史上下文（可选）
+            batch_indices: 每个文本在 ctx.text_regions 中的序号（可选，批次被切块时使用）
 
         Returns:
             构建好的用户提示词字符串
@@ -180,8 +212,9 @@ class CommonTranslator(InfererModule):
         for i, text in enumerate(texts):
             text_to_translate = text.replace('\n', ' ').replace('\ufffd', '')
             # 只有开启AI断句时才添加区域信息
-            if enable_ai_break and ctx and hasattr(ctx, 'text_regions') and ctx.text_regions and i < len(ctx.text_regions):
-                region = ctx.text_regions[i]
+            region_idx = batch_indices[i] if batch_indices and i < len(batch_indices) else i
+            if enable_ai_break and ctx and hasattr(ctx, 'text_regions') and ctx.text_regions and region_idx < len(ctx.text_regions):
+                region = ctx.text_regions[region_idx]
                 region_count = len(region.lines) if hasattr(region, 'lines') else 1
                 prompt += f"{i+1}. [Original regions: {region_count}] {text_to_translate}\n"
             else:
@@ -436,7 +469,11 @@ class CommonTranslator(InfererModule):
 
     async def _translate_with_split(self, translator_func, texts: List[str], split_level: int = 0, **kwargs) -> List[str]:
         """
-        带分割重试的翻译包装器（新逻辑）
+        带分割重试的翻译包装器
+
+        translator_func 在同一批次重试 _SPLIT_THRESHOLD 次后抛出 SplitException，此时批次一分为二并发重试。
+        _ADAPTIVE_BATCH_SIZE 为 True 时按该翻译器之前成功的批次大小预先切块，
+        并以 batch_indices 参数告诉 translator_func 每块文本在 texts 中的序号。
 
         Args:
             translator_func: 实际的翻译函数（async callable）
@@ -447,6 +484,37 @@ class CommonTranslator(InfererModule):
         Returns:
             翻译结果列表
         """
+        advisor = get_batch_size_advisor(self._rate_limit_key()) if self._ADAPTIVE_BATCH_SIZE else None
+        # 统计按调用保存，同一实例上并发的 _translate 调用互不覆盖
+        stats = SplitStats(texts=len(texts))
+        attempts_before = self._global_attempt_count
+        try:
+            if advisor is not None and len(texts) > 1:
+                sizes = advisor.plan(len(texts))
+            else:
+                sizes = [len(texts)]
+            if len(sizes) > 1:
+                stats.pre_split_batches = len(sizes)
+                self.logger.info(f"Using preferred batch size {advisor.preferred}: {len(texts)} texts → {len(sizes)} batches")
+                chunks, start = [], 0
+                for size in sizes:
+                    chunks.append((texts[start:start + size], list(range(start, start + size))))
+                    start += size
+                results = await gather_or_cancel([
+                    self._translate_split_batch(translator_func, chunk, chunk_indices, split_level, advisor, stats, kwargs)
+                    for chunk, chunk_indices in chunks
+                ])
+                return [translation for result in results for translation in result]
+            batch_indices = list(range(len(texts))) if advisor is not None else None
+            return await self._translate_split_batch(translator_func, texts, batch_indices, split_level, advisor, stats, kwargs)
+        finally:
+            stats.attempts = self._global_attempt_count - attempts_before
+            if stats.retries or stats.splits or stats.pre_split_batches or stats.failures:
+                self.logger.info(f"Split scheduler: {stats.summary()}")
+
+    async def _translate_split_batch(self, translator_func, texts: List[str], batch_indices: Optional[List[int]], split_level: int, advisor, stats: SplitStats, kwargs) -> List[str]:
+        stats.max_split_level = max(stats.max_split_level, split_level)
+
         # 检查是否超过全局尝试次数
         if self._max_total_attempts != -1 and self._global_attempt_count >= self._max_total_attempts:
             self.logger.error(f"Global attempt limit reached before translation: {self._global_attempt_count}/{self._max_total_attempts}")
@@ -454,42 +522,44 @@ class CommonTranslator(InfererModule):
 
         try:
             # 尝试翻译（内部会检查是否需要分割）
-            translations = await translator_func(texts, split_level=split_level, **kwargs)
-            return translations
+            if batch_indices is not None:
+                translations = await translator_func(texts, split_level=split_level, batch_indices=batch_indices, **kwargs)
+            else:
+                translations = await translator_func(texts, split_level=split_level, **kwargs)
 
         except self.SplitException as split_ex:
+            if advisor is not None:
+                advisor.record_split(len(texts))
+
             # 触发分割
             if split_level < self._MAX_SPLIT_ATTEMPTS and len(texts) > 1:
                 self.logger.warning(
                     f"Splitting after {split_ex.attempt_count} attempts at split_level={split_level}, "
                     f"batch size {len(texts)} → splitting into two halves"
                 )
+                stats.splits += 1
 
                 # 分成两半（只分割texts，不分割batch_data等其他参数）
                 mid = len(texts) // 2
                 left_texts = texts[:mid]
                 right_texts = texts[mid:]
+                left_indices = batch_indices[:mid] if batch_indices is not None else None
+                right_indices = batch_indices[mid:] if batch_indices is not None else None
 
                 self.logger.info(f"Split: left={len(left_texts)}, right={len(right_texts)}, global_attempts={self._global_attempt_count}/{self._max_total_attempts}")
 
-                # 并发翻译左右两部分（kwargs保持完整传递）
-                try:
-                    left_translations, right_translations = await asyncio.gather(
-                        self._translate_with_split(translator_func, left_texts, split_level + 1, **kwargs),
-                        self._translate_with_split(translator_func, right_texts, split_level + 1, **kwargs),
-                        return_exceptions=False
-                    )
-                except Exception as split_error:
-                    # 如果并发失败，回退到串行处理
-                    self.logger.warning(f"Concurrent split failed, falling back to sequential: {split_error}")
-                    left_translations = await self._translate_with_split(translator_func, left_texts, split_level + 1, **kwargs)
-                    right_translations = await self._translate_with_split(translator_func, right_texts, split_level + 1, **kwargs)
+                # 并发翻译左右两部分（速率和并发由限流器控制），一半失败时取消另一半
+                left_translations, right_translations = await gather_or_cancel([
+                    self._translate_split_batch(translator_func, left_texts, left_indices, split_level + 1, advisor, stats, kwargs),
+                    self._translate_split_batch(translator_func, right_texts, right_indices, split_level + 1, advisor, stats, kwargs),
+                ])
 
                 # 合并结果
                 return left_translations + right_translations
 
             else:
                 # 不能再分割了，终止翻译进程
+                stats.failures += 1
                 if len(texts) == 1:
                     self.logger.error(f"Single text translation failed at split_level={split_level}: {texts[0][:50]}...")
                     raise Exception(f"Translation failed for single text after {split_ex.attempt_count} attempts")
@@ -499,10 +569,20 @@ class CommonTranslator(InfererModule):
 
         except Exception as e:
             # 其他异常（非分割触发的），直接终止
+            stats.failures += 1
             self.logger.error(f"Translation failed with exception at split_level={split_level}: {e}")
             raise e
 
+        stats.requests += 1
+        if advisor is not None:
+            advisor.record_success(len(texts))
+        return translations
+
     def parse_args(self, config):
+        max_rpm = getattr(config, 'max_requests_per_minute', 0)
+        if max_rpm and max_rpm > 0:
+            self._MAX_REQUESTS_PER_MINUTE = max_rpm
+        self._MAX_CONCURRENT_REQUESTS = getattr(config, 'max_concurrent_requests', self._MAX_CONCURRENT_REQUESTS)
         self.enable_post_translation_check = getattr(config, 'enable_post_translation_check', self.enable_post_translation_check)
         self.post_check_repetition_threshold = getattr(config, 'post_check_repetition_threshold', self.post_check_repetition_threshold)
         self.post_check_max_retry_attempts = getattr(config, 'post_check_max_retry_attempts', self.post_check_max_retry_attempts)
@@ -558,18 +638,34 @@ class CommonTranslator(InfererModule):
 
         queries = [queries[i] for i in query_indices]
 
+        # 查询翻译记忆，只有未命中的文本才会发送给翻译后端
+        source_queries = queries
+        memory_keys = []
+        memory_hits = {}
+        if self.translation_memory is not None and queries:
+            try:
+                memory_keys = self._translation_memory_keys(from_lang, to_lang, queries, ctx)
+                memory_hits = self.translation_memory.lookup(memory_keys, require_all=not self._TRANSLATION_MEMORY_PARTIAL_HITS)
+            except Exception as e:
+                self.logger.warning(f'查询翻译记忆失败，本批次不使用翻译记忆: {e}')
+                memory_keys, memory_hits = [], {}
+        pending_indices = [j for j in range(len(queries)) if not memory_keys or memory_keys[j] not in memory_hits]
+        queries = [source_queries[j] for j in pending_indices]
+
         translations = [''] * len(queries)
         untranslated_indices = list(range(len(queries)))
-        for i in range(1 + self._INVALID_REPEAT_COUNT): # Repeat until all translations are considered valid
+        for i in range(1 + self._INVALID_REPEAT_COUNT if queries else 0): # Repeat until all translations are considered valid
             if i > 0:
                 self.logger.warn(f'Repeating because of invalid translation. Attempt: {i+1}')
                 await asyncio.sleep(0.1)
 
-            # Sleep if speed is over the ratelimit
-            await self._ratelimit_sleep()
-
             # Translate
-            _translations = await self._translate(*self.parse_language_codes(from_lang, to_lang, fatal=True), queries, ctx=ctx)
+            if self._RATE_LIMIT_PER_REQUEST:
+                _translations = await self._translate(*self.parse_language_codes(from_lang, to_lang, fatal=True), queries, ctx=ctx)
+            else:
+                # Wait if speed is over the ratelimit
+                async with self._rate_limited():
+                    _translations = await self._translate(*self.parse_language_codes(from_lang, to_lang, fatal=True), queries, ctx=ctx)
 
             # Strict validation: translation count must match query count
             if len(_translations) != len(queries):
@@ -600,6 +696,10 @@ class CommonTranslator(InfererModule):
 
         translations = [self._clean_translation_output(q, r, to_lang) for q, r in zip(queries, translations)]
 
+        limiter = self.get_rate_limiter()
+        if limiter.stats.total_wait > 0 or limiter.stats.rate_limited:
+            self.logger.info(f'Rate limiter: {limiter.summary()}')
+
         if to_lang == 'ARA':
             import arabic_reshaper , bidi.algorithm
             translations = [bidi.algorithm.get_display(arabic_reshaper.reshape(t)) for t in translations]
@@ -607,6 +707,25 @@ class CommonTranslator(InfererModule):
         if use_mtpe:
             translations = await self.mtpe_adapter.dispatch(queries, translations)
 
+        if memory_keys:
+            self._store_translation_memory(
+                to_lang,
+                [source_queries[j] for j in pending_indices],
+                [memory_keys[j] for j in pending_indices],
+                translations,
+            )
+            pending_translations = dict(zip(pending_indices, translations))
+            translations = [
+                pending_translations[j] if j in pending_translations else memory_hits[memory_keys[j]]
+                for j in range(len(source_queries))
+            ]
+            queries = source_queries
+            stats = self.translation_memory.stats
+            self.logger.info(
+                f'翻译记忆命中 {len(source_queries) - len(pending_indices)}/{len(source_queries)}，'
+                f'本次运行累计命中率 {stats.hit_rate:.1%} ({stats.hits}/{stats.lookups})'
+            )
+
         # Merge with the queries without text
         for i, trans in enumerate(translations):
             final_translations[query_indices[i]] = trans
@@ -614,18 +733,111 @@ class CommonTranslator(InfererModule):
 
         return final_translations
 
+    async def _translate_with_memory(self, from_lang: str, to_lang: str, queries: List[str], ctx=None) -> List[str]:
+        """
+        直接调用 _translate 的上下文翻译流程（openai/gemini 及 *_hq）使用的翻译记忆包装。
+        这些翻译器的提示词按序号与 ctx 中的区域/图片对应，只有整批命中才跳过请求，否则整批翻译并写入翻译记忆。
+        没有有效文字的文本不参与查询，整批命中时原样返回（与 translate() 一致）。
+        """
+        if self.translation_memory is None or not queries:
+            return await self._translate(from_lang, to_lang, queries, ctx)
+
+        query_indices = [i for i, query in enumerate(queries) if is_valuable_text(query)]
+        valuable_queries = [queries[i] for i in query_indices]
+        try:
+            memory_keys = self._translation_memory_keys(from_lang, to_lang, valuable_queries, ctx)
+            memory_hits = self.translation_memory.lookup(memory_keys, require_all=True) if memory_keys else {}
+        except Exception as e:
+            self.logger.warning(f'查询翻译记忆失败，本批次不使用翻译记忆: {e}')
+            return await self._translate(from_lang, to_lang, queries, ctx)
+
+        if memory_hits:
+            self.logger.info(f'翻译记忆整批命中 {len(memory_keys)}/{len(memory_keys)}，跳过翻译请求')
+            translations = list(queries)
+            for i, key in zip(query_indices, memory_keys):
+                translations[i] = memory_hits[key]
+            return translations
+
+        translations = await self._translate(from_lang, to_lang, queries, ctx)
+        if len(translations) == len(queries):
+            self._store_translation_memory(to_lang, valuable_queries, memory_keys, [translations[i] for i in query_indices])
+        return translations
+
+    def _translation_memory_scope(self, from_lang: str, to_lang: str, ctx=None) -> dict:
+        """
+        影响译文的翻译器参数（模型、提示词、术语表、AI断句开关、多页上下文），用于区分翻译记忆条目。
+        提示词由翻译器自身的 _build_system_prompt / chat_system_template 生成，术语表包含在其中；
+        多页上下文由 set_prev_context 设置，会拼进用户提示词。
+        """
+        custom_prompt_json = getattr(ctx, 'custom_prompt_json', None) if ctx else None
+        line_break_prompt_json = getattr(ctx, 'line_break_prompt_json', None) if ctx else None
+        scope = {
+            'model': getattr(self, 'model', None),
+            'custom_prompt': custom_prompt_json,
+            'line_break_prompt': line_break_prompt_json,
+        }
+        prev_context = getattr(self, 'prev_context', None)
+        if prev_context:
+            scope['prev_context'] = prev_context
+        if ctx and getattr(ctx, 'config', None) is not None and hasattr(ctx.config, 'render'):
+            scope['ai_break'] = getattr(ctx.config.render, 'disable_auto_wrap', False)
+        if hasattr(self, '_build_system_prompt'):
+            try:
+                scope['system_prompt'] = self._build_system_prompt(
+                    from_lang, to_lang, custom_prompt_json=custom_prompt_json, line_break_prompt_json=line_break_prompt_json
+                )
+            except Exception:
+                pass
+        try:
+            scope['chat_system_template'] = getattr(self, 'chat_system_template', None)
+        except Exception:
+            pass
+        return scope
+
+    def _translation_memory_keys(self, from_lang: str, to_lang: str, queries: List[str], ctx=None) -> List[str]:
+        from .translation_memory import TranslationMemory, hash_scope
+        scope_hash = hash_scope(self._translation_memory_scope(from_lang, to_lang, ctx))
+        translator = self.__class__.__name__
+        return [TranslationMemory.make_key(q, translator, from_lang, to_lang, scope_hash) for q in queries]
+
+    def _store_translation_memory(self, to_lang: str, queries: List[str], keys: List[str], translations: List[str]):
+        entries = {}
+        for query, key, trans in zip(queries, keys, translations):
+            # 空译文和原样返回的文本（翻译失败时部分翻译器会返回原文）不写入翻译记忆
+            if not trans or not trans.strip() or trans == query:
+                continue
+            entries[key] = (query, trans, self.__class__.__name__, to_lang)
+        try:
+            self.translation_memory.store(entries)
+        except Exception as e:
+            self.logger.warning(f'写入翻译记忆失败: {e}')
+
     @abstractmethod
     async def _translate(self, from_lang: str, to_lang: str, queries: List[str], ctx=None) -> List[str]:
         pass
 
-    async def _ratelimit_sleep(self):
-        if self._MAX_REQUESTS_PER_MINUTE > 0:
-            now = time.time()
-            ratelimit_timeout = self._last_request_ts + 60 / self._MAX_REQUESTS_PER_MINUTE
-            if ratelimit_timeout > now:
-                self.logger.info(f'Ratelimit sleep: {(ratelimit_timeout-now):.2f}s')
-                await asyncio.sleep(ratelimit_timeout-now)
-            self._last_request_ts = time.time()
+    def _rate_limit_key(self) -> str:
+        model = getattr(self, 'model', None) or getattr(self, 'model_name', None)
+        return f'{self.__class__.__name__}:{model}' if isinstance(model, str) and model else self.__class__.__name__
+
+    def get_rate_limiter(self):
+        """返回该翻译器（按翻译器与 API Key 区分）共享的限流器，stats 中有排队等待统计"""
+        from .rate_limiter import get_rate_limiter
+        return get_rate_limiter(
+            self._rate_limit_key(),
+            getattr(self, 'api_key', None),
+            self._MAX_REQUESTS_PER_MINUTE,
+            self._MAX_CONCURRENT_REQUESTS,
+        )
+
+    def _rate_limited(self):
+        """
+        包住一次 API 请求的限流上下文（令牌桶 + 并发上限，429 时自动退避）：
+
+            async with self._rate_limited():
+                response = await self.client...
+        """
+        return self.get_rate_limiter().limit()
 
     def _is_translation_invalid(self, query: str, trans: str) -> bool:
         if not trans and query:
@@ -1,9 +1,7 @@
 import os
 import re
 import asyncio
-import base64
 import json
-from io import BytesIO
 from typing import List, Dict, Any
 from PIL import Image
 import google.generativeai as genai
@@ -11,44 +9,14 @@ from google.generativeai.types import HarmCategory, HarmBlockThreshold
 
 from .common import CommonTranslator, VALID_LANGUAGES
 from .keys import GEMINI_API_KEY
+from .image_encoding import encode_image
 from ..utils import Context
 
 
-def encode_image_for_gemini(image, max_size=1024):
-    """将图片处理为适合Gemini API的格式"""
-    # 转换图片格式为RGB（处理所有可能的图片模式）
-    if image.mode == "P":
-        # 调色板模式：转换为RGBA（如果有透明度）或RGB
-        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
-
-    if image.mode == "RGBA":
-        # RGBA模式：创建白色背景并合并透明通道
-        background = Image.new('RGB', image.size, (255, 255, 255))
-        background.paste(image, mask=image.split()[-1])
-        image = background
-    elif image.mode in ("LA", "L", "1", "CMYK"):
-        # LA（灰度+透明）、L（灰度）、1（二值）、CMYK：统一转换为RGB
-        if image.mode == "LA":
-            # 灰度+透明：先转RGBA再合并到白色背景
-            image = image.convert("RGBA")
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            background.paste(image, mask=image.split()[-1])
-            image = background
-        else:
-            # 其他模式：直接转RGB
-            image = image.convert("RGB")
-    elif image.mode != "RGB":
-        # 其他未知模式：强制转换为RGB
-        image = image.convert("RGB")
-
-    # 调整图片大小
-    w, h = image.size
-    if max(w, h) > max_size:
-        scale = max_size / max(w, h)
-        new_w, new_h = int(w * scale), int(h * scale)
-        image = image.resize((new_w, new_h), Image.LANCZOS)
-
-    return image
+def encode_image_for_gemini(image, max_size=1024, image_format='png', quality=90):
+    """将图片处理为适合Gemini API的 inline 数据（结果按图片内容缓存）"""
+    data, mime_type = encode_image(image, max_size, image_format, quality)
+    return {"mime_type": mime_type, "data": data}
 
 
 def _flatten_prompt_data(data: Any, indent: int = 0) -> str:
@@ -78,9 +46,13 @@ class GeminiHighQualityTranslator(CommonTranslator):
     支持多图片批量处理，提供文本框顺序、原文和原图给AI进行更精准的翻译
     """
     _LANGUAGE_CODE_MAP = VALID_LANGUAGES
+    # 提示词按序号对应 ctx 中的区域/图片，翻译记忆只在整批命中时跳过请求
+    _TRANSLATION_MEMORY_PARTIAL_HITS = False
     
-    # 类变量: 跨实例共享的RPM限制时间戳
-    _GLOBAL_LAST_REQUEST_TS = {}  # {model_name: timestamp}
+    # 每次 API 请求单独限流（限流器按翻译器、模型和 API Key 跨实例共享）
+    _RATE_LIMIT_PER_REQUEST = True
+    # 提示词由整批图片（batch_data）构建，不按 texts 预先切块
+    _ADAPTIVE_BATCH_SIZE = False
     
     def __init__(self):
         super().__init__()
@@ -96,10 +68,8 @@ class GeminiHighQualityTranslator(CommonTranslator):
         self.max_tokens = 25000
         self.temperature = 0.1
         self._MAX_REQUESTS_PER_MINUTE = 0  # 默认无限制
-        # 使用全局时间戳,跨实例共享
-        if self.model_name not in GeminiHighQualityTranslator._GLOBAL_LAST_REQUEST_TS:
-            GeminiHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self.model_name] = 0
-        self._last_request_ts_key = self.model_name
+        self.image_format = 'png'  # 发送给模型的图片编码格式
+        self.image_quality = 90
         self.safety_settings = [
             {
                 "category": HarmCategory.HARM_CATEGORY_HARASSMENT,
@@ -131,6 +101,11 @@ class GeminiHighQualityTranslator(CommonTranslator):
         if max_rpm > 0:
             self._MAX_REQUESTS_PER_MINUTE = max_rpm
             self.logger.info(f"Setting Gemini HQ max requests per minute to: {max_rpm}")
+        # 最大并发请求数（0 = 不限制）
+        self._MAX_CONCURRENT_REQUESTS = getattr(args, 'max_concurrent_requests', 0)
+        # 图片编码格式和质量（jpeg / webp 比 png 小得多）
+        self.image_format = str(getattr(args, 'hq_image_format', 'png') or 'png')
+        self.image_quality = getattr(args, 'hq_image_quality', 90)
     
     def _setup_client(self):
         """设置Gemini客户端"""
@@ -269,7 +244,7 @@ class GeminiHighQualityTranslator(CommonTranslator):
         # 添加图片
         for data in batch_data:
             image = data['image']
-            processed_image = encode_image_for_gemini(image)
+            processed_image = encode_image_for_gemini(image, image_format=self.image_format, quality=self.image_quality)
             content_parts.append(processed_image)
         
         # 发送请求
@@ -318,25 +293,12 @@ class GeminiHighQualityTranslator(CommonTranslator):
                 raise self.SplitException(local_attempt, texts)
 
             try:
-                # RPM限制
-                if self._MAX_REQUESTS_PER_MINUTE > 0:
-                    import time
-                    now = time.time()
-                    delay = 60.0 / self._MAX_REQUESTS_PER_MINUTE
-                    elapsed = now - GeminiHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key]
-                    if elapsed < delay:
-                        sleep_time = delay - elapsed
-                        self.logger.info(f'Ratelimit sleep: {sleep_time:.2f}s')
-                        await asyncio.sleep(sleep_time)
-                
-                response = await asyncio.to_thread(
-                    generate_content_with_logging,
-                    **request_args
-                )
-                
-                # 在API调用成功后立即更新时间戳，确保所有请求（包括重试）都被计入速率限制
-                if self._MAX_REQUESTS_PER_MINUTE > 0:
-                    GeminiHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key] = time.time()
+                # RPM / 并发限制（同一翻译器和 API Key 的实例共享，429 时自动退避）
+                async with self._rate_limited():
+                    response = await asyncio.to_thread(
+                        generate_content_with_logging,
+                        **request_args
+                    )
 
                 # 检查finish_reason，只有成功(1)才继续，其他都重试
                 if hasattr(response, 'candidates') and response.candidates:
@@ -547,25 +509,12 @@ class GeminiHighQualityTranslator(CommonTranslator):
                 self.logger.info(f"--- Gemini Fallback Request Body ---\n{json.dumps(log_kwargs, indent=2, ensure_ascii=False)}\n------------------------------------")
                 return self.client.generate_content(**kwargs)
 
-            # RPM限制
-            if self._MAX_REQUESTS_PER_MINUTE > 0:
-                import time
-                now = time.time()
-                delay = 60.0 / self._MAX_REQUESTS_PER_MINUTE
-                elapsed = now - GeminiHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key]
-                if elapsed < delay:
-                    sleep_time = delay - elapsed
-                    self.logger.info(f'Ratelimit sleep: {sleep_time:.2f}s')
-                    await asyncio.sleep(sleep_time)
-            
-            response = await asyncio.to_thread(
-                generate_content_with_logging,
-                **request_args
-            )
-            
-            # 在API调用成功后立即更新时间戳，确保所有请求（包括重试）都被计入速率限制
-            if self._MAX_REQUESTS_PER_MINUTE > 0:
-                GeminiHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key] = time.time()
+            # RPM / 并发限制（同一翻译器和 API Key 的实例共享，429 时自动退避）
+            async with self._rate_limited():
+                response = await asyncio.to_thread(
+                    generate_content_with_logging,
+                    **request_args
+                )
             
             if response and response.text:
                 result = response.text.strip()
@@ -0,0 +1,124 @@
+"""
+高质量（多模态）翻译器的图片编码
+
+整页图片在每次请求前都要转 RGB、LANCZOS 缩放并编码，分割重试和译后检查重试会反复发送同一批图片。
+编码结果按 (图片内容哈希, max_size, 格式, 质量) 缓存，同一张图片在本次运行中只处理一次。
+"""
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Tuple
+
+from PIL import Image
+
+# 缓存的编码结果数量（每项通常为几百 KB 到数 MB）
+IMAGE_CACHE_SIZE = 32
+
+IMAGE_FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def prepare_image(image: Image.Image, max_size: int = 1024) -> Image.Image:
+    """转换为 RGB（透明区域合并到白色背景）并把长边缩放到 max_size 以内"""
+    # 转换图片格式为RGB（处理所有可能的图片模式）
+    if image.mode == "P":
+        # 调色板模式：转换为RGBA（如果有透明度）或RGB
+        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+    if image.mode == "RGBA":
+        # RGBA模式：创建白色背景并合并透明通道
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    elif image.mode in ("LA", "L", "1", "CMYK"):
+        # LA（灰度+透明）、L（灰度）、1（二值）、CMYK：统一转换为RGB
+        if image.mode == "LA":
+            # 灰度+透明：先转RGBA再合并到白色背景
+            image = image.convert("RGBA")
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        else:
+            # 其他模式：直接转RGB
+            image = image.convert("RGB")
+    elif image.mode != "RGB":
+        # 其他未知模式：强制转换为RGB
+        image = image.convert("RGB")
+
+    # 调整图片大小
+    w, h = image.size
+    if max(w, h) > max_size:
+        scale = max_size / max(w, h)
+        new_w, new_h = int(w * scale), int(h * scale)
+        image = image.resize((new_w, new_h), Image.LANCZOS)
+
+    return image
+
+
+def image_digest(image: Image.Image) -> str:
+    """图片内容哈希（模式、尺寸和像素数据）"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{image.mode}:{image.size}:'.encode())
+    h.update(image.tobytes())
+    if image.mode == 'P':
+        h.update(bytes(image.getpalette() or []))
+        h.update(repr(image.info.get('transparency')).encode())
+    return h.hexdigest()
+
+
+def encode_image(image: Image.Image, max_size: int = 1024, image_format: str = 'png', quality: int = 90) -> Tuple[bytes, str]:
+    """
+    缩放并编码图片，结果按内容缓存。
+
+    Args:
+        image_format: png / jpeg / webp
+        quality: jpeg / webp 的编码质量（1-100），png 忽略
+
+    Returns:
+        (编码后的字节, MIME 类型)
+    """
+    image_format = str(image_format).lower()
+    if image_format == 'jpg':
+        image_format = 'jpeg'
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f'Unsupported image format: {image_format}. Choose from: {", ".join(IMAGE_FORMATS)}')
+    pil_format, mime_type = IMAGE_FORMATS[image_format]
+    quality = min(max(int(quality), 1), 100)
+
+    key = (image_digest(image), max_size, image_format, quality if image_format != 'png' else None)
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    buf = BytesIO()
+    if image_format == 'png':
+        prepare_image(image, max_size).save(buf, format=pil_format)
+    else:
+        prepare_image(image, max_size).save(buf, format=pil_format, quality=quality)
+    result = (buf.getvalue(), mime_type)
+
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > IMAGE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
+
+
+def encode_image_base64(image: Image.Image, max_size: int = 1024, image_format: str = 'png', quality: int = 90) -> Tuple[str, str]:
+    """同 encode_image，返回 (base64 字符串, MIME 类型)"""
+    data, mime_type = encode_image(image, max_size, image_format, quality)
+    return base64.b64encode(data).decode('utf-8'), mime_type
+
+
+def clear_image_cache():
+    with _cache_lock:
+        _cache.clear()
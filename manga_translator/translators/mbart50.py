@@ -2,7 +2,7 @@ import os
 import py3langid as langid
 
 
-from .common import OfflineTranslator
+from .common import OfflineTranslator, group_queries_by_language
 
 ISO_639_1_TO_MBart50 = {
 
@@ -56,6 +56,9 @@ class MBart50Translator(OfflineTranslator):
     
     _TRANSLATOR_MODEL = "facebook/mbart-large-50-many-to-many-mmt"
 
+    # 单次 generate 的最大句数
+    _BATCH_SIZE = 16
+
 
 
     async def _load(self, from_lang: str, to_lang: str, device: str):
@@ -86,29 +89,37 @@ class MBart50Translator(OfflineTranslator):
             else:
                 from_lang = target_lang
 
-        return [self._translate_sentence(from_lang, to_lang, query) for query in queries]
-
-    def _translate_sentence(self, from_lang: str, to_lang: str, query: str) -> str:
-
         if not self.is_loaded():
-            return ''
-
-        if from_lang == 'auto':
-            detected_lang = langid.classify(query)[0]
-            from_lang = self._map_detected_lang_to_translator(detected_lang)
-
-        if from_lang == None:
-            self.logger.warn(f'MBart50 Translation Failed. Could not detect language (Or language not supported for text: {query})')
-            return ''
-        
-        self.tokenizer.src_lang = from_lang 
-        tokens = self.tokenizer(query, return_tensors="pt")
-        # move to device
-        if self.device != 'cpu':
-            tokens = tokens.to(self.device)
-        generated_tokens = self.model.generate(**tokens, forced_bos_token_id=self.tokenizer.lang_code_to_id[to_lang])
-        result = self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
-        return result
+            return [''] * len(queries)
+
+        # 源语言相同的句子合并成批量翻译
+        results = [''] * len(queries)
+        groups = group_queries_by_language(queries, from_lang, lambda query: self._map_detected_lang_to_translator(langid.classify(query)[0]))
+        for lang, indices in groups.items():
+            if lang == None:
+                for i in indices:
+                    self.logger.warn(f'MBart50 Translation Failed. Could not detect language (Or language not supported for text: {queries[i]})')
+                continue
+            translations = self._translate_sentences(lang, to_lang, [queries[i] for i in indices])
+            for i, translation in zip(indices, translations):
+                results[i] = translation
+        return results
+
+    def _translate_sentences(self, from_lang: str, to_lang: str, queries: list[str]) -> list[str]:
+        import torch
+
+        self.tokenizer.src_lang = from_lang
+        results = []
+        for start in range(0, len(queries), self._BATCH_SIZE):
+            # 同一批次 padding 到相同长度，attention_mask 屏蔽 padding
+            tokens = self.tokenizer(queries[start:start + self._BATCH_SIZE], return_tensors="pt", padding=True)
+            # move to device
+            if self.device != 'cpu':
+                tokens = tokens.to(self.device)
+            with torch.no_grad():
+                generated_tokens = self.model.generate(**tokens, forced_bos_token_id=self.tokenizer.lang_code_to_id[to_lang])
+            results.extend(self.tokenizer.batch_decode(generated_tokens, skip_special_tokens=True))
+        return results
 
     def _map_detected_lang_to_translator(self, lang):
         if lang not in ISO_639_1_TO_MBart50:
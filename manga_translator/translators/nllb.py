@@ -2,7 +2,7 @@ import os
 from typing import List
 import py3langid as langid
 
-from .common import OfflineTranslator
+from .common import OfflineTranslator, group_queries_by_language
 
 # https://github.com/facebookresearch/flores/blob/main/flores200/README.md
 ISO_639_1_TO_FLORES_200 = {
@@ -61,6 +61,9 @@ class NLLBTranslator(OfflineTranslator):
     _MODEL_SUB_DIR = os.path.join(OfflineTranslator._MODEL_DIR, OfflineTranslator._MODEL_SUB_DIR, 'nllb')
     _TRANSLATOR_MODEL = 'facebook/nllb-200-distilled-600M'
 
+    # 单次 generate 的最大句数（pipeline 会把同一批次内的句子 padding 到相同长度）
+    _BATCH_SIZE = 16
+
     async def _load(self, from_lang: str, to_lang: str, device: str):
         from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 
@@ -69,8 +72,10 @@ class NLLBTranslator(OfflineTranslator):
         self.device = device
         self.model = AutoModelForSeq2SeqLM.from_pretrained(self._TRANSLATOR_MODEL)
         self.tokenizer = AutoTokenizer.from_pretrained(self._TRANSLATOR_MODEL)
+        self._pipelines = {}
 
     async def _unload(self):
+        del self._pipelines
         del self.model
         del self.tokenizer
 
@@ -84,33 +89,42 @@ class NLLBTranslator(OfflineTranslator):
             else:
                 from_lang = target_lang
 
-        return [self._translate_sentence(from_lang, to_lang, query) for query in queries]
-
-    def _translate_sentence(self, from_lang: str, to_lang: str, query: str) -> str:
-        from transformers import pipeline
-
         if not self.is_loaded():
-            return ''
-
-        if from_lang == 'auto':
-            detected_lang = langid.classify(query)[0]
-            from_lang = self._map_detected_lang_to_translator(detected_lang)
-
-        if from_lang == None:
-            self.logger.warn(f'NLLB Translation Failed. Could not detect language (Or language not supported for text: {query})')
-            return ''
-
-        translator = pipeline('translation',
-            device=self.device,
-            model=self.model,
-            tokenizer=self.tokenizer,
-            src_lang=from_lang,
-            tgt_lang=to_lang,
-            max_length = 512,
-        )
-
-        result = translator(query)[0]['translation_text']
-        return result
+            return [''] * len(queries)
+
+        # 源语言相同的句子合并成批量翻译
+        results = [''] * len(queries)
+        groups = group_queries_by_language(queries, from_lang, lambda query: self._map_detected_lang_to_translator(langid.classify(query)[0]))
+        for lang, indices in groups.items():
+            if lang == None:
+                for i in indices:
+                    self.logger.warn(f'NLLB Translation Failed. Could not detect language (Or language not supported for text: {queries[i]})')
+                continue
+            translations = self._translate_sentences(lang, to_lang, [queries[i] for i in indices])
+            for i, translation in zip(indices, translations):
+                results[i] = translation
+        return results
+
+    def _get_pipeline(self, from_lang: str, to_lang: str):
+        """按 (源语言, 目标语言, 设备) 缓存 pipeline，避免每句重新构建"""
+        key = (from_lang, to_lang, self.device)
+        if key not in self._pipelines:
+            from transformers import pipeline
+
+            self._pipelines[key] = pipeline('translation',
+                device=self.device,
+                model=self.model,
+                tokenizer=self.tokenizer,
+                src_lang=from_lang,
+                tgt_lang=to_lang,
+                max_length = 512,
+            )
+        return self._pipelines[key]
+
+    def _translate_sentences(self, from_lang: str, to_lang: str, queries: List[str]) -> List[str]:
+        translator = self._get_pipeline(from_lang, to_lang)
+        outputs = translator(queries, batch_size=self._BATCH_SIZE)
+        return [output['translation_text'] for output in outputs]
 
     def _map_detected_lang_to_translator(self, lang):
         if not lang in ISO_639_1_TO_FLORES_200:
@@ -38,9 +38,11 @@ class OpenAITranslator(CommonTranslator):
     支持批量文本翻译，不包含图片处理
     """
     _LANGUAGE_CODE_MAP = VALID_LANGUAGES
+    # 提示词按序号对应 ctx 中的区域/图片，翻译记忆只在整批命中时跳过请求
+    _TRANSLATION_MEMORY_PARTIAL_HITS = False
     
-    # 类变量: 跨实例共享的RPM限制时间戳
-    _GLOBAL_LAST_REQUEST_TS = {}  # {model_name: timestamp}
+    # 每次 API 请求单独限流（限流器按翻译器、模型和 API Key 跨实例共享）
+    _RATE_LIMIT_PER_REQUEST = True
     
     def __init__(self):
         super().__init__()
@@ -55,10 +57,6 @@ class OpenAITranslator(CommonTranslator):
         self.max_tokens = 8000  # 设置为8000，避免超过API限制
         self.temperature = 0.1
         self._MAX_REQUESTS_PER_MINUTE = 0  # 默认无限制
-        # 使用全局时间戳,跨实例共享
-        if self.model not in OpenAITranslator._GLOBAL_LAST_REQUEST_TS:
-            OpenAITranslator._GLOBAL_LAST_REQUEST_TS[self.model] = 0
-        self._last_request_ts_key = self.model
         self._setup_client()
     
     def set_prev_context(self, context: str):
@@ -72,6 +70,8 @@ class OpenAITranslator(CommonTranslator):
         if max_rpm > 0:
             self._MAX_REQUESTS_PER_MINUTE = max_rpm
             self.logger.info(f"Setting OpenAI max requests per minute to: {max_rpm}")
+        # 最大并发请求数（0 = 不限制）
+        self._MAX_CONCURRENT_REQUESTS = getattr(args, 'max_concurrent_requests', 0)
     
     def _setup_client(self):
         """设置OpenAI客户端"""
@@ -199,11 +199,11 @@ This is an incorrect response because it includes extra text and explanations.
         final_prompt += base_prompt
         return final_prompt
 
-    def _build_user_prompt(self, texts: List[str], ctx: Any) -> str:
+    def _build_user_prompt(self, texts: List[str], ctx: Any, batch_indices: List[int] = None) -> str:
         """构建用户提示词（纯文本版）- 使用统一方法"""
-        return self._build_user_prompt_for_texts(texts, ctx, self.prev_context)
+        return self._build_user_prompt_for_texts(texts, ctx, self.prev_context, batch_indices)
 
-    async def _translate_batch(self, texts: List[str], source_lang: str, target_lang: str, custom_prompt_json: Dict[str, Any] = None, line_break_prompt_json: Dict[str, Any] = None, ctx: Any = None, split_level: int = 0) -> List[str]:
+    async def _translate_batch(self, texts: List[str], source_lang: str, target_lang: str, custom_prompt_json: Dict[str, Any] = None, line_break_prompt_json: Dict[str, Any] = None, ctx: Any = None, split_level: int = 0, batch_indices: List[int] = None) -> List[str]:
         """批量翻译方法（纯文本）"""
         if not texts:
             return []
@@ -213,7 +213,7 @@ This is an incorrect response because it includes extra text and explanations.
         
         # 构建消息
         system_prompt = self._build_system_prompt(source_lang, target_lang, custom_prompt_json=custom_prompt_json, line_break_prompt_json=line_break_prompt_json)
-        user_prompt = self._build_user_prompt(texts, ctx)
+        user_prompt = self._build_user_prompt(texts, ctx, batch_indices)
 
         # Combine system and user prompts into a single user message
         combined_prompt_text = system_prompt + "\n\n" + user_prompt
@@ -244,27 +244,14 @@ This is an incorrect response because it includes extra text and explanations.
                 raise self.SplitException(local_attempt, texts)
 
             try:
-                # RPM限制
-                if self._MAX_REQUESTS_PER_MINUTE > 0:
-                    import time
-                    now = time.time()
-                    delay = 60.0 / self._MAX_REQUESTS_PER_MINUTE
-                    elapsed = now - OpenAITranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key]
-                    if elapsed < delay:
-                        sleep_time = delay - elapsed
-                        self.logger.info(f'Ratelimit sleep: {sleep_time:.2f}s')
-                        await asyncio.sleep(sleep_time)
-                
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature
-                )
-                
-                # 在API调用成功后立即更新时间戳，确保所有请求（包括重试）都被计入速率限制
-                if self._MAX_REQUESTS_PER_MINUTE > 0:
-                    OpenAITranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key] = time.time()
+                # RPM / 并发限制（同一翻译器和 API Key 的实例共享，429 时自动退避）
+                async with self._rate_limited():
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=self.max_tokens,
+                        temperature=self.temperature
+                    )
 
                 # 检查成功条件
                 if response.choices and response.choices[0].message.content and response.choices[0].finish_reason != 'content_filter':
@@ -315,7 +302,7 @@ This is an incorrect response because it includes extra text and explanations.
                     self.logger.info("---------------------------")
 
                     # BR检查：检查翻译结果是否包含必要的[BR]标记
-                    if not self._validate_br_markers(translations, queries=texts, ctx=ctx):
+                    if not self._validate_br_markers(translations, queries=texts, ctx=ctx, batch_indices=batch_indices):
                         attempt += 1
                         log_attempt = f"{attempt}/{max_retries}" if not is_infinite else f"Attempt {attempt}"
                         self.logger.warning(f"[{log_attempt}] BR markers missing, retrying...")
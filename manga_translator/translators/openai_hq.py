@@ -1,17 +1,15 @@
 import os
 import re
 import asyncio
-import base64
 import json
 import logging
-from io import BytesIO
 from typing import List, Dict, Any
-from PIL import Image
 import openai
 from openai import AsyncOpenAI
 
 from .common import CommonTranslator, VALID_LANGUAGES
 from .keys import OPENAI_API_KEY, OPENAI_MODEL
+from .image_encoding import encode_image_base64
 from ..utils import Context
 
 # 禁用openai库的DEBUG日志,避免打印base64图片数据
@@ -19,44 +17,9 @@ logging.getLogger("openai").setLevel(logging.WARNING)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 
-def encode_image_for_openai(image, max_size=1024):
-    """将图片编码为base64格式，适合OpenAI API"""
-    # 转换图片格式为RGB（处理所有可能的图片模式）
-    if image.mode == "P":
-        # 调色板模式：转换为RGBA（如果有透明度）或RGB
-        image = image.convert("RGBA" if "transparency" in image.info else "RGB")
-
-    if image.mode == "RGBA":
-        # RGBA模式：创建白色背景并合并透明通道
-        background = Image.new('RGB', image.size, (255, 255, 255))
-        background.paste(image, mask=image.split()[-1])
-        image = background
-    elif image.mode in ("LA", "L", "1", "CMYK"):
-        # LA（灰度+透明）、L（灰度）、1（二值）、CMYK：统一转换为RGB
-        if image.mode == "LA":
-            # 灰度+透明：先转RGBA再合并到白色背景
-            image = image.convert("RGBA")
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            background.paste(image, mask=image.split()[-1])
-            image = background
-        else:
-            # 其他模式：直接转RGB
-            image = image.convert("RGB")
-    elif image.mode != "RGB":
-        # 其他未知模式：强制转换为RGB
-        image = image.convert("RGB")
-
-    # 调整图片大小
-    w, h = image.size
-    if max(w, h) > max_size:
-        scale = max_size / max(w, h)
-        new_w, new_h = int(w * scale), int(h * scale)
-        image = image.resize((new_w, new_h), Image.LANCZOS)
-
-    # 编码为base64（使用PNG格式确保质量和兼容性）
-    buf = BytesIO()
-    image.save(buf, format="PNG")
-    return base64.b64encode(buf.getvalue()).decode('utf-8')
+def encode_image_for_openai(image, max_size=1024, image_format='png', quality=90):
+    """将图片编码为base64格式，适合OpenAI API，返回 (base64, MIME 类型)（结果按图片内容缓存）"""
+    return encode_image_base64(image, max_size, image_format, quality)
 
 
 def _flatten_prompt_data(data: Any, indent: int = 0) -> str:
@@ -86,9 +49,13 @@ class OpenAIHighQualityTranslator(CommonTranslator):
     支持多图片批量处理，提供文本框顺序、原文和原图给AI进行更精准的翻译
     """
     _LANGUAGE_CODE_MAP = VALID_LANGUAGES
+    # 提示词按序号对应 ctx 中的区域/图片，翻译记忆只在整批命中时跳过请求
+    _TRANSLATION_MEMORY_PARTIAL_HITS = False
     
-    # 类变量: 跨实例共享的RPM限制时间戳
-    _GLOBAL_LAST_REQUEST_TS = {}  # {model_name: timestamp}
+    # 每次 API 请求单独限流（限流器按翻译器、模型和 API Key 跨实例共享）
+    _RATE_LIMIT_PER_REQUEST = True
+    # 提示词由整批图片（batch_data）构建，不按 texts 预先切块
+    _ADAPTIVE_BATCH_SIZE = False
     
     def __init__(self):
         super().__init__()
@@ -103,10 +70,8 @@ class OpenAIHighQualityTranslator(CommonTranslator):
         self.max_tokens = 25000
         self.temperature = 0.1
         self._MAX_REQUESTS_PER_MINUTE = 0  # 默认无限制
-        # 使用全局时间戳,跨实例共享
-        if self.model not in OpenAIHighQualityTranslator._GLOBAL_LAST_REQUEST_TS:
-            OpenAIHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self.model] = 0
-        self._last_request_ts_key = self.model
+        self.image_format = 'png'  # 发送给模型的图片编码格式
+        self.image_quality = 90
         self._setup_client()
     
     def set_prev_context(self, context: str):
@@ -120,6 +85,11 @@ class OpenAIHighQualityTranslator(CommonTranslator):
         if max_rpm > 0:
             self._MAX_REQUESTS_PER_MINUTE = max_rpm
             self.logger.info(f"Setting OpenAI HQ max requests per minute to: {max_rpm}")
+        # 最大并发请求数（0 = 不限制）
+        self._MAX_CONCURRENT_REQUESTS = getattr(args, 'max_concurrent_requests', 0)
+        # 图片编码格式和质量（jpeg / webp 比 png 小得多）
+        self.image_format = str(getattr(args, 'hq_image_format', 'png') or 'png')
+        self.image_quality = getattr(args, 'hq_image_quality', 90)
     
     def _setup_client(self):
         """设置OpenAI客户端"""
@@ -268,10 +238,10 @@ This is an incorrect response because it includes extra text and explanations.
         image_contents = []
         for data in batch_data:
             image = data['image']
-            base64_img = encode_image_for_openai(image)
+            base64_img, mime_type = encode_image_for_openai(image, image_format=self.image_format, quality=self.image_quality)
             image_contents.append({
                 "type": "image_url",
-                "image_url": {"url": f"data:image/png;base64,{base64_img}"}
+                "image_url": {"url": f"data:{mime_type};base64,{base64_img}"}
             })
         
         # 构建消息
@@ -311,27 +281,14 @@ This is an incorrect response because it includes extra text and explanations.
                 raise self.SplitException(local_attempt, texts)
 
             try:
-                # RPM限制
-                if self._MAX_REQUESTS_PER_MINUTE > 0:
-                    import time
-                    now = time.time()
-                    delay = 60.0 / self._MAX_REQUESTS_PER_MINUTE
-                    elapsed = now - OpenAIHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key]
-                    if elapsed < delay:
-                        sleep_time = delay - elapsed
-                        self.logger.info(f'Ratelimit sleep: {sleep_time:.2f}s')
-                        await asyncio.sleep(sleep_time)
-                
-                response = await self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    max_tokens=self.max_tokens,
-                    temperature=self.temperature
-                )
-                
-                # 在API调用成功后立即更新时间戳，确保所有请求（包括重试）都被计入速率限制
-                if self._MAX_REQUESTS_PER_MINUTE > 0:
-                    OpenAIHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key] = time.time()
+                # RPM / 并发限制（同一翻译器和 API Key 的实例共享，429 时自动退避）
+                async with self._rate_limited():
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=self.max_tokens,
+                        temperature=self.temperature
+                    )
 
                 # 检查成功条件
                 if response.choices and response.choices[0].message.content and response.choices[0].finish_reason != 'content_filter':
@@ -509,27 +466,14 @@ This is an incorrect response because it includes extra text and explanations.
         try:
             simple_prompt = f"Translate the following {from_lang} text to {to_lang}. Provide only the translation:\n\n" + "\n".join(queries)
             
-            # RPM限制
-            if self._MAX_REQUESTS_PER_MINUTE > 0:
-                import time
-                now = time.time()
-                delay = 60.0 / self._MAX_REQUESTS_PER_MINUTE
-                elapsed = now - OpenAIHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key]
-                if elapsed < delay:
-                    sleep_time = delay - elapsed
-                    self.logger.info(f'Ratelimit sleep: {sleep_time:.2f}s')
-                    await asyncio.sleep(sleep_time)
-            
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": simple_prompt}],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature
-            )
-            
-            # 在API调用成功后立即更新时间戳，确保所有请求（包括重试）都被计入速率限制
-            if self._MAX_REQUESTS_PER_MINUTE > 0:
-                OpenAIHighQualityTranslator._GLOBAL_LAST_REQUEST_TS[self._last_request_ts_key] = time.time()
+            # RPM / 并发限制（同一翻译器和 API Key 的实例共享，429 时自动退避）
+            async with self._rate_limited():
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": simple_prompt}],
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature
+                )
             
             if response.choices and response.choices[0].message.content:
                 result = response.choices[0].message.content.strip()
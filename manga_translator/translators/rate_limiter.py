@@ -0,0 +1,238 @@
+"""
+翻译 API 请求限流器
+
+- 令牌桶：按每分钟请求数匀速补充令牌，桶容量允许短时间突发（默认 10 秒的配额）；
+- 信号量：限制同时进行中的请求数；
+- 429 / Retry-After：暂停发放令牌直到服务端要求的时间，并把速率临时减半，
+  之后每次成功请求逐步恢复到配置值（AIMD）；
+- 统计排队等待时间，便于判断瓶颈在限流还是在服务端。
+
+同一 (翻译器, API Key) 的所有翻译器实例共享一个限流器。
+"""
+import asyncio
+import hashlib
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from ..utils import get_logger
+
+logger = get_logger('RateLimiter')
+
+# 令牌桶容量对应的秒数（允许的突发请求数 = 每秒速率 * BURST_SECONDS）
+BURST_SECONDS = 10
+# 未给出 Retry-After 时的退避时间（秒），连续限流时翻倍
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 60.0
+# 每次限流后速率乘以该系数，每次成功请求恢复 RATE_RECOVERY（占配置速率的比例）
+RATE_DECREASE = 0.5
+RATE_RECOVERY = 0.05
+MIN_RATE_SCALE = 0.1
+
+
+@dataclass
+class RateLimiterStats:
+    requests: int = 0
+    rate_limited: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    in_flight: int = 0
+    queued: int = 0
+
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+class RateLimiter:
+    def __init__(self, name: str, requests_per_minute: float = 0, max_concurrency: int = 0):
+        """
+        Args:
+            name: 日志中显示的名称
+            requests_per_minute: 每分钟最大请求数，<= 0 表示不限速（仍会响应 429 退避）
+            max_concurrency: 最大并发请求数，<= 0 表示不限制
+        """
+        self.name = name
+        self.stats = RateLimiterStats()
+        self._rate_scale = 1.0
+        self._consecutive_limited = 0
+        self._blocked_until = 0.0
+        self._loop = None
+        self._lock = None
+        self._semaphore = None
+        self._concurrency = 0
+        self.configure(requests_per_minute, max_concurrency)
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+
+    def configure(self, requests_per_minute: float, max_concurrency: int):
+        self.requests_per_minute = max(requests_per_minute or 0, 0)
+        self.max_concurrency = max(max_concurrency or 0, 0)
+        self._capacity = max(1.0, self.requests_per_minute / 60 * BURST_SECONDS)
+        if hasattr(self, '_tokens'):
+            self._tokens = min(self._tokens, self._capacity)
+
+    @property
+    def current_rate(self) -> float:
+        """当前生效的每分钟请求数（429 后会临时降低）"""
+        return self.requests_per_minute * self._rate_scale
+
+    def _ensure_primitives(self):
+        # asyncio 原语绑定事件循环；界面每次任务可能在新的事件循环中运行
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._concurrency != self.max_concurrency:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._concurrency = self.max_concurrency
+            self._semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency > 0 else None
+
+    def _refill(self, now: float):
+        rate = self.current_rate / 60
+        self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * rate)
+        self._last_refill = now
+
+    async def _take_token(self):
+        # 加锁保证等待者按先来先得的顺序拿到令牌
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                if self.requests_per_minute <= 0:
+                    return
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / (self.current_rate / 60))
+
+    @asynccontextmanager
+    async def limit(self):
+        """
+        包住一次 API 请求：先等并发名额，再等令牌。
+        请求抛出限流异常时自动退避，正常结束时逐步恢复速率。
+        """
+        self._ensure_primitives()
+        semaphore = self._semaphore
+        start = time.monotonic()
+        self.stats.queued += 1
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                await self._take_token()
+            except BaseException:
+                if semaphore is not None:
+                    semaphore.release()
+                raise
+        finally:
+            self.stats.queued -= 1
+        wait = time.monotonic() - start
+        self.stats.requests += 1
+        self.stats.total_wait += wait
+        self.stats.max_wait = max(self.stats.max_wait, wait)
+        if wait >= 1:
+            logger.info(f'[{self.name}] Ratelimit wait: {wait:.2f}s ({self.stats.in_flight} in flight, {self.stats.queued} queued)')
+        self.stats.in_flight += 1
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.on_rate_limited(extract_retry_after(e))
+            raise
+        else:
+            self.on_success()
+        finally:
+            self.stats.in_flight -= 1
+            if semaphore is not None:
+                semaphore.release()
+
+    def on_success(self):
+        self._consecutive_limited = 0
+        if self._rate_scale < 1.0:
+            self._rate_scale = min(1.0, self._rate_scale + RATE_RECOVERY)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """收到 429 时调用：暂停发放令牌并临时降低速率"""
+        self.stats.rate_limited += 1
+        self._consecutive_limited += 1
+        if retry_after is None:
+            retry_after = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self._consecutive_limited - 1))
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + retry_after)
+        self._rate_scale = max(MIN_RATE_SCALE, self._rate_scale * RATE_DECREASE)
+        self._tokens = 0
+        self._last_refill = now
+        logger.warning(
+            f'[{self.name}] Rate limited by server, pausing {retry_after:.1f}s'
+            + (f', rate reduced to {self.current_rate:.1f}/min' if self.requests_per_minute > 0 else '')
+        )
+
+    def summary(self) -> str:
+        stats = self.stats
+        return (f'[{self.name}] requests={stats.requests}, rate_limited={stats.rate_limited}, '
+                f'avg_wait={stats.avg_wait:.2f}s, max_wait={stats.max_wait:.2f}s, '
+                f'rate={self.current_rate:.1f}/min, concurrency={self.max_concurrency or "unlimited"}')
+
+
+_RETRY_AFTER_PATTERNS = (
+    re.compile(r'retry[ _-]?after\D{0,5}(\d+(?:\.\d+)?)', re.IGNORECASE),
+    re.compile(r'retry[_ ]?delay\D{0,20}(\d+(?:\.\d+)?)\s*s', re.IGNORECASE),
+    re.compile(r'retry_delay\s*\{\s*seconds:\s*(\d+)', re.IGNORECASE),
+    re.compile(r'try again in (\d+(?:\.\d+)?)\s*s', re.IGNORECASE),
+)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """判断异常是否为服务端限流（HTTP 429 / RESOURCE_EXHAUSTED）"""
+    for attr in ('status_code', 'code', 'status'):
+        value = getattr(error, attr, None)
+        try:
+            if int(value) == 429:
+                return True
+        except (TypeError, ValueError):
+            pass
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    name = type(error).__name__
+    return 'RateLimit' in name or 'ResourceExhausted' in name or 'RESOURCE_EXHAUSTED' in str(error)
+
+
+def extract_retry_after(error: BaseException) -> Optional[float]:
+    """从异常的响应头（Retry-After / retry-after-ms）或错误信息中取出服务端要求的等待秒数"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers:
+        try:
+            if headers.get('retry-after-ms'):
+                return float(headers['retry-after-ms']) / 1000
+            if headers.get('retry-after'):
+                return float(headers['retry-after'])
+        except (TypeError, ValueError):
+            pass
+    message = str(error)
+    for pattern in _RETRY_AFTER_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+
+
+def get_rate_limiter(translator_key: str, api_key: Optional[str], requests_per_minute: float = 0, max_concurrency: int = 0) -> RateLimiter:
+    """返回 (翻译器, API Key) 共享的限流器，并更新为当前配置"""
+    key_hash = hashlib.sha1(api_key.encode('utf-8')).hexdigest()[:8] if api_key else ''
+    key = (translator_key, key_hash)
+    limiter = _limiters.get(key)
+    if limiter is None:
+        limiter = RateLimiter(translator_key, requests_per_minute, max_concurrency)
+        _limiters[key] = limiter
+    elif limiter.requests_per_minute != max(requests_per_minute or 0, 0) or limiter.max_concurrency != max(max_concurrency or 0, 0):
+        limiter.configure(requests_per_minute, max_concurrency)
+    return limiter
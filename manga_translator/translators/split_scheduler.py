@@ -0,0 +1,124 @@
+"""
+分割重试调度（CommonTranslator._translate_with_split 使用）
+
+- 批次在同一层级重试 _SPLIT_THRESHOLD 次仍失败时一分为二，两半并发请求（并发和速率由限流器控制），
+  任意一半最终失败时取消其余请求，不再把整批串行重做一遍；
+- 按翻译器记住能成功的批次大小：批次需要分割时把建议大小降为一半（或最近成功过的大小），之后的批次直接按建议大小切块并发发送；
+  在建议大小上连续成功若干次后逐步放大，恢复到曾失败的大小时取消限制；
+- 统计每次翻译的请求、重试和分割次数。
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Dict, List, Optional
+
+from ..utils import get_logger
+
+logger = get_logger('SplitScheduler')
+
+# 在建议大小上连续成功多少次后放大建议大小
+RECOVERY_SUCCESSES = 5
+# 每次放大的比例
+RECOVERY_GROWTH = 1.5
+
+
+@dataclass
+class SplitStats:
+    texts: int = 0
+    requests: int = 0
+    attempts: int = 0
+    splits: int = 0
+    pre_split_batches: int = 0
+    failures: int = 0
+    max_split_level: int = 0
+
+    @property
+    def retries(self) -> int:
+        """超出每个成功请求一次的尝试次数"""
+        return max(0, self.attempts - self.requests)
+
+    def summary(self) -> str:
+        return (f'texts={self.texts}, requests={self.requests}, attempts={self.attempts}, retries={self.retries}, '
+                f'splits={self.splits}, pre_split_batches={self.pre_split_batches}, failures={self.failures}, '
+                f'max_split_level={self.max_split_level}')
+
+
+class BatchSizeAdvisor:
+    def __init__(self, name: str):
+        self.name = name
+        self.preferred: Optional[int] = None  # None 表示不限制
+        self._failed_size: Optional[int] = None
+        self._best_success: Optional[int] = None  # 最近成功过的最大批次
+        self._successes = 0
+
+    def plan(self, size: int) -> List[int]:
+        """按建议大小把 size 个文本均匀切块，返回每块的大小"""
+        if self.preferred is None or size <= self.preferred:
+            return [size]
+        count = -(-size // self.preferred)
+        base, extra = divmod(size, count)
+        return [base + 1 if i < extra else base for i in range(count)]
+
+    def record_success(self, size: int):
+        if self._best_success is None or size > self._best_success:
+            self._best_success = size
+        if self.preferred is None or size < self.preferred:
+            return
+        self._successes += 1
+        if self._successes < RECOVERY_SUCCESSES:
+            return
+        self._successes = 0
+        grown = max(self.preferred + 1, int(self.preferred * RECOVERY_GROWTH))
+        if self._failed_size is not None and grown >= self._failed_size:
+            self.preferred = None
+            self._failed_size = None
+            logger.info(f'[{self.name}] Batch size limit lifted')
+        else:
+            self.preferred = grown
+            logger.info(f'[{self.name}] Preferred batch size increased to {grown}')
+
+    def record_split(self, size: int):
+        """size 个文本的批次在重试后仍失败、需要分割"""
+        self._successes = 0
+        if self._best_success is not None and self._best_success < size:
+            # 回到最近成功过的大小
+            target = max(self._best_success, (size + 1) // 2)
+        else:
+            self._best_success = None
+            target = max(1, (size + 1) // 2)
+        if self.preferred is None or target < self.preferred:
+            self.preferred = target
+            self._failed_size = size if self._failed_size is None else min(self._failed_size, size)
+            logger.info(f'[{self.name}] Preferred batch size reduced to {target}')
+
+
+_advisors: Dict[str, BatchSizeAdvisor] = {}
+
+
+def get_batch_size_advisor(key: str) -> BatchSizeAdvisor:
+    """返回翻译器（按翻译器与模型区分）共享的批次大小建议"""
+    advisor = _advisors.get(key)
+    if advisor is None:
+        advisor = _advisors[key] = BatchSizeAdvisor(key)
+    return advisor
+
+
+async def gather_or_cancel(coros: List[Awaitable]) -> list:
+    """
+    并发执行并按顺序返回结果；任意一个抛出异常时取消其余任务并抛出该异常。
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    for task in tasks:
+        if task in done and not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
@@ -0,0 +1,217 @@
+"""
+翻译记忆（持久化翻译缓存）
+
+以 SQLite 文件保存 “原文 -> 译文”，键由以下部分组成：
+- 规范化后的原文（NFC、去掉首尾空白、合并连续空白）
+- 翻译器类名
+- 源语言 / 目标语言
+- 模型、提示词、术语表等参数的哈希（由翻译器的 _translation_memory_scope 提供）
+
+CommonTranslator.translate 先查询翻译记忆，只有未命中的文本才会交给 _translate；
+流水线直接调用 _translate 的上下文翻译器通过 _translate_with_memory 整批查询。
+条目按写入时间做 TTL 过期，超过条目上限时按最近使用时间淘汰（写入后只在可能超限或每隔若干批时清理）。
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from ..utils import BASE_PATH, get_logger
+
+logger = get_logger('TranslationMemory')
+
+DEFAULT_MEMORY_PATH = os.path.join(BASE_PATH, 'result', 'translation_memory.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS translation_memory (
+    key TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    translation TEXT NOT NULL,
+    translator TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_translation_memory_created_at ON translation_memory (created_at);
+CREATE INDEX IF NOT EXISTS idx_translation_memory_last_used_at ON translation_memory (last_used_at);
+"""
+
+# SQLite 单条语句的参数个数上限（旧版本为 999）
+_SQL_BATCH = 500
+
+# 未超过条目上限时，每写入多少批才清理一次过期条目
+_EXPIRE_EVERY_STORES = 100
+
+
+def normalize_source_text(text: str) -> str:
+    """规范化原文：NFC、去掉首尾空白并合并连续空白（换行在翻译前也会被替换为空格）"""
+    text = unicodedata.normalize('NFC', text).replace('\ufffd', '')
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def hash_scope(scope) -> str:
+    """把提示词、术语表等影响译文的参数序列化后取哈希"""
+    data = json.dumps(scope, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class TranslationMemoryStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+class TranslationMemory:
+    def __init__(self, path: str = DEFAULT_MEMORY_PATH, ttl_days: float = 30, max_entries: int = 100000):
+        """
+        Args:
+            path: SQLite 数据库文件路径
+            ttl_days: 条目有效期（天），<= 0 表示永不过期
+            max_entries: 最大条目数，<= 0 表示不限制
+        """
+        self.path = path
+        self.ttl_days = ttl_days
+        self.max_entries = max_entries
+        self.stats = TranslationMemoryStats()
+        self._lock = threading.Lock()
+        self._row_count = 0  # 条目数上界（INSERT OR REPLACE 覆盖旧条目时偏大），evict 时校正
+        self._stores_since_evict = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+        self.evict()
+
+    @staticmethod
+    def make_key(source: str, translator: str, from_lang: str, to_lang: str, scope_hash: str) -> str:
+        data = '\x1f'.join((normalize_source_text(source), translator, from_lang, to_lang, scope_hash))
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def _expire_before(self) -> Optional[float]:
+        if self.ttl_days <= 0:
+            return None
+        return time.time() - self.ttl_days * 86400
+
+    def lookup(self, keys: Iterable[str], require_all: bool = False) -> Dict[str, str]:
+        """
+        查询一批键，返回命中的 {key: 译文}，同时更新命中统计。
+
+        require_all 为 True 时只有全部命中才返回结果，否则视为全部未命中。
+        """
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        expire_before = self._expire_before()
+        now = time.time()
+        with self._lock, self._conn:
+            for start in range(0, len(keys), _SQL_BATCH):
+                chunk = keys[start:start + _SQL_BATCH]
+                placeholders = ','.join('?' * len(chunk))
+                sql = f'SELECT key, translation FROM translation_memory WHERE key IN ({placeholders})'
+                params: List = list(chunk)
+                if expire_before is not None:
+                    sql += ' AND created_at >= ?'
+                    params.append(expire_before)
+                found.update(self._conn.execute(sql, params).fetchall())
+            if require_all and len(found) < len(keys):
+                found = {}
+            if found:
+                hit_keys = list(found)
+                for start in range(0, len(hit_keys), _SQL_BATCH):
+                    chunk = hit_keys[start:start + _SQL_BATCH]
+                    self._conn.execute(
+                        f'UPDATE translation_memory SET last_used_at = ? WHERE key IN ({",".join("?" * len(chunk))})',
+                        [now, *chunk],
+                    )
+        self.stats.hits += len(found)
+        self.stats.misses += len(keys) - len(found)
+        return found
+
+    def store(self, entries: Dict[str, tuple]):
+        """
+        写入一批译文。
+
+        Args:
+            entries: {key: (原文, 译文, 翻译器, 目标语言)}
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = [(key, source, translation, translator, to_lang, now, now)
+                for key, (source, translation, translator, to_lang) in entries.items()]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO translation_memory VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        self.stats.stores += len(rows)
+        self._row_count += len(rows)
+        self._stores_since_evict += 1
+        # 只有条目数可能超过上限或写入批次累计到一定数量时才清理，避免每批都统计整张表
+        if (self.max_entries > 0 and self._row_count > self.max_entries) or self._stores_since_evict >= _EXPIRE_EVERY_STORES:
+            self.evict()
+
+    def evict(self):
+        """删除过期条目，并在超过条目上限时按最近使用时间淘汰"""
+        expire_before = self._expire_before()
+        with self._lock, self._conn:
+            if expire_before is not None:
+                self._conn.execute('DELETE FROM translation_memory WHERE created_at < ?', (expire_before,))
+            count = self._conn.execute('SELECT COUNT(*) FROM translation_memory').fetchone()[0]
+            if 0 < self.max_entries < count:
+                self._conn.execute(
+                    'DELETE FROM translation_memory WHERE key IN '
+                    '(SELECT key FROM translation_memory ORDER BY last_used_at ASC LIMIT ?)',
+                    (count - self.max_entries,),
+                )
+                count = self.max_entries
+            self._row_count = count
+            self._stores_since_evict = 0
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM translation_memory')
+            self._row_count = 0
+
+    def reset_stats(self):
+        self.stats = TranslationMemoryStats()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_memories: Dict[str, TranslationMemory] = {}
+
+
+def get_translation_memory(translator_config) -> Optional[TranslationMemory]:
+    """根据 TranslatorConfig 返回（共享的）翻译记忆实例，未启用时返回 None"""
+    if translator_config is None or not getattr(translator_config, 'enable_translation_memory', False):
+        return None
+    path = DEFAULT_MEMORY_PATH
+    ttl_days = getattr(translator_config, 'translation_memory_ttl_days', 30)
+    max_entries = getattr(translator_config, 'translation_memory_max_entries', 100000)
+    memory = _memories.get(path)
+    if memory is None:
+        try:
+            memory = TranslationMemory(path, ttl_days, max_entries)
+        except sqlite3.Error as e:
+            logger.warning(f'无法打开翻译记忆数据库 {path}，本次不使用翻译记忆: {e}')
+            return None
+        _memories[path] = memory
+    elif memory.ttl_days != ttl_days or memory.max_entries != max_entries:
+        memory.ttl_days = ttl_days
+        memory.max_entries = max_entries
+        memory.evict()
+    return memory
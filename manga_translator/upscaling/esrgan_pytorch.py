@@ -3,7 +3,6 @@ import re
 import subprocess
 import tempfile
 import shutil
-import einops
 import tqdm
 from sys import platform
 from typing import List
@@ -20,6 +19,7 @@ import torch.nn.functional as F
 import numpy as np
 
 from .common import OfflineUpscaler
+from .tile_utils import upscale_tiled
 
 ####################
 # RRDBNet Generator
@@ -518,6 +518,14 @@ class ESRGANUpscalerPytorch(OfflineUpscaler):
     }
     _VALID_UPSCALE_RATIOS = [2, 3, 4]
 
+    def __init__(self, *args, tile_size: int = 0, **kwargs):
+        """
+        Args:
+            tile_size: 分块大小（0 = 整图处理）
+        """
+        self.tile_size = tile_size
+        super().__init__(*args, **kwargs)
+
     async def _load(self, device: str):
         super().__init__()
         os.makedirs(self.model_dir, exist_ok=True)
@@ -537,16 +545,18 @@ class ESRGANUpscalerPytorch(OfflineUpscaler):
     async def _infer(self, image_batch: List[Image.Image], upscale_ratio: float) -> List[Image.Image]:
         assert upscale_ratio <= 4
         ratio = upscale_ratio / 4
-        if image_batch :
-            batch = torch.cat([einops.rearrange(torch.from_numpy(np.array(img.convert('RGB'))[:,:,::-1].copy()).float() / 255.0, 'h w c -> 1 c h w') for img in image_batch], dim = 0).to(self.device)
-            with torch.no_grad() :
-                ret = self.model(batch)
-            ret: torch.Tensor
-            ret: List[Image.Image] = [Image.fromarray((einops.rearrange(img.clip(0, 1), 'c h w -> h w c').cpu().numpy()[:,:,::-1].copy() * 255.0).astype(np.uint8)) for img in ret]
-            ret = [img.resize(size = (int(round(img.size[0] * ratio)), int(round(img.size[1] * ratio))), resample = Image.Resampling.BILINEAR) for img in ret]
-            return ret
-        else :
-            return []
+        ret = []
+        for img in image_batch :
+            # 图片尺寸各不相同，逐张交给分块引擎（tile_size=0 时整图一次推理）
+            out = upscale_tiled(np.array(img.convert('RGB')), self._forward, 4, self.device, tile_size = self.tile_size)
+            img = Image.fromarray(out)
+            ret.append(img.resize(size = (int(round(img.size[0] * ratio)), int(round(img.size[1] * ratio))), resample = Image.Resampling.BILINEAR))
+        return ret
+
+    def _forward(self, batch: torch.Tensor) -> torch.Tensor:
+        # 模型输入输出均为 BGR
+        out = self.model(batch.flip(1)).clip(0, 1).flip(1)
+        return (out * 255.0).to(torch.uint8)
 
 def test() :
     sd = torch.load('../../models/upscaling/esrgan-pytorch/4xESRGAN.pth')
@@ -8,13 +8,12 @@ Using external tile-based processing to reduce VRAM usage
 
 import os
 import torch
-import torch.nn.functional as F
 import numpy as np
 from typing import List
 from PIL import Image
 
 from .common import OfflineUpscaler
-from .tile_utils import split_image_into_tiles, merge_tiles_into_image
+from .tile_utils import DEFAULT_TILE_OVERLAP, plan_tiles, upscale_tiled
 from ..utils import get_logger
 
 
@@ -214,42 +213,32 @@ class RealCUGANUpscaler(OfflineUpscaler):
         for img in image_batch:
             # Use tiling only if tile_size > 0
             if self.tile_size > 0:
-                output_img = self._process_with_tiles(img, device, self.tile_size)
+                tiles = plan_tiles(img.size[0], img.size[1], self.tile_size, DEFAULT_TILE_OVERLAP)
+                logger.info(f'Split image ({img.size[0]}x{img.size[1]}) into {len(tiles)} tiles (tile_size={self.tile_size})')
             else:
                 logger.info('Processing full image without tiling')
-                output_img = self._process_single(img, device)
-            
+            output_np = upscale_tiled(
+                self._to_rgb_array(img),
+                self._forward,
+                self.scale,
+                device,
+                tile_size=self.tile_size,
+                min_tile_size=self._MIN_INPUT_SIZE,
+            )
+            output_img = Image.fromarray(output_np, mode='RGB')
+            if self.tile_size > 0:
+                logger.info(f'Merged tiles into final image: {output_img.size[0]}x{output_img.size[1]} (scale={self.scale}x)')
             results.append(output_img)
         
         return results
     
-    def _process_single(self, img: Image.Image, device: torch.device) -> Image.Image:
-        """Process a single image without tiling"""
-        # Check minimum size requirement for RealCUGAN
-        # RealCUGAN uses padding=18/14/19 and then crops -20, requires minimum dimensions
-        min_size = 40  # Minimum size to allow padding and cropping
-        original_size = img.size
-        padded = False
-        
-        if img.size[0] < min_size or img.size[1] < min_size:
-            logger.warning(
-                f'Image size ({img.size[0]}x{img.size[1]}) is too small for RealCUGAN. '
-                f'Minimum size is {min_size}x{min_size}. '
-                f'Adding black padding to reach minimum size.'
-            )
-            # Calculate padding needed
-            pad_w = max(0, min_size - img.size[0])
-            pad_h = max(0, min_size - img.size[1])
-            
-            # Create new image with black background
-            new_size = (img.size[0] + pad_w, img.size[1] + pad_h)
-            padded_img = Image.new('RGB', new_size, (0, 0, 0))
-            
-            # Paste original image in top-left corner
-            padded_img.paste(img, (0, 0))
-            img = padded_img
-            padded = True
-        
+    # RealCUGAN uses padding=18/14/19 and then crops -20, requires minimum dimensions;
+    # smaller tiles are padded with black and cropped back after upscaling
+    _MIN_INPUT_SIZE = 40
+    
+    @staticmethod
+    def _to_rgb_array(img: Image.Image) -> np.ndarray:
+        """Convert a PIL image to an (H, W, 3) uint8 RGB array"""
         # Convert grayscale to RGB if necessary
         if img.mode in ('L', 'LA'):
             img = img.convert('RGB')
@@ -259,16 +248,16 @@ class RealCUGANUpscaler(OfflineUpscaler):
             rgb.paste(img, mask=img.split()[3])  # Use alpha channel as mask
             img = rgb
         
-        # Convert to tensor
-        np_img = np.array(img).astype(np.float32) / 255.0
+        np_img = np.array(img)
         
-        # Ensure 3D tensor (H, W, C)
+        # Ensure 3D array (H, W, C)
         if len(np_img.shape) == 2:
             # Grayscale: expand to 3 channels
             np_img = np.stack([np_img] * 3, axis=2)
-        
-        tensor = torch.from_numpy(np_img).permute(2, 0, 1).unsqueeze(0).to(device)
-        
+        return np.ascontiguousarray(np_img[:, :, :3], dtype=np.uint8)
+    
+    def _forward(self, tensor: torch.Tensor) -> torch.Tensor:
+        """Upscale a (B, 3, H, W) float batch in [0, 1], returns uint8"""
         # Determine model parameters
         is_pro = '-pro' in self.model_name
         
@@ -283,55 +272,15 @@ class RealCUGANUpscaler(OfflineUpscaler):
             alpha = 1.0  # Default/conservative/no-denoise
         
         # Inference (tile_mode=0 means no internal tiling)
-        with torch.no_grad():
-            output = self.model(
-                tensor,
-                tile_mode=0,      # No internal tiling (we handle it externally)
-                cache_mode=0,     # No caching
-                alpha=alpha,      # Denoise strength
-                pro=is_pro        # PRO model flag
-            )
-        
-        # Convert back to PIL (output is already uint8 from model)
-        if output.dtype == torch.uint8:
-            output_np = output.squeeze(0).permute(1, 2, 0).cpu().numpy()
-        else:
-            output_np = output.squeeze(0).permute(1, 2, 0).cpu().numpy()
-            output_np = np.clip(output_np, 0, 255).astype(np.uint8)
-        
-        result_img = Image.fromarray(output_np, mode='RGB')
-        
-        # If image was padded, crop back to original scaled size
-        if padded:
-            # Calculate the original region after upscaling
-            scaled_width = original_size[0] * self.scale
-            scaled_height = original_size[1] * self.scale
-            result_img = result_img.crop((0, 0, scaled_width, scaled_height))
-            logger.info(f'Cropped upscaled image from {output_np.shape[1]}x{output_np.shape[0]} to {scaled_width}x{scaled_height}')
-        
-        return result_img
-    
-    def _process_with_tiles(self, img: Image.Image, device: torch.device, tile_size: int) -> Image.Image:
-        """Process image with external tiling"""
-        # Split into tiles
-        tiles_with_pos = split_image_into_tiles(img, tile_size, overlap=16)
-        
-        logger.info(f'Split image ({img.size[0]}x{img.size[1]}) into {len(tiles_with_pos)} tiles (tile_size={tile_size})')
-        
-        # Process each tile
-        processed_tiles = []
-        for i, (tile, pos) in enumerate(tiles_with_pos):
-            processed_tile = self._process_single(tile, device)
-            processed_tiles.append((processed_tile, pos))
-        
-        # Merge tiles
-        output_img = merge_tiles_into_image(
-            processed_tiles,
-            img.size,
-            self.scale,
-            overlap=16
+        output = self.model(
+            tensor,
+            tile_mode=0,      # No internal tiling (we handle it externally)
+            cache_mode=0,     # No caching
+            alpha=alpha,      # Denoise strength
+            pro=is_pro        # PRO model flag
         )
         
-        logger.info(f'Merged tiles into final image: {output_img.size[0]}x{output_img.size[1]} (scale={self.scale}x)')
-        
-        return output_img
+        # Output is already uint8 from model
+        if output.dtype != torch.uint8:
+            output = output.clamp(0, 255).to(torch.uint8)
+        return output
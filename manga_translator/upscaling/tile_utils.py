@@ -1,12 +1,81 @@
 """
 Tile-based image processing utilities for upscaling
 Simple external tiling to reduce memory usage
+
+`upscale_tiled` is the shared tiling engine used by the PyTorch upscalers:
+- tiles of the same (padded) size are stacked and upscaled in one forward pass;
+- on CUDA the next batch is copied host-to-device on a side stream (from pinned memory) while the current one computes;
+- on CPU builds batches can be spread over a small thread pool;
+- results are written straight into one preallocated output array instead of being merged from PIL tiles.
+Tile positions and crop/paste rules are the same as split_image_into_tiles / merge_tiles_into_image,
+so the merged output matches the serial implementation.
 """
 
-from typing import List, Tuple
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from PIL import Image
 import numpy as np
 
+DEFAULT_TILE_OVERLAP = 16
+DEFAULT_TILE_BATCH_SIZE = 4
+
+
+def plan_tiles(width: int, height: int, tile_size: int, overlap: int = DEFAULT_TILE_OVERLAP) -> List[Tuple[int, int, int, int]]:
+    """
+    Tile positions (x, y, w, h) in row-major order, as used by split_image_into_tiles.
+    tile_size <= 0 returns the whole image as a single tile.
+    The last tile of each row/column is moved back to end at the image edge, so every tile is
+    full-size (or the whole side) and never narrower than the overlap cropped off its edges.
+    """
+    if tile_size <= 0:
+        return [(0, 0, width, height)]
+    xs = _tile_starts(width, tile_size, overlap)
+    ys = _tile_starts(height, tile_size, overlap)
+    return [(x, y, min(tile_size, width), min(tile_size, height)) for y in ys for x in xs]
+
+
+def _tile_starts(length: int, tile_size: int, overlap: int) -> List[int]:
+    starts = list(range(0, max(length - tile_size, 0) + 1, tile_size - overlap))
+    if starts[-1] + tile_size < length:
+        starts.append(length - tile_size)
+    return starts
+
+
+def tile_paste_rect(
+    position: Tuple[int, int, int, int],
+    tile_out_size: Tuple[int, int],
+    original_size: Tuple[int, int],
+    scale: int,
+    overlap: int = DEFAULT_TILE_OVERLAP
+) -> Tuple[Tuple[int, int, int, int], Tuple[int, int]]:
+    """
+    Crop box (left, top, right, bottom) inside an upscaled tile and its paste position in the output,
+    using half of the scaled overlap on each inner edge (see merge_tiles_into_image).
+    """
+    orig_x, orig_y, orig_w, orig_h = position
+    tile_w, tile_h = tile_out_size
+    orig_width, orig_height = original_size
+    output_width = orig_width * scale
+    output_height = orig_height * scale
+    half_overlap = overlap * scale // 2
+
+    # Calculate crop region - use half overlap on each side for smoother blending
+    crop_left = half_overlap if orig_x > 0 else 0
+    crop_top = half_overlap if orig_y > 0 else 0
+    crop_right = tile_w - (half_overlap if orig_x + orig_w < orig_width else 0)
+    crop_bottom = tile_h - (half_overlap if orig_y + orig_h < orig_height else 0)
+
+    # Ensure crop bounds are valid
+    crop_right = max(crop_left + 1, min(crop_right, tile_w))
+    crop_bottom = max(crop_top + 1, min(crop_bottom, tile_h))
+
+    # Ensure paste position is within bounds
+    paste_x = min(orig_x * scale + crop_left, output_width - (crop_right - crop_left))
+    paste_y = min(orig_y * scale + crop_top, output_height - (crop_bottom - crop_top))
+    return (crop_left, crop_top, crop_right, crop_bottom), (paste_x, paste_y)
+
 
 def split_image_into_tiles(
     image: Image.Image,
@@ -28,17 +97,9 @@ def split_image_into_tiles(
     width, height = image.size
     tiles = []
     
-    for y in range(0, height, tile_size - overlap):
-        for x in range(0, width, tile_size - overlap):
-            # Calculate tile bounds
-            x_end = min(x + tile_size, width)
-            y_end = min(y + tile_size, height)
-            
-            # Crop tile
-            tile = image.crop((x, y, x_end, y_end))
-            
-            # Store tile and its position
-            tiles.append((tile, (x, y, x_end - x, y_end - y)))
+    for x, y, w, h in plan_tiles(width, height, tile_size, overlap):
+        # Crop tile and store it with its position
+        tiles.append((image.crop((x, y, x + w, y + h)), (x, y, w, h)))
     
     return tiles
 
@@ -68,37 +129,166 @@ def merge_tiles_into_image(
     # Create output image with white background (to avoid black seams)
     output = Image.new('RGB', (output_width, output_height), (255, 255, 255))
     
-    scaled_overlap = overlap * scale
-    half_overlap = scaled_overlap // 2  # Use half overlap for blending
-    
-    for tile, (orig_x, orig_y, orig_w, orig_h) in tiles:
-        # Calculate position in output image
-        out_x = orig_x * scale
-        out_y = orig_y * scale
-        
-        # Calculate crop region - use half overlap on each side for smoother blending
-        crop_left = half_overlap if orig_x > 0 else 0
-        crop_top = half_overlap if orig_y > 0 else 0
-        crop_right = tile.width - (half_overlap if orig_x + orig_w < orig_width else 0)
-        crop_bottom = tile.height - (half_overlap if orig_y + orig_h < orig_height else 0)
-        
-        # Ensure crop bounds are valid
-        crop_right = max(crop_left + 1, min(crop_right, tile.width))
-        crop_bottom = max(crop_top + 1, min(crop_bottom, tile.height))
+    for tile, position in tiles:
+        (crop_left, crop_top, crop_right, crop_bottom), (paste_x, paste_y) = tile_paste_rect(
+            position, tile.size, original_size, scale, overlap
+        )
         
         # Crop overlap from tile
         cropped_tile = tile.crop((crop_left, crop_top, crop_right, crop_bottom))
         
-        # Calculate paste position
-        paste_x = out_x + crop_left
-        paste_y = out_y + crop_top
-        
-        # Ensure paste position is within bounds
-        paste_x = min(paste_x, output_width - cropped_tile.width)
-        paste_y = min(paste_y, output_height - cropped_tile.height)
-        
         # Paste into output
         output.paste(cropped_tile, (paste_x, paste_y))
     
     return output
 
+
+
+def _default_num_workers(device) -> int:
+    if getattr(device, 'type', str(device)) != 'cpu':
+        return 1
+    return max(1, min(4, (os.cpu_count() or 1) // 4))
+
+
+def _overlapping_predecessors(rects: List[Tuple[int, int, int, int]]) -> List[List[int]]:
+    """For each paste rect (x0, y0, x1, y1), the earlier rects it overlaps (they must be pasted first)."""
+    boxes = np.array(rects, dtype=np.int64).reshape(-1, 4)
+    deps = []
+    for i in range(len(boxes)):
+        earlier = boxes[:i]
+        hit = ((earlier[:, 0] < boxes[i, 2]) & (boxes[i, 0] < earlier[:, 2])
+               & (earlier[:, 1] < boxes[i, 3]) & (boxes[i, 1] < earlier[:, 3]))
+        deps.append(np.flatnonzero(hit).tolist())
+    return deps
+
+
+def upscale_tiled(
+    image: np.ndarray,
+    forward: Callable,
+    scale: int,
+    device,
+    tile_size: int = 0,
+    overlap: int = DEFAULT_TILE_OVERLAP,
+    batch_size: int = DEFAULT_TILE_BATCH_SIZE,
+    num_workers: Optional[int] = None,
+    min_tile_size: int = 0,
+) -> np.ndarray:
+    """
+    Upscale an image tile by tile with batched forward passes.
+
+    Args:
+        image: (H, W, 3) uint8 RGB image
+        forward: callable taking a (B, 3, h, w) float32 tensor in [0, 1] on `device` and returning
+            a (B, 3, h * scale, w * scale) uint8 tensor; called under torch.no_grad()
+        scale: Upscale factor of `forward`
+        device: torch device the model lives on
+        tile_size: Tile size (0 = whole image as one tile)
+        overlap: Overlap between tiles to avoid seam artifacts
+        batch_size: Maximum number of same-size tiles per forward pass
+        num_workers: Threads running forward passes concurrently (default: 1 on GPU, a few on CPU)
+        min_tile_size: Tiles smaller than this are zero-padded (bottom/right) before the forward pass
+            and cropped afterwards
+
+    Returns:
+        (H * scale, W * scale, 3) uint8 RGB image
+    """
+    import torch
+
+    height, width = image.shape[:2]
+    device = torch.device(device)
+    positions = plan_tiles(width, height, tile_size, overlap)
+
+    # Tile crops and paste rects, computed up front from the same rules as merge_tiles_into_image
+    crops, pastes = [], []
+    for position in positions:
+        crop, (paste_x, paste_y) = tile_paste_rect(position, (position[2] * scale, position[3] * scale), (width, height), scale, overlap)
+        crops.append(crop)
+        pastes.append((paste_x, paste_y, paste_x + crop[2] - crop[0], paste_y + crop[3] - crop[1]))
+    # Trailing tiles moved back to the image edge overlap their neighbours more; keep the serial "later tile wins" order there
+    deps = _overlapping_predecessors(pastes)
+
+    # Group tiles by padded shape, keeping row-major order inside each group
+    groups: Dict[Tuple[int, int], List[int]] = {}
+    for i, (x, y, w, h) in enumerate(positions):
+        groups.setdefault((max(h, min_tile_size), max(w, min_tile_size)), []).append(i)
+    batches = [(shape, indices[start:start + batch_size])
+               for shape, indices in groups.items()
+               for start in range(0, len(indices), max(1, batch_size))]
+
+    def gather(shape, indices) -> np.ndarray:
+        batch = np.zeros((len(indices), shape[0], shape[1], 3), dtype=np.uint8)
+        for b, i in enumerate(indices):
+            x, y, w, h = positions[i]
+            batch[b, :h, :w] = image[y:y + h, x:x + w]
+        return batch
+
+    def run(batch) -> np.ndarray:
+        with torch.no_grad():
+            output = forward(batch.permute(0, 3, 1, 2).float().div_(255.0))
+        return output.permute(0, 2, 3, 1).cpu().numpy()
+
+    output = np.full((height * scale, width * scale, 3), 255, dtype=np.uint8)
+    pasted = [False] * len(positions)
+    waiting: Dict[int, np.ndarray] = {}
+
+    def paste(i: int, tile: np.ndarray):
+        left, top, right, bottom = crops[i]
+        x0, y0, x1, y1 = pastes[i]
+        output[y0:y1, x0:x1] = tile[top:bottom, left:right]
+        pasted[i] = True
+
+    def commit(indices, tiles: np.ndarray):
+        for i, tile in zip(indices, tiles):
+            waiting[i] = tile
+        progressed = True
+        while progressed:
+            progressed = False
+            for i in sorted(waiting):
+                if all(pasted[j] for j in deps[i]):
+                    paste(i, waiting.pop(i))
+                    progressed = True
+
+    if num_workers is None:
+        num_workers = _default_num_workers(device)
+
+    if device.type == 'cuda':
+        # Prefetch: copy the next batch on a side stream while the current one computes
+        copy_stream = torch.cuda.Stream(device)
+
+        def upload(k):
+            host = torch.from_numpy(gather(*batches[k])).pin_memory()
+            with torch.cuda.stream(copy_stream):
+                return host.to(device, non_blocking=True)
+
+        next_batch = upload(0) if batches else None
+        for k, (_, indices) in enumerate(batches):
+            current = next_batch
+            torch.cuda.current_stream(device).wait_stream(copy_stream)
+            current.record_stream(torch.cuda.current_stream(device))
+            with torch.no_grad():
+                result = forward(current.permute(0, 3, 1, 2).float().div_(255.0))
+            if k + 1 < len(batches):
+                next_batch = upload(k + 1)
+            commit(indices, result.permute(0, 2, 3, 1).cpu().numpy())
+    elif num_workers > 1 and len(batches) > 1:
+        # CPU: run batches concurrently, splitting the intra-op threads between the workers
+        main_threads = torch.get_num_threads()
+        worker_threads = max(1, main_threads // num_workers)
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers, initializer=torch.set_num_threads, initargs=(worker_threads,)) as executor:
+                in_flight = deque()
+                for shape, indices in batches:
+                    in_flight.append((indices, executor.submit(lambda s=shape, ix=indices: run(torch.from_numpy(gather(s, ix)).to(device)))))
+                    if len(in_flight) > num_workers:
+                        done_indices, future = in_flight.popleft()
+                        commit(done_indices, future.result())
+                while in_flight:
+                    done_indices, future = in_flight.popleft()
+                    commit(done_indices, future.result())
+        finally:
+            torch.set_num_threads(main_threads)
+    else:
+        for shape, indices in batches:
+            commit(indices, run(torch.from_numpy(gather(shape, indices)).to(device)))
+
+    return output
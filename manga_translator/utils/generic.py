@@ -358,6 +358,89 @@ def resize_polygon(pts, xfact, yfact, origin='center'):
     dst_points = np.array(poly.exterior.coords[:4])
     return dst_points
 
+class slotted_cached_property(object):
+    """
+    `functools.cached_property` for classes with `__slots__`: the value is cached in the slot
+    `_<name>_cache` (which the class has to declare) instead of the instance `__dict__`.
+    Assigning or deleting the attribute overwrites or resets the cached value, like `cached_property`.
+    """
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.slot = f'_{name}_cache'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.slot)
+        except AttributeError:
+            value = self.func(instance)
+            setattr(instance, self.slot, value)
+            return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
+    def __delete__(self, instance):
+        try:
+            delattr(instance, self.slot)
+        except AttributeError:
+            pass
+
+
+@functools.lru_cache(maxsize=None)
+def _slotted_state_keys(cls) -> Tuple[Tuple[str, str], ...]:
+    """(slot, state key) pairs of a slotted class; cache slots are keyed by their property name"""
+    cache_keys = {}
+    for klass in reversed(cls.__mro__):
+        for name, attr in vars(klass).items():
+            if isinstance(attr, slotted_cached_property):
+                cache_keys[attr.slot] = name
+    keys = []
+    for klass in cls.__mro__:
+        for slot in klass.__dict__.get('__slots__', ()):
+            if slot not in ('__dict__', '__weakref__'):
+                keys.append((slot, cache_keys.get(slot, slot)))
+    return tuple(keys)
+
+
+class SlottedObject(object):
+    """
+    Base for memory-compact classes with an explicit `__slots__` field schema.
+
+    The pickle/copy state is a plain attribute dict (cached properties under their own name),
+    which is the same format the former `__dict__` based classes produced, so pickles stay compatible
+    in both directions. Subclasses have no instance `__dict__`: every attribute set on them,
+    including ones attached later in the pipeline, has to be declared in `__slots__`.
+    """
+    __slots__ = ()
+
+    def __getstate__(self):
+        state = {}
+        for slot, key in _slotted_state_keys(type(self)):
+            try:
+                state[key] = getattr(self, slot)
+            except AttributeError:
+                pass
+        return state
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            # 默认的 (__dict__, slots) 两段式状态
+            inst_dict, slots = state
+            state = {**(inst_dict or {}), **(slots or {})}
+        for key, value in state.items():
+            try:
+                setattr(self, key, value)
+            except AttributeError:
+                # 旧版本pickle中已不再使用的字段
+                pass
+
+
 class BBox(object):
     def __init__(self, x: int, y: int, w: int, h: int, text: str, prob: float, fg_r: int = 0, fg_g: int = 0, fg_b: int = 0, bg_r: int = 0, bg_g: int = 0, bg_b: int = 0):
         self.x = x
@@ -420,10 +503,21 @@ def sort_pnts(pts: np.ndarray):
         return pts_sorted, is_vertical
 
 
-class Quadrilateral(object):
+class Quadrilateral(SlottedObject):
     """
     Helper for storing textlines that contains various helper functions.
     """
+    __slots__ = (
+        'pts', 'direction', 'text', 'prob',
+        'fg_r', 'fg_g', 'fg_b', 'bg_r', 'bg_g', 'bg_b',
+        'assigned_direction', 'textlines',
+        # slotted_cached_property 缓存
+        '_structure_cache', '_valid_cache', '_aspect_ratio_cache', '_font_size_cache', '_xyxy_cache',
+        '_aabb_cache', '_is_axis_aligned_cache', '_is_approximate_axis_aligned_cache', '_cosangle_cache',
+        '_angle_cache', '_centroid_cache', '_polygon_cache', '_area_cache',
+        '__weakref__',
+    )
+
     def __init__(self, pts: np.ndarray, text: str, prob: float, fg_r: int = 0, fg_g: int = 0, fg_b: int = 0, bg_r: int = 0, bg_g: int = 0, bg_b: int = 0):
         self.pts, is_vertical = sort_pnts(pts)
         if is_vertical:
@@ -441,7 +535,7 @@ class Quadrilateral(object):
         self.assigned_direction: str = None
         self.textlines: List[Quadrilateral] = []
 
-    @functools.cached_property
+    @slotted_cached_property
     def structure(self) -> List[np.ndarray]:
         p1 = ((self.pts[0] + self.pts[1]) / 2).astype(int)
         p2 = ((self.pts[2] + self.pts[3]) / 2).astype(int)
@@ -449,7 +543,7 @@ class Quadrilateral(object):
         p4 = ((self.pts[3] + self.pts[0]) / 2).astype(int)
         return [p1, p2, p3, p4]
 
-    @functools.cached_property
+    @slotted_cached_property
     def valid(self) -> bool:
         [l1a, l1b, l2a, l2b] = [a.astype(np.float32) for a in self.structure]
         v1 = l1b - l1a
@@ -468,7 +562,7 @@ class Quadrilateral(object):
     def bg_colors(self):
         return np.array([self.bg_r, self.bg_g, self.bg_b])
 
-    @functools.cached_property
+    @slotted_cached_property
     def aspect_ratio(self) -> float:
         """hor/ver"""
         [l1a, l1b, l2a, l2b] = [a.astype(np.float32) for a in self.structure]
@@ -476,7 +570,7 @@ class Quadrilateral(object):
         v2 = l2b - l2a
         return np.linalg.norm(v2) / np.linalg.norm(v1)
 
-    @functools.cached_property
+    @slotted_cached_property
     def font_size(self) -> float:
         [l1a, l1b, l2a, l2b] = [a.astype(np.float32) for a in self.structure]
         v1 = l1b - l1a
@@ -489,7 +583,7 @@ class Quadrilateral(object):
     def height(self) -> int:
         return self.aabb.h
 
-    @functools.cached_property
+    @slotted_cached_property
     def xyxy(self):
         return self.aabb.x, self.aabb.y, self.aabb.x + self.aabb.w, self.aabb.y + self.aabb.h
 
@@ -502,7 +596,7 @@ class Quadrilateral(object):
     #     ans = [a.astype(np.float32) for a in self.structure]
     #     return [Point(a[0], a[1]) for a in ans]
 
-    @functools.cached_property
+    @slotted_cached_property
     def aabb(self) -> BBox:
         kq = self.pts
         max_coord = np.max(kq, axis = 0)
@@ -561,7 +655,7 @@ class Quadrilateral(object):
             region = cv2.rotate(region, cv2.ROTATE_90_COUNTERCLOCKWISE)
             return region
 
-    @functools.cached_property
+    @slotted_cached_property
     def is_axis_aligned(self) -> bool:
         [l1a, l1b, l2a, l2b] = [a.astype(np.float32) for a in self.structure]
         v1 = l1b - l1a
@@ -574,7 +668,7 @@ class Quadrilateral(object):
             return True
         return False
 
-    @functools.cached_property
+    @slotted_cached_property
     def is_approximate_axis_aligned(self) -> bool:
         [l1a, l1b, l2a, l2b] = [a.astype(np.float32) for a in self.structure]
         v1 = l1b - l1a
@@ -587,7 +681,7 @@ class Quadrilateral(object):
             return True
         return False
 
-    @functools.cached_property
+    @slotted_cached_property
     def cosangle(self) -> float:
         [l1a, l1b, l2a, l2b] = [a.astype(np.float32) for a in self.structure]
         v1 = l1b - l1a
@@ -595,11 +689,11 @@ class Quadrilateral(object):
         unit_vector_1 = v1 / np.linalg.norm(v1)
         return np.dot(unit_vector_1, e2)
 
-    @functools.cached_property
+    @slotted_cached_property
     def angle(self) -> float:
         return np.fmod(np.arccos(self.cosangle) + np.pi, np.pi)
 
-    @functools.cached_property
+    @slotted_cached_property
     def centroid(self) -> np.ndarray:
         return np.average(self.pts, axis = 0)
 
@@ -610,11 +704,11 @@ class Quadrilateral(object):
             d = min(d, distance_point_lineseg(p, self.pts[i], self.pts[(i + 1) % 4]))
         return d
 
-    @functools.cached_property
+    @slotted_cached_property
     def polygon(self) -> Polygon:
         return MultiPoint([tuple(self.pts[0]), tuple(self.pts[1]), tuple(self.pts[2]), tuple(self.pts[3])]).convex_hull
 
-    @functools.cached_property
+    @slotted_cached_property
     def area(self) -> float:
         return self.polygon.area
 
@@ -724,6 +818,190 @@ class Quadrilateral(object):
     def copy(self, new_pts: np.ndarray):
         return Quadrilateral(new_pts, self.text, self.prob, *self.fg_colors, *self.bg_colors)
 
+
+def _convex_hull_area4(p: np.ndarray) -> np.ndarray:
+    """
+    Convex hull area of 4 points along the last two axes, (..., 4, 2) -> (...).
+    Same as MultiPoint(points).convex_hull.area: the hull is either the largest triangle
+    or the largest of the three possible quadrilateral orderings.
+    """
+    x = p[..., 0].astype(np.float64)
+    y = p[..., 1].astype(np.float64)
+
+    def tri(i, j, k):
+        return np.abs((x[..., j] - x[..., i]) * (y[..., k] - y[..., i]) - (x[..., k] - x[..., i]) * (y[..., j] - y[..., i])) / 2
+
+    def quad(i, j, k, l):
+        return np.abs(x[..., i] * y[..., j] - x[..., j] * y[..., i] + x[..., j] * y[..., k] - x[..., k] * y[..., j]
+                      + x[..., k] * y[..., l] - x[..., l] * y[..., k] + x[..., l] * y[..., i] - x[..., i] * y[..., l]) / 2
+
+    return np.max([tri(0, 1, 2), tri(0, 1, 3), tri(0, 2, 3), tri(1, 2, 3),
+                   quad(0, 1, 2, 3), quad(0, 1, 3, 2), quad(0, 2, 1, 3)], axis=0)
+
+
+class QuadrilateralBatch(object):
+    """
+    Structure-of-arrays companion of `Quadrilateral`: the (already sorted) points of N textlines in one (N, 4, 2) array.
+
+    Geometry properties are computed for all textlines in one vectorized pass and give the same values as the
+    per-object `Quadrilateral` properties (angle up to float32 rounding). Pairwise `distance` / `poly_distance` are available as index-pair
+    and full matrix variants, so merge and NMS code can avoid thousands of small per-pair calls.
+    """
+    def __init__(self, pts: np.ndarray, directions: Optional[np.ndarray] = None):
+        self.pts = np.asarray(pts, dtype=np.float64).reshape(-1, 4, 2)
+        if directions is None:
+            directions = np.full(len(self.pts), 'h')
+        self.directions = np.asarray(directions, dtype='<U1')
+
+    @classmethod
+    def from_quadrilaterals(cls, quads: List[Quadrilateral]) -> 'QuadrilateralBatch':
+        if not quads:
+            return cls(np.zeros((0, 4, 2), dtype=np.float64))
+        # 与 Quadrilateral.distance/poly_distance 一致：优先使用 OCR 阶段确定的 assigned_direction
+        directions = [q.assigned_direction if q.assigned_direction is not None else q.direction for q in quads]
+        return cls(np.stack([q.pts for q in quads]), directions)
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    @functools.cached_property
+    def structure(self) -> np.ndarray:
+        """(N, 4, 2) int, midpoints of the four sides in `Quadrilateral.structure` order"""
+        pts = self.pts
+        return np.stack([
+            (pts[:, 0] + pts[:, 1]) / 2,
+            (pts[:, 2] + pts[:, 3]) / 2,
+            (pts[:, 1] + pts[:, 2]) / 2,
+            (pts[:, 3] + pts[:, 0]) / 2,
+        ], axis=1).astype(int)
+
+    @functools.cached_property
+    def _structure_norms(self) -> Tuple[np.ndarray, np.ndarray]:
+        s = self.structure.astype(np.float32)
+        v1 = s[:, 1] - s[:, 0]
+        v2 = s[:, 3] - s[:, 2]
+        return np.linalg.norm(v1, axis=1), np.linalg.norm(v2, axis=1)
+
+    @functools.cached_property
+    def font_size(self) -> np.ndarray:
+        n1, n2 = self._structure_norms
+        return np.minimum(n2, n1)
+
+    @functools.cached_property
+    def aspect_ratio(self) -> np.ndarray:
+        """hor/ver"""
+        n1, n2 = self._structure_norms
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return n2 / n1
+
+    @functools.cached_property
+    def cosangle(self) -> np.ndarray:
+        s = self.structure.astype(np.float32)
+        v1 = s[:, 1] - s[:, 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return v1[:, 0] / np.linalg.norm(v1, axis=1)
+
+    @functools.cached_property
+    def angle(self) -> np.ndarray:
+        return np.fmod(np.arccos(self.cosangle) + np.pi, np.pi)
+
+    @functools.cached_property
+    def centroid(self) -> np.ndarray:
+        return self.pts.mean(axis=1)
+
+    @functools.cached_property
+    def aabb(self) -> np.ndarray:
+        """(N, 4) [x1, y1, x2, y2]"""
+        if len(self.pts) == 0:
+            return np.zeros((0, 4), dtype=np.float64)
+        return np.concatenate([self.pts.min(axis=1), self.pts.max(axis=1)], axis=1)
+
+    @functools.cached_property
+    def area(self) -> np.ndarray:
+        return _convex_hull_area4(self.pts)
+
+    @functools.cached_property
+    def polygons(self) -> np.ndarray:
+        """Shapely convex hulls, same as `Quadrilateral.polygon`"""
+        import shapely
+        return shapely.convex_hull(shapely.multipoints(self.pts))
+
+    def _pair_indices(self, ia: Optional[np.ndarray], ib: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        if ia is None:
+            ia, ib = np.indices((len(self), len(self))).reshape(2, -1)
+        return np.asarray(ia, dtype=np.intp), np.asarray(ib, dtype=np.intp)
+
+    def poly_distance_pairs(self, ia: Optional[np.ndarray], ib: Optional[np.ndarray]) -> np.ndarray:
+        """`Quadrilateral.poly_distance` for the index pairs (ia[k], ib[k])"""
+        ia, ib = self._pair_indices(ia, ib)
+        out = np.zeros(len(ia), dtype=np.float64)
+        if len(ia) == 0:
+            return out
+        pts = self.pts
+        vertical = self.directions == 'v'
+        # 方向一致时取平行边中点的最小距离：横排用上/下边，竖排用左/右边
+        mid_a = np.where(vertical[:, None], (pts[:, 0] + pts[:, 3]) / 2, (pts[:, 0] + pts[:, 1]) / 2)
+        mid_b = np.where(vertical[:, None], (pts[:, 1] + pts[:, 2]) / 2, (pts[:, 2] + pts[:, 3]) / 2)
+        d = np.min([
+            np.linalg.norm(mid_a[ia] - mid_a[ib], axis=1),
+            np.linalg.norm(mid_a[ia] - mid_b[ib], axis=1),
+            np.linalg.norm(mid_b[ia] - mid_a[ib], axis=1),
+            np.linalg.norm(mid_b[ia] - mid_b[ib], axis=1),
+        ], axis=0)
+        same = self.directions[ia] == self.directions[ib]
+        out[same] = d[same]
+        if not same.all():
+            import shapely
+            polys = self.polygons
+            out[~same] = shapely.distance(polys[ia[~same]], polys[ib[~same]])
+        return out
+
+    def distance_pairs(self, ia: Optional[np.ndarray], ib: Optional[np.ndarray], rho: float = 0.5) -> np.ndarray:
+        """`Quadrilateral.distance` for the index pairs (ia[k], ib[k])"""
+        ia, ib = self._pair_indices(ia, ib)
+        out = np.zeros(len(ia), dtype=np.float64)
+        if len(ia) == 0:
+            return out
+        pts = self.pts
+        s = self.structure
+        fs = np.maximum(self.font_size[ia], self.font_size[ib])
+        hh = (self.directions[ia] == 'h') & (self.directions[ib] == 'h')
+        thresh = fs * np.float32(rho)
+
+        def hull_dist(a, b, c, d):
+            # 面积先转为 float32 再除以字号，与逐对实现中 python float / np.float32 的精度一致
+            return _convex_hull_area4(np.stack([a, b, c, d], axis=1)).astype(np.float32) / fs
+
+        def point_dist(a, b):
+            return np.sqrt(((a - b) ** 2).sum(axis=1))
+
+        pa, pb = pts[ia], pts[ib]
+        # 横排-横排：左端 / 右端 / 中线三种对齐方式
+        d1 = hull_dist(pa[:, 0], pa[:, 3], pb[:, 0], pb[:, 3])
+        d2 = hull_dist(pa[:, 2], pa[:, 1], pb[:, 2], pb[:, 1])
+        d3 = hull_dist(s[ia, 0], s[ia, 1], s[ib, 0], s[ib, 1])
+        h_right = (d2 < thresh) & (d2 < d1)
+        h_middle = (d3 < thresh) & (d3 < d1) & (d3 < d2)
+        h_dist = np.where(h_middle, point_dist(s[ia, 0].astype(np.float64), s[ib, 0].astype(np.float64)),
+                          np.where(h_right, point_dist(pa[:, 1], pb[:, 1]), point_dist(pa[:, 0], pb[:, 0])))
+        # 其他情况：上端 / 下端对齐
+        v1 = hull_dist(pa[:, 0], pa[:, 1], pb[:, 0], pb[:, 1])
+        v2 = hull_dist(pa[:, 2], pa[:, 3], pb[:, 2], pb[:, 3])
+        v_bottom = (v2 < thresh) & (v2 < v1)
+        v_dist = np.where(v_bottom, point_dist(pa[:, 2], pb[:, 2]), point_dist(pa[:, 0], pb[:, 0]))
+        out[:] = np.where(hh, h_dist, v_dist)
+        return out
+
+    def poly_distance_matrix(self) -> np.ndarray:
+        """(N, N) pairwise `Quadrilateral.poly_distance`"""
+        n = len(self)
+        return self.poly_distance_pairs(None, None).reshape(n, n)
+
+    def distance_matrix(self, rho: float = 0.5) -> np.ndarray:
+        """(N, N) pairwise `Quadrilateral.distance`"""
+        n = len(self)
+        return self.distance_pairs(None, None, rho).reshape(n, n)
+
 # def merge_quadrilaterals(q1: Quadrilateral, q2: Quadrilateral):
 #     min_rect = np.array(Polygon([*q1.pts, *q2.pts]).minimum_rotated_rectangle.exterior.coords[:4])
 #     if q1.centroid[0] < q2.centroid[0] or q1.centroid[1] < q1.centroid[1]:
@@ -2,12 +2,11 @@ import cv2
 import numpy as np
 from typing import List, Tuple
 from shapely.geometry import Polygon, MultiPoint
-from functools import cached_property
 import copy
 import re
 import py3langid as langid
 from .panel import get_panels_from_array
-from .generic import color_difference, is_right_to_left_char, is_valuable_char
+from .generic import color_difference, is_right_to_left_char, is_valuable_char, SlottedObject, slotted_cached_property
 # from ..detection.ctd_utils.utils.imgproc_utils import union_area, xywh2xyxypoly
 
 # LANG_LIST = ['eng', 'ja', 'unknown']
@@ -38,10 +37,24 @@ LANGUAGE_ORIENTATION_PRESETS = {
     'FIL': 'h'
 }
 
-class TextBlock(object):
+class TextBlock(SlottedObject):
     """
     Object that stores a block of text made up of textlines.
     """
+    __slots__ = (
+        'lines', 'language', 'font_size', 'angle', '_direction', 'texts', 'text', 'prob', 'layout_mode',
+        'translation', 'fg_colors', 'bg_colors', 'font_family', 'font_path', 'bold', 'underline', 'italic',
+        'rich_text', 'line_spacing', 'letter_spacing', '_alignment', '_source_lang', 'target_lang',
+        '_bounding_rect', 'default_stroke_width', 'font_weight', 'adjust_bg_color',
+        'opacity', 'shadow_radius', 'shadow_strength', 'shadow_color', 'shadow_offset',
+        # 流水线中按需附加的字段（未设置时 hasattr 为 False）
+        'text_raw', 'original_font_size', 'offset_applied_font_size', 'enlarge_ratio', 'enlarged_xyxy', 'panel_index',
+        # slotted_cached_property 缓存
+        '_xyxy_cache', '_xywh_cache', '_center_cache', '_unrotated_polygons_cache', '_unrotated_min_rect_cache',
+        '_min_rect_cache', '_polygon_aspect_ratio_cache', '_unrotated_size_cache', '_aspect_ratio_cache',
+        '__weakref__',
+    )
+
     def __init__(self, lines: List[Tuple[int, int, int, int]],
                  texts: List[str] = None,
                  language: str = 'unknown',
@@ -134,7 +147,7 @@ class TextBlock(object):
         self.shadow_color = shadow_color
         self.shadow_offset = shadow_offset
 
-    @cached_property
+    @slotted_cached_property
     def xyxy(self):
         """Coordinates of the bounding box"""
         x1 = self.lines[..., 0].min()
@@ -143,24 +156,24 @@ class TextBlock(object):
         y2 = self.lines[..., 1].max()
         return np.array([x1, y1, x2, y2])
 
-    @cached_property
+    @slotted_cached_property
     def xywh(self):
         x1, y1, x2, y2 = self.xyxy
         return np.array([x1, y1, x2-x1, y2-y1])
 
-    @cached_property
+    @slotted_cached_property
     def center(self) -> np.ndarray:
         xyxy = np.array(self.xyxy)
         return (xyxy[:2] + xyxy[2:]) / 2
 
-    @cached_property
+    @slotted_cached_property
     def unrotated_polygons(self) -> np.ndarray:
         polygons = self.lines.reshape(-1, 8)
         if self.angle != 0:
             polygons = rotate_polygons(self.center, polygons, self.angle)
         return polygons
 
-    @cached_property
+    @slotted_cached_property
     def unrotated_min_rect(self) -> np.ndarray:
         polygons = self.unrotated_polygons
         min_x = polygons[:, ::2].min()
@@ -170,7 +183,7 @@ class TextBlock(object):
         min_bbox = np.array([[min_x, min_y, max_x, min_y, max_x, max_y, min_x, max_y]])
         return min_bbox.reshape(-1, 4, 2).astype(np.int64)
 
-    @cached_property
+    @slotted_cached_property
     def min_rect(self) -> np.ndarray:
         polygons = self.unrotated_polygons
         min_x = polygons[:, ::2].min()
@@ -182,7 +195,7 @@ class TextBlock(object):
             min_bbox = rotate_polygons(self.center, min_bbox, -self.angle)
         return min_bbox.clip(0).reshape(-1, 4, 2).astype(np.int64)
 
-    @cached_property
+    @slotted_cached_property
     def polygon_aspect_ratio(self) -> float:
         """width / height"""
         polygons = self.unrotated_polygons.reshape(-1, 4, 2)
@@ -191,7 +204,7 @@ class TextBlock(object):
         norm_h = np.linalg.norm(middle_pts[:, 1] - middle_pts[:, 3], axis=1)
         return np.mean(norm_h / norm_v)
 
-    @cached_property
+    @slotted_cached_property
     def unrotated_size(self) -> Tuple[float, float]:
         """Returns width and height of unrotated bbox"""
         polygons = self.min_rect.reshape(-1, 4, 2)
@@ -200,7 +213,7 @@ class TextBlock(object):
         norm_v = np.mean(np.linalg.norm(middle_pts[:, 2] - middle_pts[:, 0], axis=1))
         return norm_h, norm_v
 
-    @cached_property
+    @slotted_cached_property
     def aspect_ratio(self) -> float:
         """width / height"""
         return self.unrotated_size[0] / self.unrotated_size[1]
@@ -252,19 +265,12 @@ class TextBlock(object):
         cos_a = math.cos(angle_rad)
         sin_a = math.sin(angle_rad)
         
-        new_lines = []
-        for line_poly in self.lines:
-            unrotated_poly = []
-            for x, y in line_poly:
-                # 平移到原点
-                dx = x - center_x
-                dy = y - center_y
-                # 旋转
-                new_x = dx * cos_a - dy * sin_a
-                new_y = dx * sin_a + dy * cos_a
-                # 平移回去
-                unrotated_poly.append([new_x + center_x, new_y + center_y])
-            new_lines.append(unrotated_poly)
+        # 平移到原点 -> 旋转 -> 平移回去（逐元素向量化，结果与逐点计算一致）
+        dx = all_vertices[:, 0] - center_x
+        dy = all_vertices[:, 1] - center_y
+        new_x = dx * cos_a - dy * sin_a + center_x
+        new_y = dx * sin_a + dy * cos_a + center_y
+        new_lines = np.stack([new_x, new_y], axis=-1).reshape(self.lines.shape).tolist()
 
         return {
             'lines': new_lines,
@@ -440,24 +446,19 @@ class TextBlock(object):
 
             # 根据region中面积最大的文本框的宽高比来判断排版方向
             if len(self.lines) > 0:
-                # 计算每个检测框的面积和宽高比
-                max_area = 0
+                # 一次性计算所有检测框的面积
+                areas = _polygon_areas(self.lines)
                 largest_box_aspect_ratio = 1
-                
-                for line in self.lines:
-                    # 计算检测框的面积
-                    line_polygon = Polygon(line)
-                    area = line_polygon.area
-                    
-                    if area > max_area:
-                        max_area = area
-                        # 计算该检测框的宽高比
-                        # 获取检测框的边界框
-                        x_coords = line[:, 0]
-                        y_coords = line[:, 1]
-                        width = np.max(x_coords) - np.min(x_coords)
-                        height = np.max(y_coords) - np.min(y_coords)
-                        largest_box_aspect_ratio = width / height if height > 0 else 1
+
+                if areas.max() > 0:
+                    # 计算面积最大的检测框的宽高比（同面积取第一个）
+                    # 获取检测框的边界框
+                    line = self.lines[int(np.argmax(areas))]
+                    x_coords = line[:, 0]
+                    y_coords = line[:, 1]
+                    width = np.max(x_coords) - np.min(x_coords)
+                    height = np.max(y_coords) - np.min(y_coords)
+                    largest_box_aspect_ratio = width / height if height > 0 else 1
                 
                 # 根据面积最大的检测框的宽高比判断方向
                 if largest_box_aspect_ratio < 1:
@@ -527,6 +528,21 @@ class TextBlock(object):
         return 0
 
 
+def _polygon_areas(polygons: np.ndarray) -> np.ndarray:
+    """
+    Areas of (N, K, 2) polygons, computed with the same shoelace formula as
+    shapely/GEOS `Polygon.area` (coordinates relative to the first vertex), so results are identical.
+    """
+    x0 = polygons[:, :1, 0]
+    x = polygons[:, :, 0] - x0
+    y = polygons[:, :, 1]
+    k = polygons.shape[1]
+    total = np.zeros(len(polygons), dtype=np.float64)
+    for i in range(1, k):
+        total = total + x[:, i] * (y[:, i - 1] - y[:, (i + 1) % k])
+    return np.abs(total) / 2
+
+
 def rotate_polygons(center, polygons, rotation, new_center=None, to_int=True):
     if rotation == 0:
         return polygons
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+torch = pytest.importorskip('torch')
+
+from manga_translator.upscaling.tile_utils import (
+    DEFAULT_TILE_OVERLAP,
+    merge_tiles_into_image,
+    plan_tiles,
+    split_image_into_tiles,
+    upscale_tiled,
+)
+
+# (width, height, tile_size): (size - tile_size) % (tile_size - overlap) is small, so the old plan
+# ended each row/column with a tile only a few pixels wide
+EDGE_CASES = [
+    (300, 172, 100),
+    (500, 700, 512),
+    (169, 169, 100),
+    (513, 40, 512),
+    (100, 100, 100),
+    (37, 250, 64),
+]
+
+
+def fake_forward(scale):
+    """Nearest-neighbour upscale plus a per-tile offset, so overlapping tiles paste different pixels."""
+    def forward(batch):
+        pixels = batch.double().mul(255.0).round()
+        out = pixels.repeat_interleave(scale, dim=2).repeat_interleave(scale, dim=3)
+        offset = pixels.sum(dim=(1, 2, 3), keepdim=True).remainder(97.0)
+        return out.add(offset).remainder(256.0).to(torch.uint8)
+    return forward
+
+
+def serial_upscale(image, forward, scale, tile_size):
+    """The split_image_into_tiles / merge_tiles_into_image path, one tile per forward pass."""
+    pil = Image.fromarray(image)
+    tiles = []
+    for tile, position in split_image_into_tiles(pil, tile_size, DEFAULT_TILE_OVERLAP):
+        x = torch.from_numpy(np.asarray(tile)).permute(2, 0, 1)[None].float().div(255.0)
+        y = forward(x)[0].permute(1, 2, 0).numpy()
+        tiles.append((Image.fromarray(y), position))
+    return np.asarray(merge_tiles_into_image(tiles, pil.size, scale, DEFAULT_TILE_OVERLAP))
+
+
+@pytest.mark.parametrize('width,height,tile_size', EDGE_CASES)
+def test_plan_tiles_has_no_narrow_trailing_tiles(width, height, tile_size):
+    positions = plan_tiles(width, height, tile_size)
+    for x, y, w, h in positions:
+        assert w == min(tile_size, width) and h == min(tile_size, height)
+        assert x + w <= width and y + h <= height
+    assert max(x + w for x, _, w, _ in positions) == width
+    assert max(y + h for _, y, _, h in positions) == height
+
+
+@pytest.mark.parametrize('scale', [2, 4])
+@pytest.mark.parametrize('width,height,tile_size', EDGE_CASES)
+def test_upscale_tiled_matches_serial_merge(width, height, tile_size, scale):
+    image = np.random.default_rng(width * height + tile_size).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    forward = fake_forward(scale)
+    expected = serial_upscale(image, forward, scale, tile_size)
+    for num_workers in (1, 2):
+        result = upscale_tiled(image, forward, scale, 'cpu', tile_size=tile_size, batch_size=3, num_workers=num_workers)
+        np.testing.assert_array_equal(result, expected)
+
+
+@pytest.mark.parametrize('width,height,tile_size', EDGE_CASES)
+def test_upscale_tiled_padded_tiles(width, height, tile_size):
+    image = np.random.default_rng(tile_size).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    def nearest(batch):
+        return batch.repeat_interleave(2, dim=2).repeat_interleave(2, dim=3).mul(255.0).round().to(torch.uint8)
+    result = upscale_tiled(image, nearest, 2, 'cpu', tile_size=tile_size, min_tile_size=128)
+    np.testing.assert_array_equal(result, image.repeat(2, axis=0).repeat(2, axis=1))